@@ -1,9 +1,14 @@
+import sys
 import random
+import os
 import time
 import urllib.parse
 import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import http_session
+
 log = Logger()
 http_client = HttpClient()
 input = Input()
@@ -45,7 +50,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -8,6 +8,11 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+from Common import graph_batch
 
 log = Logger()
 http_client = HttpClient()
@@ -56,7 +61,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -83,7 +88,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = (f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3")
     response = execute_api_call(
@@ -100,7 +105,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
             return secret_value
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = (f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration")
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -111,10 +119,16 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
-        return ""
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -142,27 +156,26 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-
-    token = get_access_token(
-        log, http_client, tenant_id, client_id, client_secret,
-        scope="https://graph.microsoft.com/.default", log_prefix="Graph"
-    )
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
-
     return tenant_id, token
 
 def get_company_data_from_ticket(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticket_number):
@@ -378,6 +391,41 @@ def remove_user_from_aad_groups(log, http_client, msgraph_base_url, group_id, us
         return True
     return False
 
+def execute_graph_batch(log, http_client, headers, batch_requests):
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/$batch"
+    post_batch = lambda worker_log, chunk: execute_api_call(worker_log, http_client, "post", endpoint, data={"requests": chunk}, headers=headers)
+    return graph_batch.execute_graph_batch(log, post_batch, batch_requests)
+
+def get_user_direct_group_ids(log, http_client, user_id, relation, token):
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/users/{user_id}/{relation}/microsoft.graph.group?$select=id"
+    headers = {"Authorization": f"Bearer {token}"}
+    group_ids = set()
+    while endpoint:
+        response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
+        if not response:
+            return None
+        data = response.json()
+        group_ids.update(group.get("id") for group in data.get("value", []) if group.get("id"))
+        endpoint = data.get("@odata.nextLink")
+    return group_ids
+
+def plan_group_removals(log, http_client, user_id, graph_groups, token):
+    member_ids = get_user_direct_group_ids(log, http_client, user_id, "memberOf", token)
+    owner_ids = get_user_direct_group_ids(log, http_client, user_id, "ownedObjects", token)
+    planned = []
+    inherited = []
+    for group_name, group_id in graph_groups:
+        roles = []
+        if member_ids is None or group_id in member_ids:
+            roles.append("Member")
+        if owner_ids is None or group_id in owner_ids:
+            roles.append("Owner")
+        if not roles:
+            inherited.append((group_name, group_id, "Member"))
+        planned.extend((group_name, group_id, access) for access in roles)
+    log.info(f"Planned [{len(planned)}] group removals for user [{user_id}], [{len(inherited)}] memberships are inherited")
+    return planned, inherited
+
 def remove_user_from_all_aad_groups(log, http_client, msgraph_base_url, user_id, user_identifier, token):
     dynamic_groups, graph_groups, skipped_mail_groups = get_user_aad_groups(log, http_client, msgraph_base_url, user_id, token)
     removed_groups = []
@@ -390,26 +438,33 @@ def remove_user_from_all_aad_groups(log, http_client, msgraph_base_url, user_id,
     for group_name, group_id in skipped_mail_groups:
         log.warning(f"Skipping mail-enabled/distribution group [{group_name}] - [{group_id}] (not removable via Graph API)")
 
-    for group_name, group_id in graph_groups:
-        for access in ["Member", "Owner"]:
-            ref_type = "members" if access == "Member" else "owners"
-            log.info(f"Attempting to remove user [{user_identifier}] from group [{group_name}] - [{group_id}] as {access} using Graph API")
-            endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/groups/{group_id}/{ref_type}/{user_id}/$ref"
-            headers = {"Authorization": f"Bearer {token}"}
-            response = execute_api_call(log, http_client, "delete", endpoint, headers=headers)
-
-            if response:
-                log.info(f"User [{user_identifier}] removed from [{group_name}] - [{group_id}] as {access} successfully via Graph API")
-                removed_groups.append(f"{group_name}:{access}")
-            elif response and response.status_code == 403 and "Authorization_RequestDenied" in response.text:
-                log.warning(f"Permission denied removing [{user_identifier}] as {access} from group [{group_name}] - [{group_id}]")
-                failed_groups.append((group_name, group_id, access))
-            elif not response or response.status_code == 404:
-                log.warning(f"Skipping non-existent group [{group_name}] - [{group_id}] for {access}")
-                skipped_groups.append((group_name, group_id, access))
-            else:
-                
-                failed_groups.append((group_name, group_id, access))
+    planned, inherited = plan_group_removals(log, http_client, user_id, graph_groups, token)
+    for group_name, group_id, access in inherited:
+        log.info(f"Skipping group [{group_name}] - [{group_id}] (membership is inherited through a nested group)")
+        skipped_groups.append((group_name, group_id, access))
+
+    batch_requests = []
+    for i, (group_name, group_id, access) in enumerate(planned):
+        ref_type = "members" if access == "Member" else "owners"
+        batch_requests.append({"id": str(i), "method": "DELETE", "url": f"/groups/{group_id}/{ref_type}/{user_id}/$ref"})
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    results, failures = execute_graph_batch(log, http_client, headers, batch_requests) if batch_requests else ({}, {})
+
+    for i, (group_name, group_id, access) in enumerate(planned):
+        failure = failures.get(str(i), {})
+        status = failure.get("status", 0)
+        if str(i) in results:
+            log.info(f"User [{user_identifier}] removed from [{group_name}] - [{group_id}] as {access} successfully via Graph API")
+            removed_groups.append(f"{group_name}:{access}")
+        elif status == 403:
+            log.warning(f"Permission denied removing [{user_identifier}] as {access} from group [{group_name}] - [{group_id}]")
+            failed_groups.append((group_name, group_id, access))
+        elif status == 404:
+            log.warning(f"Skipping non-existent group [{group_name}] - [{group_id}] for {access}")
+            skipped_groups.append((group_name, group_id, access))
+        else:
+            log.error(f"Failed to remove [{user_identifier}] as {access} from group [{group_name}] - [{group_id}] Status: {status or 'N/A'}, Response: {failure.get('body', '')}")
+            failed_groups.append((group_name, group_id, access))
 
     return removed_groups, skipped_groups, failed_groups
 
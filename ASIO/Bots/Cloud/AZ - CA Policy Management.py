@@ -8,6 +8,10 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
 
 log = Logger()
 http_client = HttpClient()
@@ -55,7 +59,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -82,7 +86,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = (f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3")
     response = execute_api_call(
@@ -100,7 +104,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
     log.error(f"Failed to retrieve secret [{secret_name}] Status code: {response.status_code if response else 'N/A'}")
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = (f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration")
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -111,10 +118,16 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
-        return ""
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -142,17 +155,23 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Graph")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
@@ -7,6 +7,9 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
 
 log = Logger()
 http_client = HttpClient()
@@ -49,7 +52,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -76,7 +79,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
     response = execute_api_call(log, http_client, "get", secret_url, integration_name="custom_wf_oauth2_client_creds")
@@ -87,7 +90,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
             return secret_value
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -98,10 +104,16 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
-        return ""
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
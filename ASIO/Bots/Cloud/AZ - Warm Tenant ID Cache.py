@@ -0,0 +1,168 @@
+﻿import sys
+import random
+import os
+import time
+import requests
+from cw_rpa import Logger, Input, HttpClient, ResultLevel
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+
+log = Logger()
+http_client = HttpClient()
+input = Input()
+log.info("Imports completed successfully")
+
+vault_name = "PLACEHOLDER-akv1"
+data_to_log = {}
+bot_name = "AZ - Warm Tenant ID Cache"
+log.info("Static variables set")
+
+def record_result(log, level, message):
+    log.result_message(level, f"[{bot_name}]: {message}")
+    if level == ResultLevel.WARNING:
+        data_to_log["status_result"] = "Fail"
+    elif level == ResultLevel.SUCCESS:
+        if "status_result" not in data_to_log or data_to_log["status_result"] != "Fail":
+            data_to_log["status_result"] = "Success"
+
+def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, integration_name=None, headers=None, params=None):
+    base_delay = 5
+    log.info(f"Executing API call: {method.upper()} {endpoint}")
+    for attempt in range(retries):
+        try:
+            if integration_name:
+                response = (
+                    getattr(http_client.third_party_integration(integration_name), method)(url=endpoint, json=data)
+                    if data else getattr(http_client.third_party_integration(integration_name), method)(url=endpoint)
+                )
+            else:
+                request_args = {"url": endpoint}
+                if params:
+                    request_args["params"] = params
+                if headers:
+                    request_args["headers"] = headers
+                if data:
+                    if (headers and headers.get("Content-Type") == "application/x-www-form-urlencoded"):
+                        request_args["data"] = data
+                    else:
+                        request_args["json"] = data
+                response = http_session.request(method, **request_args)
+
+            if 200 <= response.status_code < 300:
+                return response
+            elif response.status_code in [429, 503]:
+                retry_after = response.headers.get("Retry-After")
+                wait_time = int(retry_after) if retry_after else base_delay * (2 ** attempt) + random.uniform(0, 3)
+                log.warning(f"Rate limit exceeded. Retrying in {wait_time:.2f} seconds")
+                time.sleep(wait_time)
+            elif 400 <= response.status_code < 500:
+                if response.status_code == 404:
+                    log.warning(f"Skipping non-existent resource [{endpoint}]")
+                    return None
+                log.error(f"Client error Status: {response.status_code}, Response: {response.text}")
+                return response
+            elif 500 <= response.status_code < 600:
+                log.warning(f"Server error Status: {response.status_code}, attempt {attempt + 1} of {retries}")
+                time.sleep(base_delay * (2 ** attempt) + random.uniform(0, 3))
+            else:
+                log.error(f"Unexpected response Status: {response.status_code}, Response: {response.text}")
+                return response
+
+        except Exception as e:
+            log.exception(e, f"Exception during API call to {endpoint}")
+            return None
+    return None
+
+def fetch_secret_value(log, http_client, vault_name, secret_name):
+    log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
+    secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
+    response = execute_api_call(log, http_client, "get", secret_url, integration_name="custom_wf_oauth2_client_creds")
+    if response:
+        secret_value = response.json().get("value", "")
+        if secret_value:
+            log.info(f"Successfully retrieved secret [{secret_name}]")
+            return secret_value
+    return ""
+
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
+    try:
+        config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
+        log.info(f"Fetching OpenID configuration from [{config_url}]")
+        response = execute_api_call(log, http_client, "get", config_url)
+        if response:
+            token_endpoint = response.json().get("token_endpoint", "")
+            tenant_id = token_endpoint.split("/")[3] if token_endpoint else ""
+            if tenant_id:
+                log.info(f"Successfully extracted tenant ID [{tenant_id}]")
+                return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
+        return None
+    except Exception as e:
+        log.exception(e, "Exception while extracting tenant ID from domain")
+        return None
+
+def list_primary_domain_secrets(log, http_client, vault_name):
+    log.info(f"Listing PrimaryDomain secrets in Key Vault [{vault_name}]")
+    endpoint = f"https://{vault_name}.vault.azure.net/secrets?api-version=7.3&maxresults=25"
+    secret_names = []
+    while endpoint:
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="custom_wf_oauth2_client_creds")
+        if not response:
+            log.error(f"Failed to list secrets in Key Vault [{vault_name}]")
+            break
+        data = response.json()
+        for item in data.get("value", []):
+            secret_name = item.get("id", "").rstrip("/").split("/")[-1]
+            if secret_name.endswith("-PrimaryDomain"):
+                secret_names.append(secret_name)
+        endpoint = data.get("nextLink")
+    log.info(f"Found [{len(secret_names)}] PrimaryDomain secrets")
+    return secret_names
+
+def main():
+    try:
+        secret_names = list_primary_domain_secrets(log, http_client, vault_name)
+        if not secret_names:
+            record_result(log, ResultLevel.WARNING, f"No PrimaryDomain secrets found in Key Vault [{vault_name}]")
+            return
+
+        secret_cache.prefetch_secrets(log, vault_name, secret_names, lambda worker_log, worker_http_client, name: fetch_secret_value(worker_log, worker_http_client, vault_name, name), HttpClient)
+
+        resolved = []
+        failed = []
+        for secret_name in secret_names:
+            company_identifier = secret_name[:-len("-PrimaryDomain")]
+            azure_domain = get_secret_value(log, http_client, vault_name, secret_name)
+            if not azure_domain:
+                failed.append(company_identifier)
+                continue
+            tenant_id = tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain), refresh=True, save=False)
+            if tenant_id:
+                resolved.append(f"{company_identifier}: {azure_domain} => {tenant_id}")
+            else:
+                failed.append(f"{company_identifier}: {azure_domain}")
+
+        tenant_cache.save_cache(log)
+
+        data_to_log["resolved"] = resolved
+        data_to_log["failed"] = failed
+        record_result(log, ResultLevel.SUCCESS, f"Cached tenant IDs for [{len(resolved)}] domains in [{tenant_cache.cache_path}]")
+        if failed:
+            record_result(log, ResultLevel.WARNING, f"Failed to resolve tenant IDs for: {', '.join(failed)}")
+
+    except Exception as e:
+        log.error(f"Unhandled error in main: {str(e)}")
+        record_result(log, ResultLevel.WARNING, "Unhandled exception occurred during execution")
+    finally:
+        log.result_data(data_to_log)
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import http_session
+from Common import cve_store
+from Common import cve_config_index
 
 log = Logger()
 http_client = HttpClient()
@@ -49,7 +52,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -76,7 +79,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
+def search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
     log.info(f"Searching for configuration with name [{config_name}] and type [{config_type}] in company [{company_id}]")
     
     conditions = f'name="{config_name}" AND type/name="{config_type}" AND company/id={company_id}'
@@ -97,6 +100,42 @@ def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, co
     log.info(f"No configuration found with name: [{config_name}]")
     return None
 
+def get_company_configurations(log, http_client, cwpsa_base_url, company_id, config_type="CVE Vulnerability"):
+    log.info(f"Retrieving all [{config_type}] configurations for company [{company_id}]")
+    
+    conditions = urllib.parse.quote(f'type/name="{config_type}" AND company/id={company_id}')
+    configs = []
+    page = 1
+    while True:
+        endpoint = f"{cwpsa_base_url}/company/configurations?conditions={conditions}&fields=id,name,questions&orderBy=id asc&pageSize=1000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
+        if not response:
+            log.warning(f"Failed to retrieve configurations for company [{company_id}]")
+            return None
+        try:
+            page_configs = response.json()
+        except Exception as e:
+            log.exception(e, f"Failed to parse configurations page [{page}] for company [{company_id}]")
+            return None
+        configs.extend(page_configs)
+        if len(page_configs) < 1000:
+            return configs
+        page += 1
+
+def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
+    config, indexed = cve_config_index.find_configuration(log, company_id, config_type, config_name, lambda: get_company_configurations(log, http_client, cwpsa_base_url, company_id, config_type))
+    if not indexed:
+        log.warning(f"Configuration index unavailable for company [{company_id}], searching by name")
+        return search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type)
+    if config:
+        log.info(f"Found existing configuration ID [{config.get('id')}] with name: [{config_name}]")
+        return config
+    # The index may predate a configuration created by someone else, so confirm a miss before it is trusted
+    config = search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type)
+    if config:
+        cve_config_index.add_configuration(log, company_id, config_type, config)
+    return config
+
 def create_configuration(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability", status="Active", questions=None):
     log.info(f"Creating new configuration with name: [{config_name}], type: [{config_type}]")
     
@@ -119,6 +158,7 @@ def create_configuration(log, http_client, cwpsa_base_url, config_name, company_
             config = response.json()
             config_id = config.get("id")
             log.info(f"Successfully created configuration ID [{config_id}] with name: [{config_name}]")
+            cve_config_index.add_configuration(log, company_id, config_type, config)
             return config
         except Exception as e:
             log.exception(e, f"Failed to parse create configuration response for name: [{config_name}]")
@@ -148,23 +188,47 @@ def update_configuration_questions(log, http_client, cwpsa_base_url, config_id,
         log.error(f"Failed to update configuration [{config_id}] questions")
         return False
 
-def get_cve_data_from_nist(log, cve_number):
-    log.info(f"Retrieving CVE data for [{cve_number}] from NIST NVD2")
-    
+def fetch_modified_cves(log, since, until):
+    log.info(f"Retrieving CVE records modified between [{since.strftime('%Y-%m-%d')}] and [{until.strftime('%Y-%m-%d')}] from NIST NVD2")
+    records = []
+    page = 1
+    while True:
+        endpoint = f"{nist_nvd2_base_url}/v3/index/nist-nvd2?lastModStartDate={since.strftime('%Y-%m-%d')}&lastModEndDate={until.strftime('%Y-%m-%d')}&limit=2000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="custom_wf_apikey")
+        if not response:
+            return None
+        try:
+            body = response.json()
+        except Exception as e:
+            log.exception(e, f"Failed to parse modified CVE page [{page}]")
+            return None
+        records.extend(body.get("data") or [])
+        if page >= (body.get("_meta") or {}).get("total_pages", 1):
+            return records
+        page += 1
+
+def fetch_cve_record(log, cve_number):
     endpoint = f"{nist_nvd2_base_url}/v3/index/nist-nvd2?cve={cve_number}"
-    
     response = execute_api_call(log, http_client, "get", endpoint, integration_name="custom_wf_apikey")
-    
     if response:
         try:
-            cve_data = response.json()
-            log.info(f"Successfully retrieved CVE data for [{cve_number}]")
-            return cve_data
+            data = response.json().get("data") or []
+            return data[0] if data else None
         except Exception as e:
             log.exception(e, f"Failed to parse CVE data for [{cve_number}]")
-    else:
-        log.warning(f"Failed to retrieve CVE data for [{cve_number}]")
+    return None
+
+def get_cve_data_from_nist(log, cve_number):
+    log.info(f"Retrieving CVE data for [{cve_number}] from NIST NVD2")
+    
+    cve_store.refresh(log, lambda since, until: fetch_modified_cves(log, since, until))
+    cve_details = cve_store.get_cve(log, cve_number, lambda cve_id: fetch_cve_record(log, cve_id))
+    
+    if cve_details:
+        log.info(f"Successfully retrieved CVE data for [{cve_number}]")
+        return {"data": [cve_details]}
     
+    log.warning(f"Failed to retrieve CVE data for [{cve_number}]")
     return None
 
 def main():
@@ -8,6 +8,11 @@ import re
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import http_session
+from Common import cve_store
+from Common import cve_config_index
+from Common import note_scanner
+from Common import worker_pool
 
 log = Logger()
 http_client = HttpClient()
@@ -17,6 +22,7 @@ log.info("Imports completed successfully")
 cwpsa_base_url = "https://aus.myconnectwise.net"
 cwpsa_base_url_path = "/v4_6_release/apis/3.0"
 nist_nvd2_base_url = "https://api.vulncheck.com"
+max_cwpsa_workers = 4
 
 data_to_log = {}
 bot_name = "CWPSA - CVE KB management"
@@ -51,7 +57,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -93,37 +99,28 @@ def get_ticket_data(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticke
 
 def get_ticket_notes(log, http_client, cwpsa_base_url, ticket_number):
     log.info(f"Retrieving notes for ticket [{ticket_number}]")
-    endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/tickets/{ticket_number}/notes"
-    response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
-    if response:
+    notes = []
+    page = 1
+    while True:
+        endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/tickets/{ticket_number}/notes?orderBy=id asc&pageSize=1000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
+        if not response:
+            log.error(f"Failed to retrieve notes page [{page}] for ticket [{ticket_number}]")
+            return None
         try:
-            notes = response.json()
-            log.info(f"Retrieved {len(notes)} notes for ticket [{ticket_number}]")
-            return notes
+            page_notes = response.json()
         except Exception as e:
             log.exception(e, f"Failed to parse notes response for ticket [{ticket_number}]")
-            return []
-    log.warning(f"No notes found for ticket [{ticket_number}]")
-    return []
-
-def extract_kb_numbers(log, text):
-    kb_pattern = r'(?i)\bkb\d+\b'
-    matches = re.findall(kb_pattern, text)
-    if matches:
-        log.info(f"Found KB numbers: {matches}")
-        return [match.upper() for match in matches]
-    log.info("No KB numbers found in text")
-    return []
-
-def extract_cve_numbers(log, text):
-    cve_pattern = r'CVE-\d+-\d+'
-    matches = re.findall(cve_pattern, text, re.IGNORECASE)
-    if matches:
-        unique_cves = list(set([match.upper() for match in matches]))
-        log.info(f"Found CVE numbers: {unique_cves}")
-        return unique_cves
-    log.info("No CVE numbers found in text")
-    return []
+            return None
+        notes.extend(page_notes)
+        if len(page_notes) < 1000:
+            break
+        page += 1
+    if notes:
+        log.info(f"Retrieved {len(notes)} notes for ticket [{ticket_number}]")
+    else:
+        log.warning(f"No notes found for ticket [{ticket_number}]")
+    return notes
 
 def find_ticket_by_summary(log, http_client, cwpsa_base_url, summary, company_id):
     """Search for a ticket with specific summary in the company."""
@@ -272,7 +269,7 @@ def attach_configuration_to_ticket(log, http_client, cwpsa_base_url, ticket_id,
         log.error(f"Failed to attach configuration [{config_id}] to ticket [{ticket_id}]")
         return False
 
-def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
+def search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
     """Search for a configuration by name and type in a specific company."""
     log.info(f"Searching for configuration with name [{config_name}] and type [{config_type}] in company [{company_id}]")
     
@@ -294,6 +291,44 @@ def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, co
     log.info(f"No configuration found with name: [{config_name}]")
     return None
 
+def get_company_configurations(log, http_client, cwpsa_base_url, company_id, config_type="CVE Vulnerability"):
+    """Retrieve all configurations of a type for a company with their question answers."""
+    log.info(f"Retrieving all [{config_type}] configurations for company [{company_id}]")
+    
+    conditions = urllib.parse.quote(f'type/name="{config_type}" AND company/id={company_id}')
+    configs = []
+    page = 1
+    while True:
+        endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/company/configurations?conditions={conditions}&fields=id,name,questions&orderBy=id asc&pageSize=1000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
+        if not response:
+            log.warning(f"Failed to retrieve configurations for company [{company_id}]")
+            return None
+        try:
+            page_configs = response.json()
+        except Exception as e:
+            log.exception(e, f"Failed to parse configurations page [{page}] for company [{company_id}]")
+            return None
+        configs.extend(page_configs)
+        if len(page_configs) < 1000:
+            return configs
+        page += 1
+
+def find_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability"):
+    """Look up a configuration by name and type in the company configuration index."""
+    config, indexed = cve_config_index.find_configuration(log, company_id, config_type, config_name, lambda: get_company_configurations(log, http_client, cwpsa_base_url, company_id, config_type))
+    if not indexed:
+        log.warning(f"Configuration index unavailable for company [{company_id}], searching by name")
+        return search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type)
+    if config:
+        log.info(f"Found existing configuration ID [{config.get('id')}] with name: [{config_name}]")
+        return config
+    # The index may predate a configuration created by someone else, so confirm a miss before it is trusted
+    config = search_configuration_by_name(log, http_client, cwpsa_base_url, config_name, company_id, config_type)
+    if config:
+        cve_config_index.add_configuration(log, company_id, config_type, config)
+    return config
+
 def create_configuration(log, http_client, cwpsa_base_url, config_name, company_id, config_type="CVE Vulnerability", status="Active", questions=None):
     """Create a new configuration item."""
     log.info(f"Creating new configuration with name: [{config_name}], type: [{config_type}]")
@@ -317,6 +352,7 @@ def create_configuration(log, http_client, cwpsa_base_url, config_name, company_
             config = response.json()
             config_id = config.get("id")
             log.info(f"Successfully created configuration ID [{config_id}] with name: [{config_name}]")
+            cve_config_index.add_configuration(log, company_id, config_type, config)
             return config
         except Exception as e:
             log.exception(e, f"Failed to parse create configuration response for name: [{config_name}]")
@@ -325,26 +361,143 @@ def create_configuration(log, http_client, cwpsa_base_url, config_name, company_
         log.error(f"Failed to create configuration with name: [{config_name}]")
         return None
 
-def get_cve_data_from_nist(log, cve_number):
-    """Retrieve CVE data from NIST NVD2 API via VulnCheck."""
-    log.info(f"Retrieving CVE data for [{cve_number}] from NIST NVD2")
-    
+def fetch_modified_cves(log, http_client, since, until):
+    log.info(f"Retrieving CVE records modified between [{since.strftime('%Y-%m-%d')}] and [{until.strftime('%Y-%m-%d')}] from NIST NVD2")
+    records = []
+    page = 1
+    while True:
+        endpoint = f"{nist_nvd2_base_url}/v3/index/nist-nvd2?lastModStartDate={since.strftime('%Y-%m-%d')}&lastModEndDate={until.strftime('%Y-%m-%d')}&limit=2000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="custom_wf_apikey")
+        if not response:
+            return None
+        try:
+            body = response.json()
+        except Exception as e:
+            log.exception(e, f"Failed to parse modified CVE page [{page}]")
+            return None
+        records.extend(body.get("data") or [])
+        if page >= (body.get("_meta") or {}).get("total_pages", 1):
+            return records
+        page += 1
+
+def fetch_cve_record(log, http_client, cve_number):
     endpoint = f"{nist_nvd2_base_url}/v3/index/nist-nvd2?cve={cve_number}"
-    
     response = execute_api_call(log, http_client, "get", endpoint, integration_name="custom_wf_apikey")
-    
     if response:
         try:
-            cve_data = response.json()
-            log.info(f"Successfully retrieved CVE data for [{cve_number}]")
-            return cve_data
+            data = response.json().get("data") or []
+            return data[0] if data else None
         except Exception as e:
             log.exception(e, f"Failed to parse CVE data for [{cve_number}]")
-    else:
-        log.warning(f"Failed to retrieve CVE data for [{cve_number}]")
+    return None
+
+def get_cve_data_from_nist(log, http_client, cve_number):
+    """Retrieve CVE data from NIST NVD2 API via VulnCheck."""
+    log.info(f"Retrieving CVE data for [{cve_number}] from NIST NVD2")
+    
+    cve_store.refresh(log, lambda since, until: fetch_modified_cves(log, http_client, since, until))
+    cve_details = cve_store.get_cve(log, cve_number, lambda cve_id: fetch_cve_record(log, http_client, cve_id))
+    
+    if cve_details:
+        log.info(f"Successfully retrieved CVE data for [{cve_number}]")
+        return {"data": [cve_details]}
     
+    log.warning(f"Failed to retrieve CVE data for [{cve_number}]")
     return None
 
+def build_cve_questions(log, cve_number, cve_data):
+    """Map CVE data to the 10 CVE Vulnerability configuration questions."""
+    if cve_data:
+        log.info(f"CVE data structure keys: {list(cve_data.keys())}")
+        
+        q1_cve_id = cve_number
+        q2_publish_date = ""
+        q3_last_modified = ""
+        q4_cvss_version = ""
+        q5_cvss_score = ""
+        q6_advisory_url = ""
+        q7_advisory_sources = ""
+        q8_advisory_tags = ""
+        q9_description = "No description available"
+        q10_nvd_status = ""
+        
+        if "data" in cve_data and isinstance(cve_data["data"], list) and len(cve_data["data"]) > 0:
+            cve_details = cve_data["data"][0]
+            log.info(f"CVE details keys: {list(cve_details.keys())}")
+            
+            q1_cve_id = cve_details.get("id", cve_number)
+            
+            published_raw = cve_details.get("published", "")
+            q2_publish_date = published_raw.split("T")[0] if published_raw else ""
+            
+            modified_raw = cve_details.get("lastModified", "")
+            q3_last_modified = modified_raw.split("T")[0] if modified_raw else ""
+            
+            q10_nvd_status = cve_details.get("vulnStatus", "")
+            
+            if "descriptions" in cve_details and isinstance(cve_details["descriptions"], list) and len(cve_details["descriptions"]) > 0:
+                q9_description = cve_details["descriptions"][0].get("value", "No description available")
+                log.info(f"Extracted description: [{q9_description[:100]}...]")
+            
+            if "metrics" in cve_details and "cvssMetricV31" in cve_details["metrics"]:
+                metrics = cve_details["metrics"]["cvssMetricV31"]
+                if isinstance(metrics, list) and len(metrics) > 0:
+                    cvss_data = metrics[0].get("cvssData", {})
+                    base_score = cvss_data.get("baseScore", "")
+                    cvss_version = cvss_data.get("version", "")
+                    if base_score:
+                        q5_cvss_score = str(base_score)
+                    if cvss_version:
+                        q4_cvss_version = f"CVSS Version {cvss_version}"
+                    log.info(f"Extracted CVSS: Version [{q4_cvss_version}], Score [{q5_cvss_score}]")
+            
+            if "references" in cve_details and isinstance(cve_details["references"], list) and len(cve_details["references"]) > 0:
+                first_ref = cve_details["references"][0]
+                q6_advisory_url = first_ref.get("url", "")
+                q7_advisory_sources = first_ref.get("source", "")
+                tags = first_ref.get("tags", [])
+                if tags and isinstance(tags, list):
+                    q8_advisory_tags = ", ".join(tags)
+                log.info(f"Extracted advisory: URL [{q6_advisory_url}], Source [{q7_advisory_sources}], Tags [{q8_advisory_tags}]")
+        
+        questions_data = [
+            {"id": 484, "answer": {"answer": q1_cve_id}},
+            {"id": 485, "answer": {"answer": q2_publish_date}},
+            {"id": 486, "answer": {"answer": q3_last_modified}},
+            {"id": 487, "answer": {"answer": q4_cvss_version}},
+            {"id": 488, "answer": {"answer": q5_cvss_score}},
+            {"id": 489, "answer": {"answer": q6_advisory_url}},
+            {"id": 490, "answer": {"answer": q7_advisory_sources}},
+            {"id": 491, "answer": {"answer": q8_advisory_tags}},
+            {"id": 492, "answer": {"answer": q9_description}},
+            {"id": 493, "answer": {"answer": q10_nvd_status}}
+        ]
+        log.info(f"Mapped all CVE fields to 10 questions")
+    else:
+        log.warning(f"No CVE data retrieved for [{cve_number}] - using default values")
+        questions_data = [
+            {"id": 484, "answer": {"answer": cve_number}},
+            {"id": 485, "answer": {"answer": ""}},
+            {"id": 486, "answer": {"answer": ""}},
+            {"id": 487, "answer": {"answer": ""}},
+            {"id": 488, "answer": {"answer": ""}},
+            {"id": 489, "answer": {"answer": ""}},
+            {"id": 490, "answer": {"answer": ""}},
+            {"id": 491, "answer": {"answer": ""}},
+            {"id": 492, "answer": {"answer": "No description available"}},
+            {"id": 493, "answer": {"answer": ""}}
+        ]
+    return questions_data
+
+def create_cve_configuration(log, http_client, cwpsa_base_url, cve_number, company_id):
+    """Fetch CVE data and create its configuration with all 10 questions."""
+    log.info(f"Retrieving CVE data for [{cve_number}] before creating configuration")
+    cve_data = get_cve_data_from_nist(log, http_client, cve_number)
+    questions_data = build_cve_questions(log, cve_number, cve_data)
+    
+    log.info(f"Creating configuration item for CVE: [{cve_number}]")
+    return create_configuration(log, http_client, cwpsa_base_url, cve_number, company_id, "CVE Vulnerability", "Active", questions_data)
+
 def update_configuration_questions(log, http_client, cwpsa_base_url, config_id, questions_data):
     """
     Update configuration questions with CVE data.
@@ -422,7 +575,10 @@ def main():
         
         # Step 2: Get ticket notes and find first note
         notes = get_ticket_notes(log, http_client, cwpsa_base_url, ticket_number)
-        if not notes or len(notes) == 0:
+        if notes is None:
+            record_result(log, ResultLevel.WARNING, f"Failed to retrieve notes for ticket [{ticket_number}]")
+            return
+        if len(notes) == 0:
             record_result(log, ResultLevel.WARNING, f"No notes found for ticket [{ticket_number}]")
             return
         
@@ -430,8 +586,10 @@ def main():
         first_note_text = first_note.get("text", "")
         log.info(f"First note text: {first_note_text[:100]}...")
         
-        # Step 3: Match KB regex in first note
-        kb_matches = extract_kb_numbers(log, first_note_text)
+        # Step 3: Match KB numbers in first note (all notes are scanned once here and reused in step 9)
+        note_results = note_scanner.scan_notes(notes)
+        kb_matches = note_results[0]["kbs"]
+        log.info(f"Found KB numbers: {kb_matches}" if kb_matches else "No KB numbers found in text")
         parent_ticket_id = None
         
         if not kb_matches or len(kb_matches) == 0:
@@ -537,14 +695,7 @@ def main():
                 data_to_log["configs_attached_to_parent"] = 0
         
         # Step 9: Get all notes from child ticket and extract CVEs
-        all_cves = []
-        for note in notes:
-            note_text = note.get("text", "")
-            cves_in_note = extract_cve_numbers(log, note_text)
-            all_cves.extend(cves_in_note)
-        
-        # Remove duplicates
-        all_cves = list(set(all_cves))
+        all_cves = note_scanner.merge_results(note_results)["cves"]
         data_to_log["cves_found"] = all_cves
         data_to_log["cve_count"] = len(all_cves)
         
@@ -562,134 +713,54 @@ def main():
             cached_parent_configs = get_ticket_configurations(log, http_client, cwpsa_base_url, parent_ticket_id) if parent_ticket_id else []
             cached_parent_config_ids = set(c.get("id") for c in cached_parent_configs)
             
+            cve_configs = {}
+            missing_cves = []
             for cve_number in all_cves:
-                log.info(f"Processing CVE: [{cve_number}]")
-                
-                # Check if CVE config exists
                 cve_config = find_configuration_by_name(log, http_client, cwpsa_base_url, cve_number, company_id, "CVE Vulnerability")
-                
-                if not cve_config:
-                    # Get CVE data from NIST first
-                    log.info(f"Retrieving CVE data for [{cve_number}] before creating configuration")
-                    cve_data = get_cve_data_from_nist(log, cve_number)
-                    
-                    questions_data = None
-                    if cve_data:
-                        log.info(f"CVE data structure keys: {list(cve_data.keys())}")
-                        
-                        q1_cve_id = cve_number
-                        q2_publish_date = ""
-                        q3_last_modified = ""
-                        q4_cvss_version = ""
-                        q5_cvss_score = ""
-                        q6_advisory_url = ""
-                        q7_advisory_sources = ""
-                        q8_advisory_tags = ""
-                        q9_description = "No description available"
-                        q10_nvd_status = ""
-                        
-                        if "data" in cve_data and isinstance(cve_data["data"], list) and len(cve_data["data"]) > 0:
-                            cve_details = cve_data["data"][0]
-                            log.info(f"CVE details keys: {list(cve_details.keys())}")
-                            
-                            q1_cve_id = cve_details.get("id", cve_number)
-                            
-                            published_raw = cve_details.get("published", "")
-                            q2_publish_date = published_raw.split("T")[0] if published_raw else ""
-                            
-                            modified_raw = cve_details.get("lastModified", "")
-                            q3_last_modified = modified_raw.split("T")[0] if modified_raw else ""
-                            
-                            q10_nvd_status = cve_details.get("vulnStatus", "")
-                            
-                            if "descriptions" in cve_details and isinstance(cve_details["descriptions"], list) and len(cve_details["descriptions"]) > 0:
-                                q9_description = cve_details["descriptions"][0].get("value", "No description available")
-                                log.info(f"Extracted description: [{q9_description[:100]}...]")
-                            
-                            if "metrics" in cve_details and "cvssMetricV31" in cve_details["metrics"]:
-                                metrics = cve_details["metrics"]["cvssMetricV31"]
-                                if isinstance(metrics, list) and len(metrics) > 0:
-                                    cvss_data = metrics[0].get("cvssData", {})
-                                    base_score = cvss_data.get("baseScore", "")
-                                    cvss_version = cvss_data.get("version", "")
-                                    if base_score:
-                                        q5_cvss_score = str(base_score)
-                                    if cvss_version:
-                                        q4_cvss_version = f"CVSS Version {cvss_version}"
-                                    log.info(f"Extracted CVSS: Version [{q4_cvss_version}], Score [{q5_cvss_score}]")
-                            
-                            if "references" in cve_details and isinstance(cve_details["references"], list) and len(cve_details["references"]) > 0:
-                                first_ref = cve_details["references"][0]
-                                q6_advisory_url = first_ref.get("url", "")
-                                q7_advisory_sources = first_ref.get("source", "")
-                                tags = first_ref.get("tags", [])
-                                if tags and isinstance(tags, list):
-                                    q8_advisory_tags = ", ".join(tags)
-                                log.info(f"Extracted advisory: URL [{q6_advisory_url}], Source [{q7_advisory_sources}], Tags [{q8_advisory_tags}]")
-                        
-                        questions_data = [
-                            {"id": 484, "answer": {"answer": q1_cve_id}},
-                            {"id": 485, "answer": {"answer": q2_publish_date}},
-                            {"id": 486, "answer": {"answer": q3_last_modified}},
-                            {"id": 487, "answer": {"answer": q4_cvss_version}},
-                            {"id": 488, "answer": {"answer": q5_cvss_score}},
-                            {"id": 489, "answer": {"answer": q6_advisory_url}},
-                            {"id": 490, "answer": {"answer": q7_advisory_sources}},
-                            {"id": 491, "answer": {"answer": q8_advisory_tags}},
-                            {"id": 492, "answer": {"answer": q9_description}},
-                            {"id": 493, "answer": {"answer": q10_nvd_status}}
-                        ]
-                        log.info(f"Mapped all CVE fields to 10 questions")
-                    else:
-                        log.warning(f"No CVE data retrieved for [{cve_number}] - using default values")
-                        questions_data = [
-                            {"id": 484, "answer": {"answer": cve_number}},
-                            {"id": 485, "answer": {"answer": ""}},
-                            {"id": 486, "answer": {"answer": ""}},
-                            {"id": 487, "answer": {"answer": ""}},
-                            {"id": 488, "answer": {"answer": ""}},
-                            {"id": 489, "answer": {"answer": ""}},
-                            {"id": 490, "answer": {"answer": ""}},
-                            {"id": 491, "answer": {"answer": ""}},
-                            {"id": 492, "answer": {"answer": "No description available"}},
-                            {"id": 493, "answer": {"answer": ""}}
-                        ]
-                    
-                    # Create CVE config with all 10 questions
-                    log.info(f"Creating configuration item for CVE: [{cve_number}]")
-                    cve_config = create_configuration(log, http_client, cwpsa_base_url, cve_number, company_id, "CVE Vulnerability", "Active", questions_data)
+                if cve_config:
+                    cve_configs_found += 1
+                    cve_configs[cve_number] = cve_config
+                    log.info(f"Configuration already exists for CVE: [{cve_number}] (ID: {cve_config.get('id')})")
+                else:
+                    missing_cves.append(cve_number)
+            
+            if missing_cves:
+                log.info(f"Creating configurations for [{len(missing_cves)}] CVEs with [{max_cwpsa_workers}] workers")
+                # Refresh the CVE store once here so pool tasks only read it
+                cve_store.refresh(log, lambda since, until: fetch_modified_cves(log, http_client, since, until))
+                created_configs = worker_pool.run_in_pool(log, lambda worker_log, cve_number: create_cve_configuration(worker_log, worker_pool.get_worker_http_client(HttpClient), cwpsa_base_url, cve_number, company_id), missing_cves, max_cwpsa_workers)
+                for cve_number, cve_config in zip(missing_cves, created_configs):
                     if cve_config:
                         cve_configs_created += 1
+                        cve_configs[cve_number] = cve_config
                         record_result(log, ResultLevel.SUCCESS, f"Created configuration for CVE: [{cve_number}]")
                     else:
                         record_result(log, ResultLevel.WARNING, f"Failed to create configuration for CVE: [{cve_number}]")
-                        continue
-                else:
-                    cve_configs_found += 1
-                    log.info(f"Configuration already exists for CVE: [{cve_number}] (ID: {cve_config.get('id')})")
-                
-                # Attach CVE config to BOTH tickets (child and parent if exists)
+            
+            # Attach CVE configs to BOTH tickets (child and parent if KB was found and parent exists)
+            attachments = []
+            for cve_config in cve_configs.values():
                 cve_config_id = cve_config.get("id")
-                
-                # Attach to child ticket
                 if cve_config_id not in cached_child_config_ids:
-                    attach_success = attach_configuration_to_ticket(log, http_client, cwpsa_base_url, ticket_number, cve_config_id)
-                    if attach_success:
-                        cached_child_config_ids.add(cve_config_id)
-                        log.info(f"Attached CVE config [{cve_config_id}] to child ticket [{ticket_number}]")
+                    attachments.append((ticket_number, cve_config_id))
                 else:
                     log.info(f"CVE config [{cve_config_id}] already attached to child ticket")
-                
-                # Attach to parent ticket (if KB was found and parent exists)
                 if kb_matches and len(kb_matches) > 0 and parent_ticket_id:
                     if cve_config_id not in cached_parent_config_ids:
-                        attach_success = attach_configuration_to_ticket(log, http_client, cwpsa_base_url, parent_ticket_id, cve_config_id)
-                        if attach_success:
-                            cached_parent_config_ids.add(cve_config_id)
-                            log.info(f"Attached CVE config [{cve_config_id}] to parent ticket [{parent_ticket_id}]")
+                        attachments.append((parent_ticket_id, cve_config_id))
                     else:
                         log.info(f"CVE config [{cve_config_id}] already attached to parent ticket")
             
+            if attachments:
+                attach_results = worker_pool.run_in_pool(log, lambda worker_log, attachment: attach_configuration_to_ticket(worker_log, worker_pool.get_worker_http_client(HttpClient), cwpsa_base_url, attachment[0], attachment[1]), attachments, max_cwpsa_workers)
+                for (target_ticket_id, cve_config_id), attach_success in zip(attachments, attach_results):
+                    ticket_role = "child" if target_ticket_id == ticket_number else "parent"
+                    if attach_success:
+                        (cached_child_config_ids if ticket_role == "child" else cached_parent_config_ids).add(cve_config_id)
+                        log.info(f"Attached CVE config [{cve_config_id}] to {ticket_role} ticket [{target_ticket_id}]")
+                    else:
+                        log.warning(f"Failed to attach CVE config [{cve_config_id}] to {ticket_role} ticket [{target_ticket_id}]")
+            
             data_to_log["cve_configs_created"] = cve_configs_created
             data_to_log["cve_configs_found"] = cve_configs_found
             record_result(log, ResultLevel.SUCCESS, f"Processed {len(all_cves)} CVEs: {cve_configs_created} created, {cve_configs_found} already existed")
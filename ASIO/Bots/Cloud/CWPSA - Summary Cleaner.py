@@ -1,9 +1,9 @@
 ﻿import sys
-import re
 import os
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Common import summary_normaliser
 
 log = Logger()
 http_client = HttpClient()
@@ -30,14 +30,6 @@ def record_result(log, level, message):
         if "status_result" not in data_to_log or data_to_log["status_result"] != "Fail":
             data_to_log["status_result"] = "Success"
 
-def clean_summary_description(text: str) -> str:
-    cleaned = re.sub(r'^\s*\[Extended Summary\]\s*', '', text, flags=re.IGNORECASE)
-    cleaned = re.sub(r'\s*\[Description\]\s*$', '', cleaned, flags=re.IGNORECASE)
-    return cleaned.strip()
-
-def remove_email_brackets(text: str) -> str:
-    return re.sub(r'\s*<[^<>]+>', '', text).strip()
-
 def main():
     try:
         input_note = input.get_value("InputNote_1756876308990").strip()
@@ -49,9 +41,9 @@ def main():
             record_result(log, ResultLevel.WARNING, "Input note is empty or invalid")
             return
 
-        cleaned_note = clean_summary_description(input_note)
-        cleaned_note = remove_email_brackets(cleaned_note)
-        cleaned_note = cleaned_note.strip().splitlines()[0]
+        cleaned_note = summary_normaliser.clean_summary_description(input_note)
+        cleaned_note = summary_normaliser.remove_email_brackets(cleaned_note)
+        cleaned_note = summary_normaliser.strip_reply_prefixes(cleaned_note.strip().splitlines()[0])
 
         log.info(f"Final cleaned summary = [{cleaned_note}]")
         data_to_log["cleanedsummary"] = cleaned_note
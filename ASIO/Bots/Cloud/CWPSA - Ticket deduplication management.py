@@ -8,6 +8,10 @@ import re
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import http_session
+from Common import summary_normaliser
+from Common import ticket_index
+from Common import cwpsa_reference
 
 log = Logger()
 http_client = HttpClient()
@@ -50,7 +54,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -92,56 +96,9 @@ def get_ticket_data(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticke
 
 def clean_ticket_summary(log, summary):
     log.info(f"Cleaning ticket summary: [{summary}]")
-    original_summary = summary
-    summary = summary.strip()
-    prefixes_to_remove = [
-        r'^RE:\s*',
-        r'^Re:\s*',
-        r'^re:\s*',
-        r'^FW:\s*',
-        r'^Fw:\s*',
-        r'^fw:\s*',
-        r'^FWD:\s*',
-        r'^Fwd:\s*',
-        r'^fwd:\s*',
-        r'^AW:\s*',
-        r'^Aw:\s*',
-        r'^aw:\s*',
-        r'^R:\s*',
-        r'^RIF:\s*',
-        r'^TR:\s*',
-        r'^ENC:\s*',
-        r'^ODP:\s*',
-        r'^PD:\s*',
-        r'^SV:\s*',
-        r'^VS:\s*',
-        r'^VB:\s*',
-        r'^RES:\s*',
-        r'^Automatic reply:\s*',
-        r'^Out of Office:\s*',
-        r'^OOO:\s*',
-        r'^\[EXTERNAL\]\s*',
-        r'^\[External\]\s*',
-        r'^\[external\]\s*',
-        r'^\[SPAM\]\s*',
-        r'^\[Spam\]\s*',
-        r'^\[spam\]\s*'
-    ]
-    cleaned = summary
-    changed = True
-    max_iterations = 10
-    iteration = 0
-    while changed and iteration < max_iterations:
-        changed = False
-        for prefix_pattern in prefixes_to_remove:
-            new_cleaned = re.sub(prefix_pattern, '', cleaned)
-            if new_cleaned != cleaned:
-                cleaned = new_cleaned.strip()
-                changed = True
-                break
-        iteration += 1
-    if cleaned != original_summary:
-        log.info(f"Cleaned summary from [{original_summary}] to [{cleaned}]")
+    cleaned = summary_normaliser.strip_reply_prefixes(summary)
+    if cleaned != summary:
+        log.info(f"Cleaned summary from [{summary}] to [{cleaned}]")
     else:
         log.info("Summary already clean, no prefixes removed")
     return cleaned
@@ -165,9 +122,54 @@ def get_tickets_by_summary(log, http_client, cwpsa_base_url, cwpsa_base_url_path
     log.info("No matching tickets found")
     return []
 
+def fetch_updated_tickets(log, http_client, cwpsa_base_url, cwpsa_base_url_path, since):
+    conditions = f"lastUpdated >= [{since}]" if since else "closedFlag=false"
+    fields = "id,summary,company/id,board/id,board/name,parentTicketId,mergedParentTicketId,closedFlag,_info/lastUpdated"
+    log.info(f"Fetching tickets for duplicate index with conditions [{conditions}]")
+    tickets = []
+    page = 1
+    while True:
+        endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/tickets?conditions={urllib.parse.quote(conditions)}&fields={fields}&orderBy=id asc&pageSize=1000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
+        if not response:
+            return None
+        page_tickets = response.json()
+        tickets.extend(page_tickets)
+        if len(page_tickets) < 1000:
+            return tickets
+        page += 1
+
+def fetch_open_ticket_ids(log, http_client, cwpsa_base_url, cwpsa_base_url_path):
+    log.info("Fetching open ticket IDs to prune the duplicate index")
+    ticket_ids = []
+    page = 1
+    while True:
+        endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/tickets?conditions={urllib.parse.quote('closedFlag=false')}&fields=id&orderBy=id asc&pageSize=1000&page={page}"
+        response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
+        if not response:
+            return None
+        page_tickets = response.json()
+        ticket_ids.extend(ticket.get("id") for ticket in page_tickets)
+        if len(page_tickets) < 1000:
+            return ticket_ids
+        page += 1
+
+def find_duplicate_tickets(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticket, cleaned_summary):
+    refreshed = ticket_index.refresh(
+        log,
+        lambda since: fetch_updated_tickets(log, http_client, cwpsa_base_url, cwpsa_base_url_path, since),
+        lambda: fetch_open_ticket_ids(log, http_client, cwpsa_base_url, cwpsa_base_url_path)
+    )
+    if not refreshed:
+        log.warning("Duplicate index unavailable, falling back to exact summary search")
+        return get_tickets_by_summary(log, http_client, cwpsa_base_url, cwpsa_base_url_path, cleaned_summary)
+    company_id = ticket.get("company", {}).get("id")
+    board_id = ticket.get("board", {}).get("id")
+    return ticket_index.find_similar(log, company_id, board_id, cleaned_summary)
+
 def get_board_statuses(log, http_client, cwpsa_base_url, cwpsa_base_url_path, board_id):
     log.info(f"Retrieving statuses for board ID [{board_id}]")
-    endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/boards/{board_id}/statuses"
+    endpoint = f"{cwpsa_base_url}{cwpsa_base_url_path}/service/boards/{board_id}/statuses?pageSize=1000"
     response = execute_api_call(log, http_client, "get", endpoint, integration_name="cw_psa")
     if response:
         try:
@@ -176,19 +178,16 @@ def get_board_statuses(log, http_client, cwpsa_base_url, cwpsa_base_url_path, bo
             return statuses
         except Exception as e:
             log.exception(e, f"Failed to parse board statuses response")
-            return []
+            return None
     log.warning(f"Failed to retrieve statuses for board [{board_id}]")
-    return []
-
-def get_status_id_by_name(log, statuses, status_name):
-    for status in statuses:
-        if status.get("name", "").lower() == status_name.lower():
-            status_id = status.get("id")
-            log.info(f"Found status ID [{status_id}] for status name [{status_name}]")
-            return status_id
-    log.warning(f"Status [{status_name}] not found in board statuses")
     return None
 
+def get_board_status_id(log, http_client, cwpsa_base_url, cwpsa_base_url_path, board_id, status_name):
+    status_id = cwpsa_reference.get_id(log, "statuses", status_name, lambda: get_board_statuses(log, http_client, cwpsa_base_url, cwpsa_base_url_path, board_id), scope=board_id)
+    if status_id:
+        log.info(f"Found status ID [{status_id}] for status name [{status_name}]")
+    return status_id
+
 def update_ticket_board(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticket_id, board_id):
     log.info(f"Moving ticket [{ticket_id}] to board ID [{board_id}]")
     patch_data = [
@@ -333,7 +332,7 @@ def main():
         cleaned_summary = clean_ticket_summary(log, current_summary)
         data_to_log["ticket_summary_cleaned"] = cleaned_summary
 
-        matching_tickets = get_tickets_by_summary(log, http_client, cwpsa_base_url, cwpsa_base_url_path, cleaned_summary)
+        matching_tickets = find_duplicate_tickets(log, http_client, cwpsa_base_url, cwpsa_base_url_path, current_ticket, cleaned_summary)
         
         if not matching_tickets or len(matching_tickets) == 0:
             record_result(log, ResultLevel.INFO, f"No duplicate tickets found with summary [{cleaned_summary}]")
@@ -371,12 +370,7 @@ def main():
         log.info(f"Parent ticket board: [{parent_board_name}] (ID: {parent_board_id})")
 
         if operation == "Merge":
-            board_statuses = get_board_statuses(log, http_client, cwpsa_base_url, cwpsa_base_url_path, parent_board_id)
-            if not board_statuses:
-                record_result(log, ResultLevel.WARNING, f"Failed to retrieve statuses for parent board [{parent_board_name}]")
-                return
-
-            target_status_id = get_status_id_by_name(log, board_statuses, ticket_status)
+            target_status_id = get_board_status_id(log, http_client, cwpsa_base_url, cwpsa_base_url_path, parent_board_id, ticket_status)
             if not target_status_id:
                 record_result(log, ResultLevel.WARNING, f"Status [{ticket_status}] not found in parent board [{parent_board_name}]")
                 return
@@ -418,12 +412,7 @@ def main():
                     child_board_id = parent_board_id
                     child_board_name = parent_board_name
 
-            board_statuses = get_board_statuses(log, http_client, cwpsa_base_url, cwpsa_base_url_path, child_board_id)
-            if not board_statuses:
-                record_result(log, ResultLevel.WARNING, f"Failed to retrieve statuses for child board [{child_board_name}]")
-                return
-
-            target_status_id = get_status_id_by_name(log, board_statuses, ticket_status)
+            target_status_id = get_board_status_id(log, http_client, cwpsa_base_url, cwpsa_base_url_path, child_board_id, ticket_status)
             if not target_status_id:
                 record_result(log, ResultLevel.WARNING, f"Status [{ticket_status}] not found in child board [{child_board_name}]")
                 return
@@ -10,6 +10,11 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import exo_session_pool
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
 
 log = Logger()
 http_client = HttpClient()
@@ -57,7 +62,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -95,7 +100,9 @@ def execute_powershell(log, command, shell="pwsh", debug_mode=False, timeout=Non
             log.info(f"Executing {shell} command: {sanitized_cmd[:100]}{'...' if len(sanitized_cmd) > 100 else ''}")
         if debug_mode:
             log.info(f"Debug mode enabled for PowerShell execution")
-        result = subprocess.run([shell, "-Command", command], capture_output=True, text=True, timeout=timeout)
+        result = exo_session_pool.run(log, command, shell=shell, timeout=timeout)
+        if result is None:
+            result = subprocess.run([shell, "-Command", command], capture_output=True, text=True, timeout=timeout)
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
         if log_output and stdout and debug_mode:
@@ -125,7 +132,7 @@ def execute_powershell(log, command, shell="pwsh", debug_mode=False, timeout=Non
         log.exception(e, f"Exception occurred during {shell} execution")
         return False, str(e)
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = (f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3")
     response = execute_api_call(
@@ -143,7 +150,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
     log.error(f"Failed to retrieve secret [{secret_name}] Status code: {response.status_code if response else 'N/A'}")
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = (f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration")
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -154,11 +164,17 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
         log.error(f"Failed to extract tenant ID from domain [{azure_domain}]")
-        return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -187,17 +203,23 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_exo_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for EXO")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for EXO")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://outlook.office365.com/.default", log_prefix="EXO")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for EXO")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for EXO")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="EXO")
+
+    tenant_id, token = token_cache.get_token(log, "https://outlook.office365.com/.default", resolve_credentials, request_token, alias=(vault_name, f"{company_identifier}-ExchangeApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("EXO access token is malformed (missing dots)")
         return "", ""
@@ -338,6 +360,13 @@ def main():
             record_result(log, ResultLevel.WARNING, f"Failed to retrieve company identifier from ticket [{ticket_number}]")
             return
 
+        required_secrets = [f"{company_identifier}-PrimaryDomain"]
+        if company_identifier == "MIT":
+            required_secrets.append("MIT-AuthenticationCode")
+        if not exo_token:
+            required_secrets.extend([f"{company_identifier}-ExchangeApp-ClientID", f"{company_identifier}-ExchangeApp-ClientSecret"])
+        secret_cache.prefetch_secrets(log, vault_name, required_secrets, lambda worker_log, worker_http_client, name: fetch_secret_value(worker_log, worker_http_client, vault_name, name), HttpClient)
+
         if company_identifier == "MIT":
             if not validate_mit_authentication(log, http_client, vault_name, auth_code):
                 return
@@ -1,4 +1,5 @@
 ﻿import sys
+import json
 import random
 import re
 import subprocess
@@ -9,6 +10,12 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import exo_session_pool
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+from Common import exo_permission_index
 
 log = Logger()
 http_client = HttpClient()
@@ -58,7 +65,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -99,7 +106,9 @@ def execute_powershell(log, command, shell="pwsh", debug_mode=False, timeout=Non
         if debug_mode:
             log.info(f"Debug mode enabled for PowerShell execution")
             
-        result = subprocess.run([shell, "-Command", command], capture_output=True, text=True, timeout=timeout)
+        result = exo_session_pool.run(log, command, shell=shell, timeout=timeout)
+        if result is None:
+            result = subprocess.run([shell, "-Command", command], capture_output=True, text=True, timeout=timeout)
         
         stdout = result.stdout.strip()
         stderr = result.stderr.strip()
@@ -135,7 +144,7 @@ def execute_powershell(log, command, shell="pwsh", debug_mode=False, timeout=Non
         log.exception(e, f"Exception occurred during {shell} execution")
         return False, str(e)
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
     response = execute_api_call(log, http_client, "get", secret_url, integration_name="custom_wf_oauth2_client_creds")
@@ -146,7 +155,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
             return secret_value
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -159,12 +171,18 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
 
         log.error(f"Failed to extract tenant ID from domain [{azure_domain}]")
-        return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -197,44 +215,49 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Graph")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
     return tenant_id, token
 
 def get_exo_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for EXO")
-        return "", ""
-
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for EXO")
-        return "", ""
-
-    token = get_access_token(
-        log, http_client, tenant_id, client_id, client_secret,
-        scope="https://outlook.office365.com/.default", log_prefix="EXO"
-    )
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, f"{company_identifier}-ExchangeApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for EXO")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for EXO")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="EXO")
+
+    tenant_id, token = token_cache.get_token(log, "https://outlook.office365.com/.default", resolve_credentials, request_token, alias=(vault_name, f"{company_identifier}-ExchangeApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("EXO access token is malformed (missing dots)")
         return "", ""
-
     return tenant_id, token
 
 def get_company_data_from_ticket(log, http_client, cwpsa_base_url, cwpsa_base_url_path, ticket_number):
@@ -430,6 +453,88 @@ def add_exo_mailbox_permissions(log, azure_domain, user_email, mailbox, access,
             return success, [(ResultLevel.WARNING, msg)]
     return success, []
 
+def add_exo_mailbox_permissions_batch(log, azure_domain, user_email, user_id, mailboxes, access_level, exo_access_token, auto_mapping):
+    log.info(f"Adding [{access_level}] permission for user [{user_email}] on [{len(mailboxes)}] mailboxes in a single batch")
+    auto_mapping_flag = "$true" if auto_mapping else "$false"
+    mapped_access = access_level.replace(" ", "")
+    mailbox_list = ",".join("'" + m.replace("'", "''") + "'" for m in mailboxes)
+    recipient_filter = " -or ".join(
+        f"(PrimarySmtpAddress -eq ''{m}'') -or (Alias -eq ''{m}'') -or (DisplayName -eq ''{m}'')"
+        for m in (m.replace("'", "''''") for m in mailboxes)
+    )
+
+    if access_level == "Send on Behalf":
+        grant_cmd = f'Set-Mailbox -Identity $identity -GrantSendOnBehalfTo "{user_id}" -Confirm:$false -ErrorAction Stop'
+    elif access_level == "Send As":
+        grant_cmd = f"Add-RecipientPermission -Identity $identity -Trustee '{user_email}' -AccessRights SendAs -Confirm:$false -ErrorAction Stop -WarningAction SilentlyContinue -WarningVariable warnings"
+    else:
+        grant_cmd = f'Add-MailboxPermission -Identity $identity -User "{user_email}" -AccessRights {mapped_access} -AutoMapping {auto_mapping_flag} -Confirm:$false -ErrorAction Stop'
+
+    ps_command = f"""$ErrorActionPreference = 'Stop'
+    Import-Module ExchangeOnlineManagement
+    Connect-ExchangeOnline -AccessToken '{exo_access_token}' -Organization '{azure_domain}' -ShowBanner:$false
+    $requested = @({mailbox_list})
+    $recipients = @(Get-Recipient -Filter '{recipient_filter}' -ResultSize Unlimited -ErrorAction SilentlyContinue)
+    $results = @()
+    foreach ($mailbox in $requested) {{
+        $match = $recipients | Where-Object {{ $_.PrimarySmtpAddress -eq $mailbox -or $_.Alias -eq $mailbox -or $_.DisplayName -eq $mailbox }} | Select-Object -First 1
+        $identity = if ($match) {{ $match.PrimarySmtpAddress.ToString() }} else {{ $mailbox }}
+        $warnings = $null
+        try {{
+            {grant_cmd} | Out-Null
+            if ($warnings -and $warnings -like "*appropriate access control entry is already present*") {{
+                $results += @{{ mailbox = $mailbox; resolved = $identity; status = 'exists'; error = '' }}
+            }} else {{
+                $results += @{{ mailbox = $mailbox; resolved = $identity; status = 'success'; error = '' }}
+            }}
+        }} catch {{
+            $errorMsg = $_.Exception.Message
+            if ($errorMsg -like "*already has*" -or $errorMsg -like "*already exists*") {{
+                $results += @{{ mailbox = $mailbox; resolved = $identity; status = 'exists'; error = '' }}
+            }} else {{
+                $results += @{{ mailbox = $mailbox; resolved = $identity; status = 'failed'; error = $errorMsg }}
+            }}
+        }}
+    }}
+    Write-Output "BATCH_RESULTS:$(ConvertTo-Json -InputObject @($results) -Compress)"
+    Disconnect-ExchangeOnline -Confirm:$false"""
+
+    success, output = execute_powershell(log, ps_command, ignore_stderr_warnings=True)
+    if not success:
+        return False, []
+
+    batch_results = None
+    for line in (output or "").splitlines():
+        if line.startswith("BATCH_RESULTS:"):
+            try:
+                batch_results = json.loads(line.replace("BATCH_RESULTS:", "", 1))
+            except json.JSONDecodeError:
+                log.error(f"Unable to parse batch results: {line[:200]}")
+    if batch_results is None:
+        log.warning("Batch permission script returned no results")
+        return False, []
+    if isinstance(batch_results, dict):
+        batch_results = [batch_results]
+
+    outcomes = []
+    for entry in batch_results:
+        mailbox = entry.get("mailbox", "")
+        status = entry.get("status", "")
+        if status == "exists":
+            msg = f"{user_email} already has {access_level} on {mailbox}"
+            log.info(msg)
+            outcomes.append((mailbox, ResultLevel.SUCCESS, msg))
+        elif status == "success":
+            msg = f"{user_email} given {access_level} to {mailbox}"
+            log.info(msg)
+            outcomes.append((mailbox, ResultLevel.SUCCESS, msg))
+        else:
+            error_msg = entry.get("error", "")
+            msg = f"Failed to give {access_level} to {user_email} on {mailbox}" + (f": {error_msg}" if error_msg else "")
+            log.warning(msg)
+            outcomes.append((mailbox, ResultLevel.WARNING, msg))
+    return True, outcomes
+
 def remove_exo_mailbox_permissions(log, azure_domain, user_email, mailbox, access, exo_access_token):
     log.info(f"Removing [{access}] permission for user [{user_email}] on mailbox [{mailbox}]")
     if access in ["SendAs", "SendOnBehalfOf"]:
@@ -505,34 +610,79 @@ def remove_exo_mailbox_permissions(log, azure_domain, user_email, mailbox, acces
 
     return True, results
 
+def get_exo_trustee_grants(log, azure_domain, user_email, exo_access_token):
+    def run_exo_script(script_log, script):
+        ps_command = f"""$ErrorActionPreference = 'Stop'
+    Import-Module ExchangeOnlineManagement
+    Connect-ExchangeOnline -AccessToken '{exo_access_token}' -Organization '{azure_domain}' -ShowBanner:$false
+    {script}
+    Disconnect-ExchangeOnline -Confirm:$false"""
+        return execute_powershell(script_log, ps_command, log_command=False, log_output=False)
+
+    grants = exo_permission_index.get_trustee_grants(log, azure_domain, user_email, run_exo_script)
+    if grants is None:
+        log.warning("Mailbox permission index unavailable, falling back to a full mailbox scan")
+    return grants
+
 def remove_exo_all_mailbox_permissions(log, azure_domain, user_email, exo_access_token):
     log.info(f"Removing FullAccess permissions for user [{user_email}]")
+    grants = get_exo_trustee_grants(log, azure_domain, user_email, exo_access_token)
+    if grants is not None:
+        log.info(f"Found [{len(grants['FullAccess'])}] FullAccess grants for [{user_email}] in permission index")
+        if grants["Incomplete"]:
+            log.info(f"Checking [{len(grants['Incomplete'])}] mailboxes missing from the permission index directly")
+        # Index hits are confirmed live before removal, alongside the mailboxes the index could not read
+        candidates = list(dict.fromkeys([mailbox for mailbox, _ in grants["FullAccess"]] + grants["Incomplete"]))
+        candidate_list = json.dumps(candidates).replace("'", "''")
+        scan_script = f'''$candidates = @('{candidate_list}' | ConvertFrom-Json)
+        foreach ($mailbox in $candidates) {{
+            try {{
+                $permissions = @(Get-MailboxPermission -Identity $mailbox -User $UPN -ErrorAction Stop | Where-Object {{ $_.IsInherited -eq $false -and $_.AccessRights.Count -gt 0 }})
+            }} catch {{
+                $Unchecked += $mailbox
+                continue
+            }}
+            foreach ($perm in $permissions) {{
+                $Found = $true
+                Write-Output "DEBUG: Has access to: $mailbox - $($perm.AccessRights -join ',')"
+                try {{
+                    Remove-MailboxPermission -Identity $mailbox -User $UPN -AccessRights $perm.AccessRights -Confirm:$false -ErrorAction Stop
+                    $Success += "$($mailbox):$($perm.AccessRights -join ',')"
+                }} catch {{
+                    $Failed += "$($mailbox):$($perm.AccessRights -join ',')"
+                }}
+            }}
+        }}'''
+    else:
+        scan_script = '''$mailboxes = Get-Mailbox -ResultSize Unlimited
+        foreach ($mailbox in $mailboxes) {
+            $permissions = Get-MailboxPermission -Identity $mailbox.UserPrincipalName | Where-Object { $_.User -eq $UPN -and $_.IsInherited -eq $false -and $_.AccessRights.Count -gt 0 }
+            foreach ($perm in $permissions) {
+                $Found = $true
+                Write-Output "DEBUG: Has access to: $($mailbox.UserPrincipalName) - $($perm.AccessRights -join ',')"
+                try {
+                    Remove-MailboxPermission -Identity $mailbox.UserPrincipalName -User $perm.User -AccessRights $perm.AccessRights -Confirm:$false -ErrorAction Stop
+                    $Success += "$($mailbox.UserPrincipalName):$($perm.AccessRights -join ',')"
+                } catch {
+                    $Failed += "$($mailbox.UserPrincipalName):$($perm.AccessRights -join ',')"
+                }
+            }
+        }'''
     ps_command = f'''$ErrorActionPreference = 'Stop'
     Import-Module ExchangeOnlineManagement
     Connect-ExchangeOnline -AccessToken '{exo_access_token}' -Organization '{azure_domain}' -ShowBanner:$false
     $UPN = "{user_email}"
     $Success = @()
     $Failed = @()
+    $Unchecked = @()
     $Found = $false
     try {{
-        $mailboxes = Get-Mailbox -ResultSize Unlimited
-        foreach ($mailbox in $mailboxes) {{
-            $permissions = Get-MailboxPermission -Identity $mailbox.UserPrincipalName | Where-Object {{ $_.User -eq $UPN -and $_.IsInherited -eq $false -and $_.AccessRights.Count -gt 0 }}
-            foreach ($perm in $permissions) {{
-                $Found = $true
-                Write-Output "DEBUG: Has access to: $($mailbox.UserPrincipalName) - $($perm.AccessRights -join ',')"
-                try {{
-                    Remove-MailboxPermission -Identity $mailbox.UserPrincipalName -User $perm.User -AccessRights $perm.AccessRights -Confirm:$false -ErrorAction Stop
-                    $Success += "$($mailbox.UserPrincipalName):$($perm.AccessRights -join ',')"
-                }} catch {{
-                    $Failed += "$($mailbox.UserPrincipalName):$($perm.AccessRights -join ',')"
-                }}
-            }}
-        }}
+        {scan_script}
     }} catch {{
         Write-Output "Error removing mailbox access permissions for $($UPN): $_"
     }}
     Disconnect-ExchangeOnline -Confirm:$false
+    if ($Unchecked.Count -gt 0) {{ Write-Output "Unchecked on: $($Unchecked -join ', ')" }}
     if (-not $Found) {{ Write-Output "NO_PERMISSIONS_FOUND" }}
     if ($Success.Count -gt 0) {{ Write-Output "Removed from: $($Success -join ', ')" }}
     if ($Failed.Count -gt 0) {{ Write-Output "Failed on: $($Failed -join ', ')" }}'''
@@ -541,10 +691,13 @@ def remove_exo_all_mailbox_permissions(log, azure_domain, user_email, exo_access
     if not success:
         return False, "PowerShell execution failed"
 
+    unchecked = []
     for line in output.splitlines():
         if line.startswith("DEBUG: Has access to:"):
             log.info(line)
-        elif line == "NO_PERMISSIONS_FOUND":
+        elif line.startswith("Unchecked on:"):
+            unchecked = [e.strip() for e in line.replace("Unchecked on: ", "").split(",") if e.strip()]
+        elif line == "NO_PERMISSIONS_FOUND" and not unchecked:
             return True, f"No FullAccess permissions found to remove for {user_email}"
         elif line.startswith("Removed from:"):
             for entry in line.replace("Removed from: ", "").split(","):
@@ -566,10 +719,22 @@ def remove_exo_all_mailbox_permissions(log, azure_domain, user_email, exo_access
                     data_to_log.setdefault("Failed", "")
                     data_to_log["Failed"] += ("\n" if data_to_log["Failed"] else "") + msg
 
+    if unchecked:
+        msg = f"FullAccess permissions for {user_email} could not be checked on: {', '.join(unchecked)}"
+        log.warning(msg)
+        return False, msg
     return True, f"FullAccess permissions removal complete for {user_email}"
 
 def remove_exo_all_sendonbehalfof_permissions(log, azure_domain, user_email, exo_access_token):
     log.info(f"Removing SendOnBehalfOf permissions for user [{user_email}]")
+    grants = get_exo_trustee_grants(log, azure_domain, user_email, exo_access_token)
+    if grants is not None:
+        log.info(f"Found [{len(grants['SendOnBehalfOf'])}] SendOnBehalfOf grants for [{user_email}] in permission index")
+        targets = json.dumps(grants["SendOnBehalfOf"]).replace("'", "''")
+        scan_script = f'''$mailboxes = @('{targets}' | ConvertFrom-Json | ForEach-Object {{ [pscustomobject]@{{ UserPrincipalName = $_ }} }})'''
+    else:
+        scan_script = '''$userGuid = (Get-Mailbox -Identity $UPN -ErrorAction Stop).ExternalDirectoryObjectId
+        $mailboxes = Get-Mailbox -ResultSize Unlimited | Where-Object { $_.GrantSendOnBehalfTo -contains $userGuid }'''
     ps_command = f'''$ErrorActionPreference = 'Stop'
     Import-Module ExchangeOnlineManagement
     Connect-ExchangeOnline -AccessToken '{exo_access_token}' -Organization '{azure_domain}' -ShowBanner:$false
@@ -578,8 +743,7 @@ def remove_exo_all_sendonbehalfof_permissions(log, azure_domain, user_email, exo
     $Failed = @()
     $Found = $false
     try {{
-        $userGuid = (Get-Mailbox -Identity $UPN -ErrorAction Stop).ExternalDirectoryObjectId
-        $mailboxes = Get-Mailbox -ResultSize Unlimited | Where-Object {{ $_.GrantSendOnBehalfTo -contains $userGuid }}
+        {scan_script}
         foreach ($mailbox in $mailboxes) {{
             $Found = $true
             Write-Output "DEBUG: Has access to: $($mailbox.UserPrincipalName)"
@@ -1068,6 +1232,15 @@ def main():
             record_result(log, ResultLevel.WARNING, f"Failed to retrieve company identifier for ticket [{ticket_number}]")
             return
 
+        required_secrets = [f"{company_identifier}-PrimaryDomain"]
+        if company_identifier == "MIT":
+            required_secrets.append("MIT-AuthenticationCode")
+        if not graph_token:
+            required_secrets.extend(["MIT-PartnerApp-ClientID", "MIT-PartnerApp-ClientSecret"])
+        if not exo_token:
+            required_secrets.extend([f"{company_identifier}-ExchangeApp-ClientID", f"{company_identifier}-ExchangeApp-ClientSecret"])
+        secret_cache.prefetch_secrets(log, vault_name, required_secrets, lambda worker_log, worker_http_client, name: fetch_secret_value(worker_log, worker_http_client, vault_name, name), HttpClient)
+
         if company_identifier == "MIT":
             if not validate_mit_authentication(log, http_client, vault_name, auth_code):
                 return
@@ -1118,27 +1291,36 @@ def main():
                 record_result(log, ResultLevel.WARNING, "No valid mailbox or access provided")
                 return
 
-            for mailbox in mailboxes:
-                results = []
-                if access_level == "Send on Behalf":
-                    success, res = add_exo_sendonbehalfof_permissions(log, azure_domain, user_email, user_id, mailbox, exo_access_token)
-                    results.extend(res)
-                    if success:
-                        record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
-                elif access_level == "Send As":
-                    success, res = add_exo_sendas_permissions(log, azure_domain, user_email, mailbox, exo_access_token)
-                    results.extend(res)
-                    if success:
+            batch_success, outcomes = add_exo_mailbox_permissions_batch(log, azure_domain, user_email, user_id, mailboxes, access_level, exo_access_token, auto_mapping)
+            if batch_success:
+                for mailbox, level, msg in outcomes:
+                    if level == ResultLevel.SUCCESS:
                         record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
-                else:
-                    mapped_access = access_level.replace(" ", "")
-                    success, res = add_exo_mailbox_permissions(log, azure_domain, user_email, mailbox, mapped_access, exo_access_token, auto_mapping)
-                    results.extend(res)
-                    if success:
-                        record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
-                for level, msg in results:
-                    if level != ResultLevel.SUCCESS:
+                    else:
                         record_result(log, level, msg)
+            else:
+                log.warning("Batch permission grant failed, falling back to per-mailbox processing")
+                for mailbox in mailboxes:
+                    results = []
+                    if access_level == "Send on Behalf":
+                        success, res = add_exo_sendonbehalfof_permissions(log, azure_domain, user_email, user_id, mailbox, exo_access_token)
+                        results.extend(res)
+                        if success:
+                            record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
+                    elif access_level == "Send As":
+                        success, res = add_exo_sendas_permissions(log, azure_domain, user_email, mailbox, exo_access_token)
+                        results.extend(res)
+                        if success:
+                            record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
+                    else:
+                        mapped_access = access_level.replace(" ", "")
+                        success, res = add_exo_mailbox_permissions(log, azure_domain, user_email, mailbox, mapped_access, exo_access_token, auto_mapping)
+                        results.extend(res)
+                        if success:
+                            record_result(log, ResultLevel.SUCCESS, f"[{user_email}] granted [{access_level}] permission to mailbox [{mailbox}]")
+                    for level, msg in results:
+                        if level != ResultLevel.SUCCESS:
+                            record_result(log, level, msg)
 
         elif operation == "Remove Mailbox Permissions":
             mailboxes = [m.strip() for m in mailboxes_raw.split(",") if m.strip()]
@@ -1161,7 +1343,9 @@ def main():
         elif operation == "Remove All Mailbox Permissions":
             log.info("Starting: Remove All Explicit Mailbox Permissions")
             success, message = remove_exo_all_mailbox_permissions(log, azure_domain, user_email, exo_access_token)
-            if "No " in message:
+            if not success:
+                record_result(log, ResultLevel.WARNING, f"FullAccess removal for [{user_email}] is incomplete: {message}")
+            elif "No " in message:
                 record_result(log, ResultLevel.SUCCESS, f"No FullAccess permissions found to remove for [{user_email}]")
             else:
                 record_result(log, ResultLevel.SUCCESS if success else ResultLevel.WARNING, f"[{user_email}] had all FullAccess permissions removed from all mailboxes")
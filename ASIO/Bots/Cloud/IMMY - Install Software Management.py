@@ -5,9 +5,16 @@ import os
 import time
 import urllib.parse
 import requests
+import json
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+from Common import immy_computer_index
+from Common import worker_pool
 
 log = Logger()
 http_client = HttpClient()
@@ -23,6 +30,7 @@ msgraph_base_url_beta_path = "/beta"
 vault_name = "PLACEHOLDER-akv1"
 immy_base_url = "https://PLACEHOLDER.immy.bot"
 immy_tenant_url = "PLACEHOLDER.com.au"
+max_immy_workers = 4
 
 data_to_log = {}
 bot_name = "IMMY - Install Software"
@@ -55,7 +63,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -81,7 +89,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
 
     secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
@@ -96,7 +104,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
     log.error(f"Failed to retrieve secret [{secret_name}] Status code: {response.status_code if response else 'N/A'}")
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -109,12 +120,18 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
 
         log.error(f"Failed to extract tenant ID from domain [{azure_domain}]")
-        return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -173,17 +190,23 @@ def get_company_data_from_ticket(log, http_client, cwpsa_base_url, cwpsa_base_ur
     return "", "", 0, []
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Graph")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
@@ -234,48 +257,66 @@ def validate_mit_authentication(log, http_client, vault_name, auth_code):
 
     return True
 
-def get_immy_endpoint(log, http_client, base_url, user_email, bearer_token):
-    selected_computers = []
+def fetch_immy_computers(log, http_client, base_url, bearer_token, filter_expression=None):
     endpoint = f"{base_url}/api/v1/computers/dx"
     headers = {
         "Authorization": bearer_token,
         "Content-Type": "application/json"
     }
+    page_size = 500
 
-    all_computers = []
-    skip = 0
-    page_size = 100
-    more_records = True
-
-    while more_records:
+    def fetch_page(page_log, page_http_client, skip, require_total=False):
+        # Pages are fetched concurrently, so a stable sort keeps skip/take from skipping or repeating computers
         params = {
             "skip": skip,
-            "take": page_size
+            "take": page_size,
+            "sort": json.dumps([{"selector": "id", "desc": False}])
         }
+        if filter_expression:
+            params["filter"] = json.dumps(filter_expression)
+        if require_total:
+            params["requireTotalCount"] = "true"
 
-        response = execute_api_call(log, http_client, "get", endpoint, headers=headers, params=params)
+        response = execute_api_call(page_log, page_http_client, "get", endpoint, headers=headers, params=params)
+        if not response:
+            return None
+        try:
+            return response.json()
+        except Exception as e:
+            page_log.exception(e, "Failed to parse ImmyBot computers response")
+            return None
 
-        if response:
-            try:
-                data = response.json()
-                batch = data.get("data", [])
-                all_computers.extend(batch)
-
-                if len(batch) < page_size:
-                    more_records = False
-                else:
-                    skip += page_size
-            except Exception as e:
-                log.exception(e, "Failed to parse ImmyBot computers response")
-                more_records = False
-        else:
-            
-            more_records = False
+    first_page = fetch_page(log, http_client, 0, require_total=True)
+    if first_page is None:
+        return None
+    all_computers = list(first_page.get("data", []))
+    total_count = first_page.get("totalCount")
+
+    if total_count is None:
+        skip = page_size
+        batch = all_computers
+        while len(batch) == page_size:
+            page = fetch_page(log, http_client, skip)
+            if page is None:
+                return None
+            batch = page.get("data", [])
+            all_computers.extend(batch)
+            skip += page_size
+        return all_computers
+
+    skips = list(range(page_size, total_count, page_size))
+    pages = worker_pool.run_in_pool(log, lambda worker_log, skip: fetch_page(worker_log, worker_pool.get_worker_http_client(HttpClient), skip), skips, max_immy_workers)
+    for page in pages:
+        if page is None:
+            return None
+        all_computers.extend(page.get("data", []))
+    return all_computers
 
-    selected_computers = [
-        computer for computer in all_computers
-        if (computer.get("primaryUserEmail") or "").lower() == user_email.lower()
-    ]
+def get_immy_endpoint(log, http_client, base_url, user_email, bearer_token):
+    selected_computers = immy_computer_index.get_computers_for_email(
+        log, base_url, user_email,
+        lambda filter_expression: fetch_immy_computers(log, http_client, base_url, bearer_token, filter_expression)
+    ) or []
 
     for comp in selected_computers:
         log.info(f"Computer matched: {comp.get('computerName')} - {comp.get('primaryUserEmail')}")
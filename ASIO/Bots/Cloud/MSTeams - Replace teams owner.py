@@ -8,6 +8,12 @@ import requests
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+from Common import graph_batch
+from Common import worker_pool
 
 log = Logger()
 http_client = HttpClient()
@@ -19,6 +25,7 @@ cwpsa_base_url_path = "/v4_6_release/apis/3.0"
 msgraph_base_url_base = "https://graph.microsoft.com"
 msgraph_base_url_path = "/v1.0"
 vault_name = "PLACEHOLDER-akv1"
+max_graph_workers = 4
 
 data_to_log = {}
 bot_name = "MSTeams - Replace teams owner"
@@ -53,7 +60,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -80,7 +87,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
     response = execute_api_call(log, http_client, "get", secret_url, integration_name="custom_wf_oauth2_client_creds")
@@ -92,7 +99,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
     log.error(f"Failed to retrieve secret [{secret_name}] Status code: {response.status_code if response else 'N/A'}")
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -103,11 +113,17 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
         log.error(f"Failed to extract tenant ID from domain [{azure_domain}]")
-        return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -134,17 +150,23 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Graph")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
@@ -218,26 +240,35 @@ def get_aad_user_data(log, http_client, msgraph_base_url_base, msgraph_base_url_
     log.error(f"Failed to resolve user ID and email for [{user_identifier}]")
     return "", "", "", False
 
+def execute_graph_batch(log, http_client, headers, batch_requests):
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/$batch"
+    post_batch = lambda worker_log, chunk: execute_api_call(worker_log, worker_pool.get_worker_http_client(HttpClient), "post", endpoint, data={"requests": chunk}, headers=headers)
+    return graph_batch.execute_graph_batch(log, post_batch, batch_requests, max_workers=max_graph_workers)
+
 def get_user_owned_teams(log, http_client, msgraph_base_url, user_id, token):
     log.info(f"Retrieving teams where user [{user_id}] is an owner")
-    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/users/{user_id}/memberOf/microsoft.graph.group?$filter=resourceProvisioningOptions/Any(x:x eq 'Team')&$select=id,displayName"
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/users/{user_id}/ownedObjects/microsoft.graph.group?$select=id,displayName,resourceProvisioningOptions"
     headers = {"Authorization": f"Bearer {token}"}
-    response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
-    if response:
-        teams = response.json().get("value", [])
-        owned_teams = []
-        for team in teams:
-            team_id = team.get("id")
-            owners_endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/groups/{team_id}/owners"
-            owners_response = execute_api_call(log, http_client, "get", owners_endpoint, headers=headers)
-            if owners_response and owners_response.status_code == 200:
-                owners = owners_response.json().get("value", [])
-                if any(owner.get("id") == user_id for owner in owners):
-                    owned_teams.append({"id": team_id, "displayName": team.get("displayName")})
-        log.info(f"User [{user_id}] owns [{len(owned_teams)}] teams")
-        return owned_teams
-    log.error(f"Failed to retrieve user teams for [{user_id}]")
-    return []
+    owned_teams = []
+    while endpoint:
+        response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
+        if not response:
+            log.error(f"Failed to retrieve owned groups for [{user_id}]")
+            return []
+        data = response.json()
+        for group in data.get("value", []):
+            if "Team" in (group.get("resourceProvisioningOptions") or []):
+                owned_teams.append({"id": group.get("id"), "displayName": group.get("displayName")})
+        endpoint = data.get("@odata.nextLink")
+    log.info(f"User [{user_id}] owns [{len(owned_teams)}] teams")
+    return owned_teams
+
+def get_team_owners(log, http_client, team_ids, token):
+    log.info(f"Retrieving owners for [{len(team_ids)}] teams")
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    batch_requests = [{"id": str(i), "method": "GET", "url": f"/groups/{team_id}/owners?$select=id"} for i, team_id in enumerate(team_ids)]
+    results, _ = execute_graph_batch(log, http_client, headers, batch_requests)
+    return {team_ids[int(request_id)]: [owner.get("id") for owner in body.get("value", [])] for request_id, body in results.items()}
 
 def remove_user_as_owner(log, http_client, msgraph_base_url, team_id, user_id, token):
     log.info(f"Removing user [{user_id}] as owner from team [{team_id}]")
@@ -250,14 +281,15 @@ def remove_user_as_owner(log, http_client, msgraph_base_url, team_id, user_id, t
     log.error(f"Failed to remove user [{user_id}] as owner from team [{team_id}]")
     return False
 
-def replace_team_owner(log, http_client, msgraph_base_url, team_id, new_owner_id, token):
+def replace_team_owner(log, http_client, msgraph_base_url, team_id, new_owner_id, token, remaining_owners=None):
     log.info(f"Checking team [{team_id}] for existing owners")
     headers = {"Authorization": f"Bearer {token}"}
-    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/groups/{team_id}/owners"
-    response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
-    if response:
-        owners = response.json().get("value", [])
-        if owners:
+    if remaining_owners is None:
+        endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/groups/{team_id}/owners"
+        response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
+        remaining_owners = [owner.get("id") for owner in response.json().get("value", [])] if response else None
+    if remaining_owners is not None:
+        if remaining_owners:
             log.info(f"Team [{team_id}] already has an owner")
             return False
         add_endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/groups/{team_id}/owners/$ref"
@@ -358,11 +390,20 @@ def main():
             record_result(log, ResultLevel.SUCCESS, f"User [{user_email}] has no owner roles to remove")
             return
 
+        team_owners = get_team_owners(log, http_client, [team["id"] for team in owned_teams], graph_access_token)
+
+        def process_team(worker_log, team):
+            worker_http_client = worker_pool.get_worker_http_client(HttpClient)
+            removed = remove_user_as_owner(worker_log, worker_http_client, msgraph_base_url, team["id"], user_id, graph_access_token)
+            if not removed:
+                return None
+            owners = team_owners.get(team["id"])
+            remaining_owners = [owner_id for owner_id in owners if owner_id != user_id] if owners is not None else None
+            return replace_team_owner(worker_log, worker_http_client, msgraph_base_url, team["id"], new_owner_id, graph_access_token, remaining_owners)
+
         updated_teams = []
-        for team in owned_teams:
-            removed = remove_user_as_owner(log, http_client, msgraph_base_url, team["id"], user_id, graph_access_token)
-            if removed:
-                replaced = replace_team_owner(log, http_client, msgraph_base_url, team["id"], new_owner_id, graph_access_token)
+        for team, replaced in zip(owned_teams, worker_pool.run_in_pool(log, process_team, owned_teams, max_graph_workers)):
+            if replaced is not None:
                 updated_teams.append((team["displayName"], replaced))
                 data_to_log[f"Team_{team['displayName']}"] = "Owner replaced" if replaced else "Owner added"
 
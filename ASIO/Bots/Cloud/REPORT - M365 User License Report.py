@@ -2,6 +2,7 @@
 import random
 import os
 import base64
+import csv
 import time
 import urllib.parse
 import requests
@@ -9,6 +10,12 @@ from datetime import datetime, timedelta, timezone
 from cw_rpa import Logger, Input, HttpClient, ResultLevel
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import token_cache
+from Common import secret_cache
+from Common import tenant_cache
+from Common import http_session
+from Common import graph_batch
+from Common import sku_catalogue
 
 log = Logger()
 http_client = HttpClient()
@@ -57,7 +64,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
                         request_args["data"] = data
                     else:
                         request_args["json"] = data
-                response = getattr(requests, method)(**request_args)
+                response = http_session.request(method, **request_args)
 
             if 200 <= response.status_code < 300:
                 return response
@@ -84,7 +91,7 @@ def execute_api_call(log, http_client, method, endpoint, data=None, retries=5, i
             return None
     return None
 
-def get_secret_value(log, http_client, vault_name, secret_name):
+def fetch_secret_value(log, http_client, vault_name, secret_name):
     log.info(f"Fetching secret [{secret_name}] from Key Vault [{vault_name}]")
     secret_url = f"https://{vault_name}.vault.azure.net/secrets/{secret_name}?api-version=7.3"
     response = execute_api_call(log, http_client, "get", secret_url, integration_name="custom_wf_oauth2_client_creds")
@@ -96,7 +103,10 @@ def get_secret_value(log, http_client, vault_name, secret_name):
     log.error(f"Failed to retrieve secret [{secret_name}] Status code: {response.status_code if response else 'N/A'}")
     return ""
 
-def get_tenant_id_from_domain(log, http_client, azure_domain):
+def get_secret_value(log, http_client, vault_name, secret_name):
+    return secret_cache.get_secret(log, vault_name, secret_name, lambda name: fetch_secret_value(log, http_client, vault_name, name))
+
+def fetch_tenant_id_from_domain(log, http_client, azure_domain):
     try:
         config_url = f"https://login.windows.net/{azure_domain}/.well-known/openid-configuration"
         log.info(f"Fetching OpenID configuration from [{config_url}]")
@@ -107,11 +117,17 @@ def get_tenant_id_from_domain(log, http_client, azure_domain):
             if tenant_id:
                 log.info(f"Successfully extracted tenant ID [{tenant_id}]")
                 return tenant_id
+        if response is not None and tenant_cache.is_unknown_tenant(response):
+            log.error(f"Domain [{azure_domain}] is not a known Azure AD tenant")
+            return ""
         log.error(f"Failed to extract tenant ID from domain [{azure_domain}]")
-        return ""
+        return None
     except Exception as e:
         log.exception(e, "Exception while extracting tenant ID from domain")
-        return ""
+        return None
+
+def get_tenant_id_from_domain(log, http_client, azure_domain):
+    return tenant_cache.get_tenant_id(log, azure_domain, lambda domain: fetch_tenant_id_from_domain(log, http_client, domain))
 
 def get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Token"):
     log.info(f"[{log_prefix}] Requesting access token for scope [{scope}]")
@@ -138,17 +154,23 @@ def get_access_token(log, http_client, tenant_id, client_id, client_secret, scop
     return ""
 
 def get_graph_token(log, http_client, vault_name, company_identifier):
-    client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
-    client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
-    azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
-    if not all([client_id, client_secret, azure_domain]):
-        log.error("Failed to retrieve required secrets for MS Graph")
-        return "", ""
-    tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
-    if not tenant_id:
-        log.error("Failed to resolve tenant ID for MS Graph")
-        return "", ""
-    token = get_access_token(log, http_client, tenant_id, client_id, client_secret, scope="https://graph.microsoft.com/.default", log_prefix="Graph")
+    def resolve_credentials():
+        client_id = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientID")
+        client_secret = get_secret_value(log, http_client, vault_name, "MIT-PartnerApp-ClientSecret")
+        azure_domain = get_secret_value(log, http_client, vault_name, f"{company_identifier}-PrimaryDomain")
+        if not all([client_id, client_secret, azure_domain]):
+            log.error("Failed to retrieve required secrets for MS Graph")
+            return "", "", ""
+        tenant_id = get_tenant_id_from_domain(log, http_client, azure_domain)
+        if not tenant_id:
+            log.error("Failed to resolve tenant ID for MS Graph")
+            return "", "", ""
+        return tenant_id, client_id, client_secret
+
+    def request_token(tenant_id, client_id, client_secret, scope):
+        return get_access_token(log, http_client, tenant_id, client_id, client_secret, scope=scope, log_prefix="Graph")
+
+    tenant_id, token = token_cache.get_token(log, "https://graph.microsoft.com/.default", resolve_credentials, request_token, alias=(vault_name, "MIT-PartnerApp-ClientID", company_identifier))
     if not isinstance(token, str) or "." not in token:
         log.error("MS Graph access token is malformed (missing dots)")
         return "", ""
@@ -237,66 +259,76 @@ def send_email(log, http_client, msgraph_base_url, access_token, sender_email, r
         log.exception(e, "Exception occurred while sending email via Graph")
         return False
 
+def get_subscribed_sku_map(log, http_client, headers):
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/subscribedSkus?$select=skuId,skuPartNumber"
+    response = execute_api_call(log, http_client, "get", endpoint, headers=headers)
+    if not response or response.status_code != 200:
+        log.warning("Failed to fetch subscribed SKUs")
+        return None
+    subscribed_skus = {sku.get("skuId", ""): sku.get("skuPartNumber", "") for sku in response.json().get("value", []) if sku.get("skuId")}
+    log.info(f"Loaded [{len(subscribed_skus)}] subscribed SKUs")
+    return subscribed_skus
+
+def execute_graph_batch(log, http_client, headers, batch_requests):
+    endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/$batch"
+    post_batch = lambda worker_log, chunk: execute_api_call(worker_log, http_client, "post", endpoint, data={"requests": chunk}, headers=headers)
+    return graph_batch.execute_graph_batch(log, post_batch, batch_requests)
+
+def get_license_details_batched(log, http_client, headers, users):
+    batch_requests = [{"id": str(i), "method": "GET", "url": f"/users/{user['id']}/licenseDetails?$select=skuPartNumber"} for i, user in enumerate(users)]
+    results, _ = execute_graph_batch(log, http_client, headers, batch_requests)
+    return {users[int(request_id)]["id"]: [entry.get("skuPartNumber", "") for entry in body.get("value", [])] for request_id, body in results.items()}
+
+def get_page_user_skus(log, http_client, headers, users, subscribed_skus):
+    if subscribed_skus is not None:
+        return {user["id"]: [subscribed_skus.get(assigned.get("skuId", ""), assigned.get("skuId", "")) for assigned in user.get("assignedLicenses", [])] for user in users}
+    return get_license_details_batched(log, http_client, headers, [user for user in users if user.get("assignedLicenses")])
+
 def generate_user_license_report(log, http_client, msgraph_base_url, access_token):
+    report_path = "/opt/app/RPA-execute/UserLicenseReport.csv"
     try:
         log.info("Generating user license report")
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
-        sku_url = "https://mitazu1pubfilestore.blob.core.windows.net/automation/M365SKU.csv"
-        sku_response = execute_api_call(log, http_client, "get", sku_url)
-        sku_map = {}
-        if sku_response and sku_response.status_code == 200:
-            from io import StringIO
-            import pandas as pd
-            sku_df = pd.read_csv(StringIO(sku_response.text))
-            sku_map = {row["SKU"]: row["PN"] for _, row in sku_df.iterrows() if row.get("SKU") and row.get("PN")}
-        else:
-            log.warning("Could not load SKU mapping. License names will default to raw SKU")
-        users = []
-        next_link = f"{msgraph_base_url_base}{msgraph_base_url_path}/users?$select=displayName,userPrincipalName,id&$top=999"
-        while next_link:
-            response = execute_api_call(log, http_client, "get", next_link, headers=headers)
-            if response:
+        sku_map = sku_catalogue.get_sku_names(log)
+        subscribed_skus = get_subscribed_sku_map(log, http_client, headers)
+        if subscribed_skus is None:
+            log.info("Falling back to batched licenseDetails lookups")
+        user_count = 0
+        row_count = 0
+        with open(report_path, "w", newline="", encoding="utf-8") as report_file:
+            writer = csv.writer(report_file)
+            writer.writerow(["Display Name", "UPN Domain", "License Name"])
+            next_link = f"{msgraph_base_url_base}{msgraph_base_url_path}/users?$select=displayName,userPrincipalName,id,assignedLicenses&$top=999"
+            while next_link:
+                response = execute_api_call(log, http_client, "get", next_link, headers=headers)
+                if not response:
+                    log.warning("Failed to fetch users")
+                    break
                 data = response.json()
-                users.extend(data.get("value", []))
                 next_link = data.get("@odata.nextLink", None)
-            else:
-                log.warning("Failed to fetch users")
-                break
-        if not users:
+                users = [user for user in data.get("value", []) if user.get("id")]
+                user_count += len(users)
+                user_skus = get_page_user_skus(log, http_client, headers, users, subscribed_skus)
+                for user in users:
+                    display_name = user.get("displayName", "")
+                    user_upn = user.get("userPrincipalName", "")
+                    upn_domain = user_upn.split("@")[-1].replace(".com.au", "") if "@" in user_upn else ""
+                    for sku_id in user_skus.get(user["id"], []):
+                        sku_id = sku_id.strip()
+                        writer.writerow([display_name, upn_domain, sku_map.get(sku_id, sku_id)])
+                        row_count += 1
+        if not user_count:
             log.warning("No users found")
+            os.remove(report_path)
             return ""
-        rows = []
-        for user in users:
-            display_name = user.get("displayName", "")
-            user_id = user.get("id", "")
-            user_upn = user.get("userPrincipalName", "")
-            upn_domain = user_upn.split("@")[-1].replace(".com.au", "") if "@" in user_upn else ""
-            if not user_id:
-                continue
-            license_endpoint = f"{msgraph_base_url_base}{msgraph_base_url_path}/users/{user_id}/licenseDetails"
-            license_response = execute_api_call(log, http_client, "get", license_endpoint, headers=headers)
-            if not license_response or license_response.status_code != 200:
-                continue
-            license_data = license_response.json().get("value", [])
-            for entry in license_data:
-                sku_id = entry.get("skuPartNumber", "").strip()
-                friendly_name = sku_map.get(sku_id, sku_id)
-                rows.append({
-                    "Display Name": display_name,
-                    "UPN Domain": upn_domain,
-                    "License Name": friendly_name
-                })
-        if not rows:
+        if not row_count:
             log.warning("No license data found")
+            os.remove(report_path)
             return ""
-        import pandas as pd
-        df = pd.DataFrame(rows)
-        report_path = "/opt/app/RPA-execute/UserLicenseReport.csv"
-        df.to_csv(report_path, index=False)
-        log.info(f"User license report saved to [{report_path}]")
+        log.info(f"User license report with [{row_count}] rows for [{user_count}] users saved to [{report_path}]")
         return report_path
     except Exception as e:
         log.exception(e, "Exception occurred while generating license report")
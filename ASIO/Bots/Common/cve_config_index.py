@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ttl_seconds = int(os.getenv("ASIO_CVE_CONFIG_INDEX_TTL", "600"))
+cache_dir = os.getenv("ASIO_CVE_CONFIG_INDEX_DIR", os.path.join(tempfile.gettempdir(), "asio_cve_config_index"))
+
+# One paged query per company and configuration type replaces a name search per CVE. The index is
+# shared between runs through a short-lived JSON file, and configurations created during a run are
+# written into it. An index miss is only a hint: configurations created elsewhere since the load are
+# not in it, so callers confirm a miss with a point query before creating anything.
+index_lock = threading.Lock()
+indexes = {}
+index_mtimes = {}
+
+def get_index_path(company_id, config_type):
+    return os.path.join(cache_dir, f"{company_id}_{config_type.strip().lower().replace(' ', '_')}.json")
+
+def get_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+def read_index(log, path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable configuration index [{path}]: {str(e)}")
+        return None
+    return index if time.time() - index.get("loaded_at", 0) <= ttl_seconds else None
+
+def write_index(log, path, index):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.warning(f"Unable to write configuration index [{path}]: {str(e)}")
+
+@contextmanager
+def file_lock(path):
+    # index_lock covers threads, this covers other runs updating the same index file
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def get_entry(config):
+    answers = {str(question.get("questionId")): question.get("answer") for question in config.get("questions") or [] if question.get("questionId") is not None}
+    return {"id": config.get("id"), "name": config.get("name", ""), "answers": answers}
+
+def get_index(log, company_id, config_type, fetch_configurations):
+    key = (company_id, config_type)
+    with index_lock:
+        path = get_index_path(company_id, config_type)
+        index = indexes.get(key)
+        # A newer file means another run created configurations since this copy was loaded
+        if index and time.time() - index["loaded_at"] <= ttl_seconds and get_mtime(path) <= index_mtimes.get(key, 0):
+            return index["configs"]
+
+        index = read_index(log, path)
+        if index is None:
+            configs = fetch_configurations()
+            if configs is None:
+                return None
+            index = {"loaded_at": time.time(), "configs": {}}
+            for config in configs:
+                index["configs"].setdefault((config.get("name") or "").strip().upper(), get_entry(config))
+            with file_lock(path):
+                # Keep entries another run added while this one was loading
+                current = read_index(log, path)
+                if current:
+                    index["configs"].update(current["configs"])
+                write_index(log, path, index)
+            log.info(f"Indexed [{len(index['configs'])}] [{config_type}] configurations for company [{company_id}]")
+        indexes[key] = index
+        index_mtimes[key] = get_mtime(path)
+        return index["configs"]
+
+def find_configuration(log, company_id, config_type, name, fetch_configurations):
+    configs = get_index(log, company_id, config_type, fetch_configurations)
+    if configs is None:
+        return None, False
+    return configs.get(name.strip().upper()), True
+
+def add_configuration(log, company_id, config_type, config):
+    key = (company_id, config_type)
+    with index_lock:
+        path = get_index_path(company_id, config_type)
+        with file_lock(path):
+            index = read_index(log, path) or indexes.get(key)
+            if index is None:
+                return
+            index["configs"][(config.get("name") or "").strip().upper()] = get_entry(config)
+            indexes[key] = index
+            write_index(log, path, index)
+            index_mtimes[key] = get_mtime(path)
@@ -0,0 +1,145 @@
+import glob
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+db_path = os.getenv("ASIO_CVE_STORE_PATH", os.path.join(tempfile.gettempdir(), "asio_cve_store.sqlite3"))
+feed_dir = os.getenv("ASIO_CVE_FEED_DIR", "")
+delta_interval_seconds = int(os.getenv("ASIO_CVE_DELTA_INTERVAL", str(2 * 3600)))
+failure_backoff_seconds = int(os.getenv("ASIO_CVE_FAILURE_BACKOFF", "900"))
+max_delta_days = 120
+max_pull_days = int(os.getenv("ASIO_CVE_MAX_PULL_DAYS", "7"))
+
+# CVE records are stored in the NVD 2.0 "cve" shape, which is also what the VulnCheck nist-nvd2 index
+# returns under "data". Bulk feed files seed the store and lastModified deltas keep it current, so
+# individual lookups are local reads.
+store_lock = threading.Lock()
+refreshed_at = 0
+
+def get_connection():
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS cves (id TEXT PRIMARY KEY, last_modified TEXT, data TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return connection
+
+def get_meta(connection, key, default=None):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def set_meta(connection, key, value):
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def iter_feed_records(data):
+    if isinstance(data, dict):
+        items = data.get("vulnerabilities") or data.get("data") or []
+    else:
+        items = data
+    for item in items:
+        record = item.get("cve", item) if isinstance(item, dict) else None
+        if record and record.get("id"):
+            yield record
+
+def store_records(connection, records):
+    rows = [(record["id"].upper(), record.get("lastModified", ""), json.dumps(record)) for record in records]
+    connection.executemany(
+        "INSERT INTO cves (id, last_modified, data) VALUES (?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET last_modified = excluded.last_modified, data = excluded.data "
+        "WHERE excluded.last_modified >= cves.last_modified",
+        rows
+    )
+    return rows
+
+def advance_watermark(connection, rows):
+    watermark = get_meta(connection, "watermark", "")
+    latest = max((row[1] for row in rows if row[1]), default="")
+    if latest > watermark:
+        set_meta(connection, "watermark", latest)
+
+def import_feeds(log, connection):
+    if not feed_dir or not os.path.isdir(feed_dir):
+        return 0
+    imported = 0
+    for path in sorted(glob.glob(os.path.join(feed_dir, "*.json")) + glob.glob(os.path.join(feed_dir, "*.json.gz"))):
+        key = f"feed:{os.path.basename(path)}"
+        mtime = str(os.path.getmtime(path))
+        if get_meta(connection, key) == mtime:
+            continue
+        try:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                rows = store_records(connection, iter_feed_records(json.load(f)))
+        except (ValueError, OSError) as e:
+            log.warning(f"Skipping unreadable CVE feed [{path}]: {str(e)}")
+            continue
+        advance_watermark(connection, rows)
+        set_meta(connection, key, mtime)
+        connection.commit()
+        imported += len(rows)
+        log.info(f"Imported [{len(rows)}] CVE records from feed [{os.path.basename(path)}]")
+    return imported
+
+def refresh(log, fetch_modified_since):
+    global refreshed_at
+    with store_lock:
+        if time.time() - refreshed_at < delta_interval_seconds:
+            return
+        connection = get_connection()
+        try:
+            import_feeds(log, connection)
+            last_delta = float(get_meta(connection, "last_delta", "0"))
+            watermark = get_meta(connection, "watermark")
+            if not watermark:
+                # Without a bulk feed, start tracking changes from now so records fetched on demand stay current
+                watermark = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+                set_meta(connection, "watermark", watermark)
+                set_meta(connection, "last_delta", time.time())
+                connection.commit()
+            elif time.time() - float(get_meta(connection, "delta_failed_at", "0")) < failure_backoff_seconds:
+                log.info("CVE delta pull failed recently, serving stored records")
+            elif time.time() - last_delta >= delta_interval_seconds:
+                # NVD caps lastModified ranges at 120 days, older stores need a new bulk feed. A lagging store
+                # catches up max_pull_days per refresh so no single lookup pays for the whole backlog.
+                now = datetime.now(timezone.utc)
+                since = max(datetime.fromisoformat(watermark[:19]).replace(tzinfo=timezone.utc), now - timedelta(days=max_delta_days))
+                until = min(now, since + timedelta(days=max_pull_days))
+                records = fetch_modified_since(since, until)
+                if records is None:
+                    log.warning(f"CVE delta pull since [{watermark}] failed, serving stored records")
+                    set_meta(connection, "delta_failed_at", time.time())
+                    connection.commit()
+                else:
+                    rows = store_records(connection, records)
+                    set_meta(connection, "watermark", until.strftime("%Y-%m-%dT%H:%M:%S"))
+                    if until == now:
+                        set_meta(connection, "last_delta", time.time())
+                    connection.commit()
+                    log.info(f"CVE store updated with [{len(rows)}] records modified between [{since.strftime('%Y-%m-%d %H:%M')}] and [{until.strftime('%Y-%m-%d %H:%M')}]")
+            refreshed_at = time.time()
+        finally:
+            connection.close()
+
+def get_cve(log, cve_id, fetch_cve=None):
+    cve_id = cve_id.strip().upper()
+    connection = get_connection()
+    try:
+        row = connection.execute("SELECT data FROM cves WHERE id = ?", (cve_id,)).fetchone()
+        if row:
+            return json.loads(row[0])
+        if not fetch_cve:
+            return None
+        log.info(f"CVE [{cve_id}] not in local store, fetching")
+        record = fetch_cve(cve_id)
+        if record:
+            with store_lock:
+                store_records(connection, [record])
+                connection.commit()
+        return record
+    finally:
+        connection.close()
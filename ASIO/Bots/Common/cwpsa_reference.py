@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+db_path = os.getenv("ASIO_CWPSA_REFERENCE_PATH", os.path.join(tempfile.gettempdir(), "asio_cwpsa_reference.sqlite3"))
+ttl_seconds = int(os.getenv("ASIO_CWPSA_REFERENCE_TTL", str(24 * 3600)))
+
+# Boards, statuses, priorities, configuration types and company types rarely change, so name -> id maps
+# are kept in SQLite across runs and in memory within a run. Statuses are scoped by board id.
+cache_lock = threading.Lock()
+name_maps = {}
+
+def get_connection():
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS reference (
+            kind TEXT,
+            scope TEXT,
+            name TEXT,
+            id INTEGER,
+            PRIMARY KEY (kind, scope, name)
+        );
+        CREATE TABLE IF NOT EXISTS loaded (
+            kind TEXT,
+            scope TEXT,
+            loaded_at REAL,
+            PRIMARY KEY (kind, scope)
+        );
+    """)
+    return connection
+
+def read_map(connection, kind, scope):
+    row = connection.execute("SELECT loaded_at FROM loaded WHERE kind = ? AND scope = ?", (kind, scope)).fetchone()
+    if not row or time.time() - row[0] > ttl_seconds:
+        return None
+    rows = connection.execute("SELECT name, id FROM reference WHERE kind = ? AND scope = ?", (kind, scope)).fetchall()
+    return dict(rows)
+
+def write_map(connection, kind, scope, records):
+    name_map = {}
+    for record in records:
+        name = (record.get("name") or "").strip().lower()
+        if name and name not in name_map:
+            name_map[name] = record.get("id")
+    connection.execute("DELETE FROM reference WHERE kind = ? AND scope = ?", (kind, scope))
+    connection.executemany("INSERT INTO reference (kind, scope, name, id) VALUES (?, ?, ?, ?)", [(kind, scope, name, record_id) for name, record_id in name_map.items()])
+    connection.execute("INSERT OR REPLACE INTO loaded (kind, scope, loaded_at) VALUES (?, ?, ?)", (kind, scope, time.time()))
+    connection.commit()
+    return name_map
+
+def get_name_map(log, kind, fetch_records, scope="", force_refresh=False):
+    scope = str(scope)
+    with cache_lock:
+        if not force_refresh and (kind, scope) in name_maps:
+            return name_maps[(kind, scope)]
+        connection = get_connection()
+        try:
+            name_map = None if force_refresh else read_map(connection, kind, scope)
+            if name_map is None:
+                records = fetch_records()
+                if records is None:
+                    log.warning(f"Failed to load CWPSA [{kind}] reference data for scope [{scope}]")
+                    return None
+                name_map = write_map(connection, kind, scope, records)
+                log.info(f"Cached [{len(name_map)}] CWPSA [{kind}] entries for scope [{scope}]")
+        finally:
+            connection.close()
+        name_maps[(kind, scope)] = name_map
+        return name_map
+
+def get_id(log, kind, name, fetch_records, scope=""):
+    key = (name or "").strip().lower()
+    name_map = get_name_map(log, kind, fetch_records, scope)
+    if name_map is None:
+        return None
+    if key not in name_map:
+        # A miss may be a record created or renamed since the cache was filled, so reload once before giving up
+        name_map = get_name_map(log, kind, fetch_records, scope, force_refresh=True)
+        if name_map is None or key not in name_map:
+            log.warning(f"CWPSA [{kind}] entry [{name}] not found for scope [{scope}]")
+            return None
+    return name_map[key]
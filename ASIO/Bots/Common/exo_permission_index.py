@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+from Common import worker_pool
+
+entry_ttl_seconds = 3600
+chunk_size = 250
+max_workers = 4
+cache_dir = os.getenv("ASIO_EXO_PERMISSION_INDEX_DIR", "")
+cache_encryption_key = os.getenv("ASIO_EXO_PERMISSION_INDEX_KEY", "")
+
+data_marker = "INDEX_DATA:"
+indexes = {}
+index_lock = threading.Lock()
+
+# Add-MailboxPermission does not reliably bump a mailbox's WhenChanged, so a changed WhenChanged only triggers an
+# early re-read. Every mailbox's FullAccess entries are also re-read once they are older than entry_ttl_seconds.
+list_mailboxes_script = """
+$mailboxes = Get-EXOMailbox -ResultSize Unlimited -Properties WhenChanged,GrantSendOnBehalfTo,ExternalDirectoryObjectId
+$items = @($mailboxes | ForEach-Object {
+    @{
+        upn = $_.UserPrincipalName
+        id = $_.ExternalDirectoryObjectId
+        changed = $_.WhenChanged.ToUniversalTime().ToString('o')
+        send_on_behalf = @($_.GrantSendOnBehalfTo | ForEach-Object { "$_" })
+    }
+})
+Write-Output ("INDEX_DATA:" + (ConvertTo-Json -InputObject $items -Compress -Depth 4))
+"""
+
+permissions_script = """
+$identities = '{identities}' | ConvertFrom-Json
+$items = @(foreach ($identity in $identities) {{
+    try {{
+        $permissions = Get-EXOMailboxPermission -Identity $identity -ErrorAction Stop | Where-Object {{ $_.IsInherited -eq $false -and $_.User -ne 'NT AUTHORITY\\SELF' -and $_.AccessRights.Count -gt 0 }}
+        @{{ upn = $identity; ok = $true; full_access = @($permissions | ForEach-Object {{ @{{ user = "$($_.User)"; rights = @($_.AccessRights | ForEach-Object {{ "$_" }}) }} }}) }}
+    }} catch {{
+        @{{ upn = $identity; ok = $false; full_access = @() }}
+    }}
+}})
+Write-Output ("INDEX_DATA:" + (ConvertTo-Json -InputObject $items -Compress -Depth 5))
+"""
+
+def get_cipher(log):
+    if not cache_dir or not cache_encryption_key:
+        return None
+    if Fernet is None:
+        log.warning("Mailbox permission index disk cache requested but the cryptography package is not installed")
+        return None
+    try:
+        return Fernet(cache_encryption_key.encode())
+    except Exception as e:
+        log.warning(f"Mailbox permission index key is invalid: {str(e)}")
+        return None
+
+def get_index_path(azure_domain):
+    return os.path.join(cache_dir, f"{azure_domain.strip().lower()}.bin")
+
+def load_index(log, azure_domain):
+    key = azure_domain.strip().lower()
+    if key in indexes:
+        return indexes[key]
+    cipher = get_cipher(log)
+    path = get_index_path(azure_domain) if cipher else ""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            return json.loads(cipher.decrypt(f.read()).decode())
+    except (InvalidToken, ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable mailbox permission index [{path}]: {str(e)}")
+        return {}
+
+def save_index(log, azure_domain, index):
+    # The index maps every mailbox to its delegates, so it only reaches disk encrypted, as the token cache does
+    indexes[azure_domain.strip().lower()] = index
+    cipher = get_cipher(log)
+    if not cipher:
+        return
+    path = get_index_path(azure_domain)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(cipher.encrypt(json.dumps(index).encode()))
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.warning(f"Unable to write mailbox permission index [{path}]: {str(e)}")
+
+def parse_index_data(output):
+    for line in output.splitlines():
+        if line.startswith(data_marker):
+            data = json.loads(line[len(data_marker):])
+            return data if isinstance(data, list) else [data]
+    return None
+
+def fetch_full_access(log, run_exo_script, identities):
+    success, output = run_exo_script(log, permissions_script.format(identities=json.dumps(identities).replace("'", "''")))
+    items = parse_index_data(output) if success else None
+    if items is None:
+        log.warning(f"Failed to read FullAccess permissions for [{len(identities)}] mailboxes")
+        return {}
+    return {item["upn"]: item.get("full_access") or [] for item in items if item.get("ok")}
+
+def refresh_index(log, azure_domain, run_exo_script):
+    index = load_index(log, azure_domain)
+    if "mailboxes" not in index:
+        log.info(f"Building mailbox permission index for [{azure_domain}]")
+        index = {"mailboxes": {}}
+
+    success, output = run_exo_script(log, list_mailboxes_script)
+    listing = parse_index_data(output) if success else None
+    if listing is None:
+        log.error(f"Failed to list mailboxes for [{azure_domain}]")
+        return None
+
+    known = index["mailboxes"]
+    mailboxes = {}
+    stale = []
+    now = time.time()
+    for item in listing:
+        upn = item.get("upn")
+        if not upn:
+            continue
+        entry = known.get(upn)
+        if entry and entry.get("changed") == item.get("changed") and "full_access" in entry and now - entry.get("checked_at", 0) < entry_ttl_seconds:
+            mailboxes[upn] = entry
+        else:
+            mailboxes[upn] = {"changed": item.get("changed")}
+            stale.append(upn)
+        mailboxes[upn]["id"] = item.get("id") or ""
+        mailboxes[upn]["send_on_behalf"] = item.get("send_on_behalf") or []
+
+    log.info(f"Mailbox permission index for [{azure_domain}]: [{len(mailboxes)}] mailboxes, [{len(stale)}] to refresh")
+    if stale:
+        chunks = [stale[i:i + chunk_size] for i in range(0, len(stale), chunk_size)]
+        for permissions in worker_pool.run_in_pool(log, lambda worker_log, chunk: fetch_full_access(worker_log, run_exo_script, chunk), chunks, max_workers):
+            for upn, full_access in (permissions or {}).items():
+                mailboxes[upn]["full_access"] = full_access
+                mailboxes[upn]["checked_at"] = now
+
+    index["mailboxes"] = mailboxes
+    with index_lock:
+        save_index(log, azure_domain, index)
+    return index
+
+def get_trustee_grants(log, azure_domain, user_email, run_exo_script):
+    index = refresh_index(log, azure_domain, run_exo_script)
+    if index is None:
+        return None
+
+    mailboxes = index["mailboxes"]
+    trustee = user_email.strip().lower()
+    trustee_ids = {trustee}
+    for upn, entry in mailboxes.items():
+        if upn.lower() == trustee and entry.get("id"):
+            trustee_ids.add(entry["id"].lower())
+
+    full_access = []
+    send_on_behalf = []
+    incomplete = []
+    for upn, entry in mailboxes.items():
+        if "full_access" not in entry:
+            incomplete.append(upn)
+        for permission in entry.get("full_access", []):
+            if permission.get("user", "").lower() in trustee_ids:
+                full_access.append((upn, permission.get("rights", [])))
+        if any(value.lower() in trustee_ids for value in entry.get("send_on_behalf", [])):
+            send_on_behalf.append(upn)
+
+    # Mailboxes whose FullAccess entries could not be read are returned so callers check them live
+    if incomplete:
+        log.warning(f"FullAccess permissions could not be read for [{len(incomplete)}] mailboxes: {', '.join(incomplete[:20])}")
+    return {"FullAccess": full_access, "SendOnBehalfOf": send_on_behalf, "Incomplete": incomplete}
@@ -0,0 +1,260 @@
+import atexit
+import base64
+import hashlib
+import json
+import queue
+import re
+import subprocess
+import threading
+import time
+
+enabled = True
+max_workers_per_session = 2
+max_sessions = 4
+connect_timeout = 180
+
+reply_marker = "<<EXO-POOL>>"
+
+token_pattern = re.compile(r"eyJ[a-zA-Z0-9_-]{5,}\.[a-zA-Z0-9_-]{5,}\.[a-zA-Z0-9_-]*")
+organization_pattern = re.compile(r"-Organization\s+(['\"])([^'\"]+)\1", re.IGNORECASE)
+exit_pattern = re.compile(r"^\s*exit\b", re.IGNORECASE | re.MULTILINE)
+
+# Worker loop executed by each pooled pwsh process. Requests and replies are single JSON lines; the
+# worker connects once and then shadows Connect/Disconnect-ExchangeOnline with a no-op alias so the
+# bots' existing scripts run unchanged against the already connected session.
+worker_script = r"""
+$ProgressPreference = 'SilentlyContinue'
+$marker = '<<EXO-POOL>>'
+function Send-PoolReply($reply) {
+    [Console]::Out.WriteLine($marker + ($reply | ConvertTo-Json -Compress -Depth 3))
+    [Console]::Out.Flush()
+}
+function Skip-ExoSessionCommand { }
+while ($null -ne ($line = [Console]::In.ReadLine())) {
+    $request = $line | ConvertFrom-Json
+    $reply = @{ id = $request.id; returncode = 0; stdout = ''; stderr = '' }
+    if ($request.op -eq 'connect') {
+        try {
+            Import-Module ExchangeOnlineManagement -ErrorAction Stop
+            ExchangeOnlineManagement\Connect-ExchangeOnline -AccessToken $request.token -Organization $request.organization -ShowBanner:$false -ErrorAction Stop
+            Set-Alias -Name Connect-ExchangeOnline -Value Skip-ExoSessionCommand -Scope Global
+            Set-Alias -Name Disconnect-ExchangeOnline -Value Skip-ExoSessionCommand -Scope Global
+        } catch {
+            $reply.returncode = 1
+            $reply.stderr = "$_"
+        }
+    } elseif ($request.op -eq 'run') {
+        $script = [Text.Encoding]::UTF8.GetString([Convert]::FromBase64String($request.script))
+        $output = [System.Collections.Generic.List[object]]::new()
+        $errors = [System.Collections.Generic.List[string]]::new()
+        try {
+            & ([scriptblock]::Create($script)) *>&1 | ForEach-Object {
+                if ($_ -is [System.Management.Automation.ErrorRecord]) { $errors.Add("$_") }
+                elseif ($_ -is [System.Management.Automation.WarningRecord]) { $errors.Add("WARNING: $($_.Message)") }
+                elseif ($_ -is [System.Management.Automation.VerboseRecord] -or $_ -is [System.Management.Automation.DebugRecord]) { }
+                else { $output.Add($_) }
+            }
+        } catch {
+            $errors.Add("$_")
+            $reply.returncode = 1
+        }
+        $reply.stdout = ($output | Out-String -Width 4096).Trim()
+        $reply.stderr = ($errors -join "`n").Trim()
+    } elseif ($request.op -eq 'exit') {
+        try { ExchangeOnlineManagement\Disconnect-ExchangeOnline -Confirm:$false -ErrorAction SilentlyContinue } catch { }
+        Send-PoolReply $reply
+        break
+    }
+    Send-PoolReply $reply
+}
+"""
+
+sessions = {}
+starting = {}
+sessions_lock = threading.Condition()
+
+class ExoSessionWorker:
+    def __init__(self, shell, organization):
+        encoded_script = base64.b64encode(worker_script.encode("utf-16-le")).decode()
+        self.organization = organization
+        self.busy = False
+        self.last_used = time.monotonic()
+        self.request_id = 0
+        self.lines = queue.Queue()
+        self.process = subprocess.Popen(
+            [shell, "-NoLogo", "-NoProfile", "-NonInteractive", "-EncodedCommand", encoded_script],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", bufsize=1
+        )
+        threading.Thread(target=self.read_output, daemon=True).start()
+
+    def read_output(self):
+        for line in self.process.stdout:
+            self.lines.put(line.rstrip("\r\n"))
+        self.lines.put(None)
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def request(self, payload, timeout=None):
+        self.request_id += 1
+        payload["id"] = self.request_id
+        self.process.stdin.write(json.dumps(payload) + "\n")
+        self.process.stdin.flush()
+
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                self.kill()
+                raise subprocess.TimeoutExpired("exo_session_pool", timeout)
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                raise RuntimeError(f"Exchange Online session worker exited (returncode={self.process.poll()})")
+            if not line.startswith(reply_marker):
+                continue
+            reply = json.loads(line[len(reply_marker):])
+            if reply.get("id") == self.request_id:
+                return reply
+
+    def close(self):
+        if not self.is_alive():
+            return
+        try:
+            self.request({"op": "exit"}, timeout=30)
+            self.process.wait(timeout=10)
+        except Exception:
+            self.kill()
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except Exception:
+            pass
+
+def get_session_key(shell, command):
+    token_match = token_pattern.search(command)
+    organization_match = organization_pattern.search(command)
+    if not token_match or not organization_match:
+        return None, "", ""
+    token = token_match.group(0)
+    organization = organization_match.group(2)
+    key = (shell, organization.lower(), hashlib.sha256(token.encode()).hexdigest())
+    return key, organization, token
+
+def discard_worker(key, worker):
+    with sessions_lock:
+        workers = sessions.get(key, [])
+        if worker in workers:
+            workers.remove(worker)
+        if not workers:
+            sessions.pop(key, None)
+        sessions_lock.notify_all()
+    worker.kill()
+
+def evict_idle_sessions(key):
+    stale = []
+    with sessions_lock:
+        for other_key in list(sessions):
+            if other_key == key:
+                continue
+            same_tenant = other_key[:2] == key[:2]
+            over_capacity = len(sessions) > max_sessions
+            workers = sessions[other_key]
+            if (same_tenant or over_capacity) and not any(w.busy for w in workers):
+                stale.extend(sessions.pop(other_key))
+    for worker in stale:
+        worker.close()
+
+def acquire_worker(log, key, shell, organization, token):
+    with sessions_lock:
+        while True:
+            workers = sessions.setdefault(key, [])
+            for worker in list(workers):
+                if not worker.is_alive():
+                    workers.remove(worker)
+                elif not worker.busy:
+                    worker.busy = True
+                    return worker
+            if len(workers) + starting.get(key, 0) < max_workers_per_session:
+                break
+            sessions_lock.wait()
+        starting[key] = starting.get(key, 0) + 1
+
+    worker = None
+    try:
+        log.info(f"Starting pooled Exchange Online session for [{organization}]")
+        worker = ExoSessionWorker(shell, organization)
+        reply = worker.request({"op": "connect", "organization": organization, "token": token}, timeout=connect_timeout)
+        if reply.get("returncode") != 0:
+            log.warning(f"Pooled Exchange Online connect failed for [{organization}]: {reply.get('stderr', '')}")
+            worker.close()
+            worker = None
+        else:
+            log.info(f"Pooled Exchange Online session connected for [{organization}]")
+    except Exception as e:
+        log.warning(f"Unable to start pooled Exchange Online session for [{organization}]: {str(e)}")
+        if worker:
+            worker.kill()
+        worker = None
+
+    with sessions_lock:
+        starting[key] -= 1
+        if not starting[key]:
+            starting.pop(key)
+        if worker:
+            worker.busy = True
+            sessions.setdefault(key, []).append(worker)
+        elif not sessions.get(key):
+            sessions.pop(key, None)
+        sessions_lock.notify_all()
+
+    if worker:
+        evict_idle_sessions(key)
+    return worker
+
+def release_worker(worker):
+    with sessions_lock:
+        worker.busy = False
+        worker.last_used = time.monotonic()
+        sessions_lock.notify_all()
+
+def run(log, command, shell="pwsh", timeout=None):
+    if not enabled or "Connect-ExchangeOnline" not in command:
+        return None
+    if exit_pattern.search(command):
+        log.info("Script terminates the PowerShell host, using a dedicated process instead of the session pool")
+        return None
+
+    key, organization, token = get_session_key(shell, command)
+    if not key:
+        return None
+
+    worker = acquire_worker(log, key, shell, organization, token)
+    if not worker:
+        return None
+
+    encoded_command = base64.b64encode(command.encode("utf-8")).decode()
+    try:
+        reply = worker.request({"op": "run", "script": encoded_command}, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        discard_worker(key, worker)
+        raise
+    except Exception as e:
+        discard_worker(key, worker)
+        return subprocess.CompletedProcess([shell, "-Command", command], 1, "", str(e))
+
+    release_worker(worker)
+    return subprocess.CompletedProcess([shell, "-Command", command], reply.get("returncode", 1), reply.get("stdout", ""), reply.get("stderr", ""))
+
+def close_all():
+    with sessions_lock:
+        workers = [w for session_workers in sessions.values() for w in session_workers]
+        sessions.clear()
+    for worker in workers:
+        worker.close()
+
+atexit.register(close_all)
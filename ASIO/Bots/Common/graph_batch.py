@@ -0,0 +1,47 @@
+import time
+
+from Common import worker_pool
+
+max_batch_size = 20
+
+# Graph $batch accepts 20 sub-requests per call. Throttled sub-requests (429/503) are resubmitted after
+# the longest Retry-After seen, and any still throttled after the last attempt are reported as failures.
+# post_batch(worker_log, chunk) runs on pool threads when max_workers > 1, so it must not share the caller's HttpClient.
+def execute_graph_batch(log, post_batch, batch_requests, retries=5, max_workers=1):
+    results = {}
+    failures = {}
+    pending = list(batch_requests)
+    for attempt in range(retries):
+        if not pending:
+            break
+        chunks = [pending[i:i + max_batch_size] for i in range(0, len(pending), max_batch_size)]
+        responses = worker_pool.run_in_pool(log, post_batch, chunks, max_workers)
+
+        throttled = []
+        wait_time = 0
+        for chunk, response in zip(chunks, responses):
+            if not response or response.status_code != 200:
+                log.warning(f"Graph batch request failed for [{len(chunk)}] sub-requests")
+                for request in chunk:
+                    failures[request["id"]] = {"status": getattr(response, "status_code", 0), "body": {}}
+                continue
+            requests_by_id = {request["id"]: request for request in chunk}
+            for item in response.json().get("responses", []):
+                status = item.get("status", 0)
+                if status in [429, 503] and attempt < retries - 1:
+                    throttled.append(requests_by_id[item["id"]])
+                    retry_after = (item.get("headers") or {}).get("Retry-After")
+                    wait_time = max(wait_time, int(retry_after) if retry_after else 5 * (2 ** attempt))
+                elif 200 <= status < 300:
+                    results[item["id"]] = item.get("body") or {}
+                else:
+                    if status in [429, 503]:
+                        log.error(f"Graph batch sub-request [{item.get('id')}] still throttled after {retries} attempts")
+                    else:
+                        log.warning(f"Graph batch sub-request [{item.get('id')}] failed Status: {status}")
+                    failures[item["id"]] = {"status": status, "body": item.get("body") or {}}
+        pending = throttled
+        if pending:
+            log.warning(f"[{len(pending)}] batch sub-requests throttled. Retrying in {wait_time} seconds")
+            time.sleep(wait_time)
+    return results, failures
@@ -0,0 +1,83 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+    import h2
+except ImportError:
+    httpx = None
+
+connect_timeout = 10
+read_timeout = 60
+pool_connections = 16
+pool_maxsize = 32
+use_http2 = os.getenv("ASIO_HTTP2", "0") == "1"
+
+session_lock = threading.Lock()
+session = None
+http2_client = None
+
+class Http2Response:
+    # Callers test responses with "if response:" and .ok, so httpx responses behave like requests ones
+    def __init__(self, response):
+        self.response = response
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    @property
+    def ok(self):
+        return self.response.status_code < 400
+
+    def __bool__(self):
+        return self.ok
+
+def get_session():
+    global session
+    if session is None:
+        with session_lock:
+            if session is None:
+                new_session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+                new_session.mount("https://", adapter)
+                new_session.mount("http://", adapter)
+                session = new_session
+    return session
+
+def get_http2_client():
+    global http2_client
+    if http2_client is None:
+        with session_lock:
+            if http2_client is None:
+                http2_client = httpx.Client(
+                    http2=True,
+                    timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                    limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+                )
+    return http2_client
+
+def request(method, url, data=None, json=None, headers=None, params=None, timeout=None):
+    if use_http2 and httpx is not None:
+        content = data if isinstance(data, (str, bytes)) else None
+        form = data if not isinstance(data, (str, bytes)) else None
+        return Http2Response(get_http2_client().request(
+            method.upper(), url, content=content, data=form, json=json, headers=headers, params=params,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout) if timeout else httpx.USE_CLIENT_DEFAULT
+        ))
+    return get_session().request(
+        method.upper(), url, data=data, json=json, headers=headers, params=params,
+        timeout=timeout or (connect_timeout, read_timeout)
+    )
+
+def close():
+    global session, http2_client
+    with session_lock:
+        if session is not None:
+            session.close()
+            session = None
+        if http2_client is not None:
+            http2_client.close()
+            http2_client = None
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+cache_dir = os.getenv("ASIO_IMMY_COMPUTER_INDEX_DIR", os.path.join(tempfile.gettempdir(), "asio_immy_computer_index"))
+full_refresh_seconds = int(os.getenv("ASIO_IMMY_COMPUTER_INDEX_FULL_REFRESH", str(24 * 3600)))
+refresh_interval_seconds = int(os.getenv("ASIO_IMMY_COMPUTER_INDEX_REFRESH", "900"))
+indexed_fields = ("id", "computerName", "primaryUserEmail", "updatedDate")
+
+# Computers are held per Immy instance as id -> summary, with an in-memory primary user email map on top.
+# Lookups query Immy live with a primaryUserEmail filter, which is a single request and always reflects
+# deleted and reassigned computers. The index is only the fallback when that query fails, and between
+# daily rebuilds only computers updated since the last sync are re-read into it.
+index_lock = threading.Lock()
+email_maps = {}
+
+def get_index_path(base_url):
+    return os.path.join(cache_dir, f"{hashlib.sha256(base_url.strip().lower().encode()).hexdigest()[:16]}.json")
+
+def load_index(log, path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable Immy computer index [{path}]: {str(e)}")
+        return {}
+
+def save_index(log, path, index):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        log.warning(f"Unable to write Immy computer index [{path}]: {str(e)}")
+
+def merge_computers(index, computers):
+    for computer in computers:
+        if computer.get("id") is not None:
+            index["computers"][str(computer["id"])] = {field: computer.get(field) for field in indexed_fields}
+
+def refresh_index(log, base_url, fetch_computers):
+    path = get_index_path(base_url)
+    index = load_index(log, path)
+    now = time.time()
+    sync_started = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if now - index.get("built_at", 0) > full_refresh_seconds or "computers" not in index:
+        log.info("Building Immy computer index")
+        computers = fetch_computers(None)
+        if computers is None:
+            return index if index.get("computers") else None
+        index = {"built_at": now, "synced_at": now, "sync_marker": sync_started, "computers": {}}
+        merge_computers(index, computers)
+        save_index(log, path, index)
+        log.info(f"Indexed [{len(index['computers'])}] Immy computers")
+    elif now - index.get("synced_at", 0) > refresh_interval_seconds:
+        computers = fetch_computers(["updatedDate", ">=", index.get("sync_marker")])
+        if computers is None:
+            log.warning("Incremental Immy computer sync failed, using indexed computers")
+        else:
+            merge_computers(index, computers)
+            index["synced_at"] = now
+            index["sync_marker"] = sync_started
+            save_index(log, path, index)
+            log.info(f"Synced [{len(computers)}] updated Immy computers")
+    return index
+
+def get_email_map(path, index):
+    key = (path, index.get("synced_at"), len(index["computers"]))
+    if key not in email_maps:
+        email_map = {}
+        for computer in index["computers"].values():
+            email_map.setdefault((computer.get("primaryUserEmail") or "").lower(), []).append(computer)
+        email_maps.clear()
+        email_maps[key] = email_map
+    return email_maps[key]
+
+def get_computers_for_email(log, base_url, user_email, fetch_computers):
+    email = (user_email or "").strip().lower()
+    if not email:
+        return []
+    path = get_index_path(base_url)
+
+    computers = fetch_computers(["primaryUserEmail", "=", user_email])
+    if computers is not None:
+        matches = [computer for computer in computers if (computer.get("primaryUserEmail") or "").lower() == email]
+        with index_lock:
+            index = load_index(log, path)
+            if "computers" in index:
+                # Indexed computers no longer returned for this email were deleted or reassigned
+                live_ids = {str(computer.get("id")) for computer in matches}
+                for computer_id, computer in list(index["computers"].items()):
+                    if (computer.get("primaryUserEmail") or "").lower() == email and computer_id not in live_ids:
+                        del index["computers"][computer_id]
+                merge_computers(index, matches)
+                save_index(log, path, index)
+        return matches
+
+    log.warning(f"Live Immy computer lookup for [{user_email}] failed, using the computer index")
+    with index_lock:
+        index = refresh_index(log, base_url, fetch_computers)
+        if index is None:
+            return None
+        return get_email_map(path, index).get(email, [])
@@ -0,0 +1,89 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+db_path = os.getenv("ASIO_NOTE_SCAN_PATH", os.path.join(tempfile.gettempdir(), "asio_note_scan.sqlite3"))
+
+# One alternation covers every token of interest, so each note is scanned once however many kinds are wanted
+token_pattern = re.compile(
+    r"(?P<cve>\bCVE-\d{4}-\d{4,}\b)"
+    r"|(?P<kb>\bKB[\s:#-]*\d+\b)"
+    r"|\b(?:host\s*name|host|device|computer)\s*[:=]\s*(?=(?P<hostname>[A-Za-z0-9](?:[A-Za-z0-9.-]*[A-Za-z0-9])?))"
+    r"|\bseverity\s*[:=]\s*(?P<severity>critical|high|medium|low)\b",
+    re.IGNORECASE
+)
+result_keys = ("cves", "kbs", "hostnames", "severities")
+# Bump when token_pattern changes so memoised results from the old pattern are rescanned
+scan_version = 3
+
+scan_lock = threading.Lock()
+scanned = {}
+
+def normalize_kb(kb_number):
+    digits = re.search(r"\d+", kb_number)
+    return f"KB{digits.group()}" if digits else kb_number.strip().upper()
+
+def scan_text(text):
+    found = {key: {} for key in result_keys}
+    for match in token_pattern.finditer(text or ""):
+        if match.group("cve"):
+            found["cves"][match.group("cve").upper()] = None
+        elif match.group("kb"):
+            found["kbs"][normalize_kb(match.group("kb"))] = None
+        elif match.group("hostname"):
+            found["hostnames"][match.group("hostname").upper()] = None
+        else:
+            found["severities"][match.group("severity").capitalize()] = None
+    return {key: list(values) for key, values in found.items()}
+
+def get_connection():
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, stamp TEXT, result TEXT)")
+    return connection
+
+def get_stamp(note):
+    info = note.get("_info") or {}
+    return f"{scan_version}:{info.get('lastUpdated') or note.get('dateCreated') or len(note.get('text') or '')}"
+
+def scan_notes(notes):
+    # Notes are memoised by id and last-updated stamp, so re-runs on a ticket only scan new or edited notes
+    results = []
+    misses = []
+    with scan_lock:
+        connection = get_connection()
+        try:
+            for note in notes:
+                note_id = note.get("id")
+                stamp = get_stamp(note)
+                cached = scanned.get(note_id)
+                if cached is None and note_id is not None:
+                    row = connection.execute("SELECT stamp, result FROM notes WHERE id = ?", (note_id,)).fetchone()
+                    cached = (row[0], json.loads(row[1])) if row else None
+                if cached and cached[0] == stamp:
+                    result = cached[1]
+                else:
+                    result = scan_text(note.get("text", ""))
+                    if note_id is not None:
+                        misses.append((note_id, stamp, json.dumps(result)))
+                if note_id is not None:
+                    scanned[note_id] = (stamp, result)
+                results.append(result)
+            if misses:
+                connection.executemany("INSERT OR REPLACE INTO notes (id, stamp, result) VALUES (?, ?, ?)", misses)
+                connection.commit()
+        finally:
+            connection.close()
+    return results
+
+def merge_results(results):
+    merged = {key: {} for key in result_keys}
+    for result in results:
+        for key in result_keys:
+            merged[key].update(dict.fromkeys(result.get(key, [])))
+    return {key: list(values) for key, values in merged.items()}
+
+def scan_ticket_notes(notes):
+    return merge_results(scan_notes(notes))
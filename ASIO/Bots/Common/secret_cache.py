@@ -0,0 +1,53 @@
+import threading
+import time
+
+from Common import worker_pool
+
+ttl_seconds = 900
+max_prefetch_workers = 8
+
+secrets = {}
+locks = {}
+locks_lock = threading.Lock()
+
+def get_lock(key):
+    with locks_lock:
+        if key not in locks:
+            locks[key] = threading.Lock()
+        return locks[key]
+
+def get_cached_secret(vault_name, secret_name):
+    entry = secrets.get((vault_name, secret_name))
+    if entry and time.monotonic() - entry[1] < ttl_seconds:
+        return entry[0]
+    return None
+
+def get_secret(log, vault_name, secret_name, fetch_secret):
+    value = get_cached_secret(vault_name, secret_name)
+    if value is not None:
+        log.info(f"Using cached secret [{secret_name}]")
+        return value
+
+    with get_lock((vault_name, secret_name)):
+        value = get_cached_secret(vault_name, secret_name)
+        if value is not None:
+            log.info(f"Using cached secret [{secret_name}]")
+            return value
+        value = fetch_secret(secret_name)
+        if value:
+            secrets[(vault_name, secret_name)] = (value, time.monotonic())
+        return value
+
+def prefetch_secrets(log, vault_name, secret_names, fetch_secret, create_http_client):
+    # Pool threads get their own log buffer and HttpClient, so fetch_secret(worker_log, worker_http_client, secret_name)
+    # never touches the caller's shared cw_rpa objects
+    pending = [name for name in dict.fromkeys(secret_names) if get_cached_secret(vault_name, name) is None]
+    if not pending:
+        return
+    log.info(f"Prefetching [{len(pending)}] secrets from Key Vault [{vault_name}]")
+
+    def prefetch(worker_log, name):
+        worker_http_client = worker_pool.get_worker_http_client(create_http_client)
+        return get_secret(worker_log, vault_name, name, lambda secret_name: fetch_secret(worker_log, worker_http_client, secret_name))
+
+    worker_pool.run_in_pool(log, prefetch, pending, max_prefetch_workers)
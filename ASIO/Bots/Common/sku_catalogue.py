@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+
+from Common import http_session
+
+catalogue_url = "https://mitazu1pubfilestore.blob.core.windows.net/automation/M365SKU.csv"
+cache_path = os.getenv("ASIO_SKU_CATALOGUE_PATH", os.path.join(tempfile.gettempdir(), "asio_m365_sku.csv"))
+metadata_path = f"{cache_path}.json"
+
+catalogue_lock = threading.Lock()
+sku_names = None
+
+def parse_catalogue(text):
+    reader = csv.DictReader(io.StringIO(text))
+    return {row["SKU"].strip(): row["PN"].strip() for row in reader if row.get("SKU") and row.get("PN")}
+
+def read_cached_catalogue(log):
+    if not os.path.exists(cache_path) or not os.path.exists(metadata_path):
+        return "", {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return text, metadata
+    except (ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable SKU catalogue cache [{cache_path}]: {str(e)}")
+        return "", {}
+
+def write_cached_catalogue(log, text, metadata):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        for path, content in [(cache_path, text), (metadata_path, json.dumps(metadata))]:
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+    except OSError as e:
+        log.warning(f"Unable to write SKU catalogue cache [{cache_path}]: {str(e)}")
+
+def load_catalogue(log):
+    text, metadata = read_cached_catalogue(log)
+    headers = {}
+    if text and metadata.get("etag"):
+        headers["If-None-Match"] = metadata["etag"]
+    if text and metadata.get("last_modified"):
+        headers["If-Modified-Since"] = metadata["last_modified"]
+
+    try:
+        response = http_session.request("get", catalogue_url, headers=headers)
+    except Exception as e:
+        log.warning(f"Failed to download SKU catalogue: {str(e)}")
+        response = None
+
+    if response is not None and response.status_code == 304:
+        log.info("SKU catalogue not modified, using cached copy")
+        return parse_catalogue(text)
+    if response is not None and response.status_code == 200:
+        log.info("Downloaded updated SKU catalogue")
+        write_cached_catalogue(log, response.text, {
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", "")
+        })
+        return parse_catalogue(response.text)
+    if text:
+        log.warning(f"SKU catalogue revalidation failed Status: {response.status_code if response is not None else 'N/A'}, using cached copy")
+        return parse_catalogue(text)
+    log.warning("Could not load SKU catalogue. License names will default to raw SKU")
+    return {}
+
+def get_sku_names(log):
+    global sku_names
+    if sku_names is None:
+        with catalogue_lock:
+            if sku_names is None:
+                sku_names = load_catalogue(log)
+    return sku_names
+
+def get_friendly_name(log, sku_part_number):
+    return get_sku_names(log).get(sku_part_number, sku_part_number)
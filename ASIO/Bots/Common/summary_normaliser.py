@@ -0,0 +1,36 @@
+import re
+
+reply_prefixes = [
+    "re", "fw", "fwd", "aw", "wg", "r", "rif", "tr", "enc", "odp", "pd", "sv", "vs", "vb", "res",
+    "antw", "doorst", "rv", "vl", "ynt", "ilt", "odg", "vá", "továbbítás", "答复", "回复", "转发", "回覆", "轉寄"
+]
+auto_reply_prefixes = [
+    "automatic reply", "auto reply", "autoreply", "out of office", "ooo",
+    "automatische antwort", "abwesenheitsnotiz", "réponse automatique", "respuesta automática", "risposta automatica"
+]
+tag_prefixes = ["external", "spam", "ext", "suspicious"]
+
+# One anchored, case-insensitive pass over any chain of reply/forward/auto-reply prefixes and tags, e.g.
+# "RE: [EXTERNAL] Fwd[2]: OOO: Disk full" -> "Disk full"
+prefix_pattern = re.compile(
+    r"^(?:\s*(?:"
+    + r"(?:" + "|".join(re.escape(p) for p in sorted(set(reply_prefixes), key=len, reverse=True)) + r")\s*(?:\[\d+\]|\(\d+\))?\s*[:：]"
+    + r"|(?:" + "|".join(re.escape(p) for p in auto_reply_prefixes) + r")\s*[:：]"
+    + r"|\[(?:" + "|".join(re.escape(p) for p in tag_prefixes) + r")\]"
+    + r"))+\s*",
+    re.IGNORECASE
+)
+extended_summary_pattern = re.compile(r"^\s*\[Extended Summary\]\s*", re.IGNORECASE)
+description_pattern = re.compile(r"\s*\[Description\]\s*$", re.IGNORECASE)
+email_brackets_pattern = re.compile(r"\s*<[^<>]+>")
+
+def strip_reply_prefixes(summary):
+    return prefix_pattern.sub("", summary.strip(), count=1).strip()
+
+def clean_summary_description(text):
+    cleaned = extended_summary_pattern.sub("", text, count=1)
+    cleaned = description_pattern.sub("", cleaned, count=1)
+    return cleaned.strip()
+
+def remove_email_brackets(text):
+    return email_brackets_pattern.sub("", text).strip()
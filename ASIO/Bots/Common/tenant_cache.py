@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+ttl_seconds = 30 * 24 * 3600
+negative_ttl_seconds = 900
+cache_path = os.getenv("ASIO_TENANT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "asio_tenant_cache.json"))
+
+tenants = {}
+cache_lock = threading.Lock()
+cache_loaded = False
+
+def read_cache_file(log):
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable tenant cache [{cache_path}]: {str(e)}")
+        return {}
+
+def load_cache(log):
+    global cache_loaded
+    if cache_loaded:
+        return
+    with cache_lock:
+        if not cache_loaded:
+            tenants.update(read_cache_file(log))
+            cache_loaded = True
+
+def save_cache(log):
+    with cache_lock:
+        data = read_cache_file(log)
+        for domain, entry in tenants.items():
+            if domain in data and data[domain].get("tenant_id") and not entry["tenant_id"]:
+                continue
+            if domain not in data or data[domain].get("resolved_at", 0) < entry["resolved_at"]:
+                data[domain] = entry
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            log.warning(f"Unable to write tenant cache [{cache_path}]: {str(e)}")
+
+def get_cached_tenant_id(azure_domain):
+    entry = tenants.get(azure_domain.strip().lower())
+    if not entry:
+        return None
+    ttl = ttl_seconds if entry["tenant_id"] else negative_ttl_seconds
+    if time.time() - entry["resolved_at"] > ttl:
+        return None
+    return entry["tenant_id"]
+
+def is_unknown_tenant(response):
+    # Discovery answers 400 with AADSTS90002 for domains that do not belong to any tenant
+    return response.status_code == 400 and "AADSTS90002" in (response.text or "")
+
+def store_tenant_id(log, azure_domain, tenant_id, save=True):
+    tenants[azure_domain.strip().lower()] = {"tenant_id": tenant_id, "resolved_at": time.time()}
+    if save:
+        save_cache(log)
+
+def get_tenant_id(log, azure_domain, resolve_tenant_id, refresh=False, save=True):
+    # resolve_tenant_id returns the tenant ID, "" when the domain is definitively unknown, or None when
+    # discovery failed for another reason. Only the first two are cached.
+    load_cache(log)
+    cached_tenant_id = get_cached_tenant_id(azure_domain)
+    if not refresh:
+        if cached_tenant_id:
+            log.info(f"Using cached tenant ID [{cached_tenant_id}] for domain [{azure_domain}]")
+            return cached_tenant_id
+        if cached_tenant_id == "":
+            log.warning(f"Domain [{azure_domain}] is not a known tenant, skipping lookup")
+            return ""
+
+    tenant_id = resolve_tenant_id(azure_domain)
+    if tenant_id:
+        store_tenant_id(log, azure_domain, tenant_id, save)
+        return tenant_id
+
+    known_tenant_id = (tenants.get(azure_domain.strip().lower()) or {}).get("tenant_id")
+    if known_tenant_id:
+        log.warning(f"Tenant discovery for domain [{azure_domain}] failed, keeping cached tenant ID [{known_tenant_id}]")
+        return known_tenant_id
+    if tenant_id == "":
+        store_tenant_id(log, azure_domain, "", save)
+    return ""
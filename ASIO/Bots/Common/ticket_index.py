@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from Common import summary_normaliser
+
+db_path = os.getenv("ASIO_TICKET_INDEX_PATH", os.path.join(tempfile.gettempdir(), "asio_ticket_index.sqlite3"))
+num_permutations = 64
+band_rows = 4
+similarity_threshold = 0.8
+
+prune_interval_seconds = 6 * 3600
+
+mersenne_prime = (1 << 61) - 1
+permutation_rng = random.Random(20240601)
+permutations = [(permutation_rng.randrange(1, mersenne_prime), permutation_rng.randrange(0, mersenne_prime)) for _ in range(num_permutations)]
+
+# Only values that change between otherwise identical alerts are masked. KB, CVE, ticket and invoice numbers are
+# left intact and must match exactly (see get_identifiers), so tickets about different patches never pair up.
+volatile_patterns = [
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), " guid "),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d{1,5})?\b"), " ipaddress "),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[t ]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)?\b"), " timestamp "),
+    (re.compile(r"\b\d{1,2}[/.]\d{1,2}[/.]\d{2,4}\b"), " timestamp "),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?(?:\s*[ap]m)?\b"), " timestamp "),
+]
+token_pattern = re.compile(r"[^\W_]+")
+
+db_lock = threading.Lock()
+
+def get_connection():
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY,
+            company_id INTEGER,
+            board_id INTEGER,
+            board_name TEXT,
+            parent_id INTEGER,
+            summary TEXT,
+            shingles TEXT
+        );
+        CREATE TABLE IF NOT EXISTS bands (
+            company_id INTEGER,
+            board_id INTEGER,
+            band TEXT,
+            ticket_id INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS bands_lookup ON bands (company_id, board_id, band);
+        CREATE INDEX IF NOT EXISTS bands_ticket ON bands (ticket_id);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return connection
+
+def get_shingles(summary):
+    text = summary_normaliser.strip_reply_prefixes(summary).lower()
+    for pattern, placeholder in volatile_patterns:
+        text = pattern.sub(placeholder, text)
+    tokens = token_pattern.findall(text)
+    shingles = set(tokens)
+    shingles.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return shingles
+
+def get_identifiers(shingles):
+    return {shingle for shingle in shingles if " " not in shingle and any(c.isdigit() for c in shingle)}
+
+def get_signature(shingles):
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") for shingle in shingles]
+    if not hashes:
+        return []
+    return [min((a * h + b) % mersenne_prime for h in hashes) for a, b in permutations]
+
+def get_bands(signature):
+    return [f"{i}:{hashlib.blake2b(repr(signature[i:i + band_rows]).encode(), digest_size=8).hexdigest()}" for i in range(0, len(signature), band_rows)]
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def remove_ticket(connection, ticket_id):
+    connection.execute("DELETE FROM bands WHERE ticket_id = ?", (ticket_id,))
+    connection.execute("DELETE FROM tickets WHERE id = ?", (ticket_id,))
+
+def upsert_ticket(connection, ticket):
+    ticket_id = ticket.get("id")
+    remove_ticket(connection, ticket_id)
+    # The lastUpdated sync returns tickets that were closed or merged since the watermark, which drops them here
+    if ticket.get("closedFlag") or ticket.get("mergedParentTicketId"):
+        return
+    company_id = (ticket.get("company") or {}).get("id")
+    board = ticket.get("board") or {}
+    shingles = get_shingles(ticket.get("summary", ""))
+    connection.execute(
+        "INSERT INTO tickets (id, company_id, board_id, board_name, parent_id, summary, shingles) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (ticket_id, company_id, board.get("id"), board.get("name", ""), ticket.get("parentTicketId"), ticket.get("summary", ""), json.dumps(sorted(shingles)))
+    )
+    connection.executemany(
+        "INSERT INTO bands (company_id, board_id, band, ticket_id) VALUES (?, ?, ?, ?)",
+        [(company_id, board.get("id"), band, ticket_id) for band in get_bands(get_signature(shingles))]
+    )
+
+def prune_tickets(connection, open_ticket_ids):
+    # Deleted tickets never show up in the lastUpdated sync, so anything no longer open is dropped here
+    open_ticket_ids = set(open_ticket_ids)
+    stale_ids = [row[0] for row in connection.execute("SELECT id FROM tickets") if row[0] not in open_ticket_ids]
+    for ticket_id in stale_ids:
+        remove_ticket(connection, ticket_id)
+    return len(stale_ids)
+
+def refresh(log, fetch_updated_tickets, fetch_open_ticket_ids=None):
+    with db_lock:
+        connection = get_connection()
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+            watermark = row[0] if row else None
+            tickets = fetch_updated_tickets(watermark)
+            if tickets is None:
+                log.warning("Failed to fetch ticket updates for the duplicate index")
+                return False
+            for ticket in tickets:
+                upsert_ticket(connection, ticket)
+                last_updated = (ticket.get("_info") or {}).get("lastUpdated")
+                if last_updated and (not watermark or last_updated > watermark):
+                    watermark = last_updated
+            if watermark:
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (watermark,))
+
+            row = connection.execute("SELECT value FROM meta WHERE key = 'pruned_at'").fetchone()
+            if fetch_open_ticket_ids and (not row or time.time() - float(row[0]) >= prune_interval_seconds):
+                open_ticket_ids = fetch_open_ticket_ids()
+                if open_ticket_ids is None:
+                    log.warning("Failed to fetch open ticket IDs, skipping duplicate index pruning")
+                else:
+                    pruned = prune_tickets(connection, open_ticket_ids)
+                    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pruned_at', ?)", (str(time.time()),))
+                    log.info(f"Pruned [{pruned}] closed or deleted tickets from the duplicate index")
+            connection.commit()
+            log.info(f"Duplicate index refreshed with [{len(tickets)}] ticket updates, watermark [{watermark}]")
+            return True
+        finally:
+            connection.close()
+
+def find_similar(log, company_id, board_id, summary, threshold=None):
+    threshold = similarity_threshold if threshold is None else threshold
+    shingles = get_shingles(summary)
+    identifiers = get_identifiers(shingles)
+    bands = get_bands(get_signature(shingles))
+    if not bands:
+        return []
+    connection = get_connection()
+    try:
+        placeholders = ",".join("?" * len(bands))
+        rows = connection.execute(
+            f"SELECT DISTINCT t.id, t.board_id, t.board_name, t.parent_id, t.summary, t.shingles FROM bands b JOIN tickets t ON t.id = b.ticket_id "
+            f"WHERE b.company_id IS ? AND b.board_id IS ? AND b.band IN ({placeholders})",
+            [company_id, board_id] + bands
+        ).fetchall()
+    finally:
+        connection.close()
+
+    matches = []
+    for ticket_id, board_id, board_name, parent_id, ticket_summary, ticket_shingles in rows:
+        ticket_shingles = set(json.loads(ticket_shingles))
+        if get_identifiers(ticket_shingles) != identifiers:
+            continue
+        similarity = jaccard(shingles, ticket_shingles)
+        if similarity >= threshold:
+            matches.append({
+                "id": ticket_id,
+                "summary": ticket_summary,
+                "parentTicketId": parent_id,
+                "board": {"id": board_id, "name": board_name},
+                "similarity": round(similarity, 3)
+            })
+    matches.sort(key=lambda ticket: ticket["id"])
+    log.info(f"Duplicate index returned [{len(matches)}] tickets from [{len(rows)}] candidates at threshold [{threshold}]")
+    return matches
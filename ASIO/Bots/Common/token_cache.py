@@ -0,0 +1,153 @@
+import base64
+import json
+import os
+import threading
+import time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+refresh_margin_seconds = 300
+default_lifetime_seconds = 3000
+cache_path = os.getenv("ASIO_TOKEN_CACHE_PATH", "")
+cache_encryption_key = os.getenv("ASIO_TOKEN_CACHE_KEY", "")
+
+tokens = {}
+aliases = {}
+locks = {}
+locks_lock = threading.Lock()
+disk_lock = threading.Lock()
+disk_loaded = False
+
+def get_lock(name):
+    with locks_lock:
+        if name not in locks:
+            locks[name] = threading.Lock()
+        return locks[name]
+
+def get_token_expiry(token):
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode()).decode())
+        return float(claims["exp"])
+    except Exception:
+        return time.time() + default_lifetime_seconds
+
+def is_valid(entry):
+    return bool(entry) and entry["expires_at"] - refresh_margin_seconds > time.time()
+
+def get_cipher(log):
+    if not cache_path or not cache_encryption_key:
+        return None
+    if Fernet is None:
+        log.warning("Token disk cache requested but the cryptography package is not installed")
+        return None
+    try:
+        return Fernet(cache_encryption_key.encode())
+    except Exception as e:
+        log.warning(f"Token disk cache key is invalid: {str(e)}")
+        return None
+
+def read_disk_cache(log, cipher):
+    if not os.path.exists(cache_path):
+        return {}, {}
+    try:
+        with open(cache_path, "rb") as f:
+            data = json.loads(cipher.decrypt(f.read()).decode())
+    except (InvalidToken, ValueError, OSError) as e:
+        log.warning(f"Ignoring unreadable token disk cache [{cache_path}]: {str(e)}")
+        return {}, {}
+    disk_tokens = {tuple(item["key"]): item["entry"] for item in data.get("tokens", []) if is_valid(item.get("entry"))}
+    disk_aliases = {tuple(item["alias"]): tuple(item["key"]) for item in data.get("aliases", [])}
+    return disk_tokens, disk_aliases
+
+def load_disk_cache(log):
+    global disk_loaded
+    if disk_loaded:
+        return
+    with disk_lock:
+        if disk_loaded:
+            return
+        disk_loaded = True
+        cipher = get_cipher(log)
+        if not cipher:
+            return
+        disk_tokens, disk_aliases = read_disk_cache(log, cipher)
+        for key, entry in disk_tokens.items():
+            if not is_valid(tokens.get(key)):
+                tokens[key] = entry
+        for alias, key in disk_aliases.items():
+            aliases.setdefault(alias, key)
+        if disk_tokens:
+            log.info(f"Loaded [{len(disk_tokens)}] cached access tokens from disk")
+
+def save_disk_cache(log):
+    cipher = get_cipher(log)
+    if not cipher:
+        return
+    with disk_lock:
+        disk_tokens, disk_aliases = read_disk_cache(log, cipher)
+        for key, entry in tokens.items():
+            if is_valid(entry) and (key not in disk_tokens or disk_tokens[key]["expires_at"] < entry["expires_at"]):
+                disk_tokens[key] = entry
+        disk_aliases.update(aliases)
+        data = {
+            "tokens": [{"key": list(key), "entry": entry} for key, entry in disk_tokens.items()],
+            "aliases": [{"alias": list(alias), "key": list(key)} for alias, key in disk_aliases.items() if key in disk_tokens]
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(cipher.encrypt(json.dumps(data).encode()))
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            log.warning(f"Unable to write token disk cache [{cache_path}]: {str(e)}")
+
+def get_alias_key(alias, scope):
+    # The same credential alias is used for several scopes, so the scope is part of the key
+    if not alias:
+        return None
+    return (*alias, scope) if isinstance(alias, tuple) else (alias, scope)
+
+def get_alias_token(alias_key):
+    entry = tokens.get(aliases.get(alias_key)) if alias_key else None
+    return entry if is_valid(entry) else None
+
+def get_token(log, scope, resolve_credentials, request_token, alias=None):
+    load_disk_cache(log)
+
+    alias_key = get_alias_key(alias, scope)
+    entry = get_alias_token(alias_key)
+    if entry:
+        log.info(f"Using cached access token for scope [{scope}]")
+        return entry["tenant_id"], entry["token"]
+
+    with get_lock(("alias", alias_key) if alias_key else ("scope", scope)):
+        entry = get_alias_token(alias_key)
+        if entry:
+            log.info(f"Using cached access token for scope [{scope}]")
+            return entry["tenant_id"], entry["token"]
+
+        tenant_id, client_id, client_secret = resolve_credentials()
+        if not tenant_id:
+            return "", ""
+
+        key = (tenant_id, client_id, scope)
+        with get_lock(key):
+            entry = tokens.get(key)
+            if is_valid(entry):
+                log.info(f"Using cached access token for tenant [{tenant_id}] and scope [{scope}]")
+            else:
+                token = request_token(tenant_id, client_id, client_secret, scope)
+                if not token:
+                    return tenant_id, ""
+                entry = {"tenant_id": tenant_id, "token": token, "expires_at": get_token_expiry(token)}
+                tokens[key] = entry
+            if alias_key:
+                aliases[alias_key] = key
+        save_disk_cache(log)
+        return entry["tenant_id"], entry["token"]
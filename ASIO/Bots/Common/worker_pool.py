@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+worker_state = threading.local()
+
+class BufferedLogger:
+    """Hold a pool task's log calls so the main thread writes them in order once the task completes."""
+    def __init__(self):
+        self.entries = []
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self.entries.append((method, args, kwargs))
+
+    def replay(self, log):
+        for method, args, kwargs in self.entries:
+            getattr(log, method)(*args, **kwargs)
+
+def get_worker_http_client(create_http_client):
+    """Give each pool thread its own client, as cw_rpa does not document HttpClient as thread-safe."""
+    if not hasattr(worker_state, "http_client"):
+        worker_state.http_client = create_http_client()
+    return worker_state.http_client
+
+def run_in_pool(log, task, items, max_workers):
+    """Run task(buffered_log, item) for each item on a bounded pool.
+
+    Workers never touch the shared Logger. Each task's log lines are replayed on the calling thread, in item
+    order, and the results are returned in the same order. A task that raises is logged and returns None.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def run(item):
+        buffered_log = BufferedLogger()
+        try:
+            return buffered_log, task(buffered_log, item)
+        except Exception as e:
+            buffered_log.exception(e, f"Unhandled error processing [{item}]")
+            return buffered_log, None
+
+    if max_workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            outcomes = list(executor.map(run, items))
+    else:
+        outcomes = [run(item) for item in items]
+
+    results = []
+    for buffered_log, result in outcomes:
+        buffered_log.replay(log)
+        results.append(result)
+    return results
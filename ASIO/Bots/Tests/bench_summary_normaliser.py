@@ -0,0 +1,72 @@
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import summary_normaliser
+
+# The prefix loop the deduplication bot used before summary_normaliser, kept here as the benchmark baseline
+legacy_prefixes = [
+    r'^RE:\s*', r'^Re:\s*', r'^re:\s*', r'^FW:\s*', r'^Fw:\s*', r'^fw:\s*', r'^FWD:\s*', r'^Fwd:\s*', r'^fwd:\s*',
+    r'^AW:\s*', r'^Aw:\s*', r'^aw:\s*', r'^R:\s*', r'^RIF:\s*', r'^TR:\s*', r'^ENC:\s*', r'^ODP:\s*', r'^PD:\s*',
+    r'^SV:\s*', r'^VS:\s*', r'^VB:\s*', r'^RES:\s*', r'^Automatic reply:\s*', r'^Out of Office:\s*', r'^OOO:\s*',
+    r'^\[EXTERNAL\]\s*', r'^\[External\]\s*', r'^\[external\]\s*', r'^\[SPAM\]\s*', r'^\[Spam\]\s*', r'^\[spam\]\s*'
+]
+
+sample_summaries = [
+    "RE: FW: [EXTERNAL] Printer offline on level 3",
+    "Automatic reply: Invoice INV-20931 overdue",
+    "Disk space low on SRV-FS01 C: drive",
+    "Fwd: RE: Re: New starter - Jane Citizen - 14/07",
+    "[SPAM] You have won a prize",
+    "Out of Office: RE: Quote request for laptops",
+    "AW: WG: Zugriff auf freigegebenes Postfach",
+    "Backup job failed: Nightly-SQL (3 of 4 succeeded)",
+    "RE: RE: RE: RE: RE: RE: RE: RE: RE: RE: RE: RE: Password reset",
+    "[External] TR: Demande d'accès VPN",
+    "Re[2]: Teams meeting room not connecting",
+    "SV: VS: Tilgang til delt postkasse",
+    "Offboarding - John Smith - last day Friday",
+    "CVE-2024-21412 detected on WS-042",
+    "Patch KB5034441 failed to install",
+]
+
+def legacy_strip_reply_prefixes(summary):
+    cleaned = summary.strip()
+    changed = True
+    iteration = 0
+    while changed and iteration < 10:
+        changed = False
+        for prefix_pattern in legacy_prefixes:
+            new_cleaned = re.sub(prefix_pattern, '', cleaned)
+            if new_cleaned != cleaned:
+                cleaned = new_cleaned.strip()
+                changed = True
+                break
+        iteration += 1
+    return cleaned
+
+def load_corpus(path):
+    # One ticket summary per line, e.g. the Summary column of a CWPSA service ticket export
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+def run_benchmark(summaries, number=200):
+    legacy_time = timeit.timeit(lambda: [legacy_strip_reply_prefixes(s) for s in summaries], number=number)
+    compiled_time = timeit.timeit(lambda: [summary_normaliser.strip_reply_prefixes(s) for s in summaries], number=number)
+    calls = number * len(summaries)
+    print(f"Summaries: {len(summaries)}, iterations: {number}")
+    print(f"Legacy loop:     {legacy_time / calls * 1e6:.2f} us per summary")
+    print(f"Compiled single: {compiled_time / calls * 1e6:.2f} us per summary")
+    print(f"Speedup:         {legacy_time / compiled_time:.1f}x")
+    for summary in summaries:
+        legacy = legacy_strip_reply_prefixes(summary)
+        compiled = summary_normaliser.strip_reply_prefixes(summary)
+        if legacy != compiled:
+            print(f"Differs: [{summary}] legacy=[{legacy}] compiled=[{compiled}]")
+    return legacy_time / compiled_time
+
+if __name__ == "__main__":
+    # Usage: python bench_summary_normaliser.py [summaries.txt]
+    run_benchmark(load_corpus(sys.argv[1]) if len(sys.argv) > 1 else sample_summaries)
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import cve_config_index
+
+
+class Log:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(("info", message))
+
+    def warning(self, message):
+        self.messages.append(("warning", message))
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cve_config_index, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(cve_config_index, "indexes", {})
+    monkeypatch.setattr(cve_config_index, "index_mtimes", {})
+
+
+def make_config(config_id, name):
+    return {"id": config_id, "name": name, "questions": [{"questionId": 1, "answer": name}]}
+
+
+class Fetcher:
+    def __init__(self, configs):
+        self.configs = configs
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.configs
+
+
+def find(name, fetch, company_id=1):
+    return cve_config_index.find_configuration(Log(), company_id, "CVE Vulnerability", name, fetch)
+
+
+def test_lookups_are_served_from_one_fetch():
+    fetch = Fetcher([make_config(1, "CVE-2024-21412"), make_config(2, "CVE-2024-0001")])
+    assert find("cve-2024-21412 ", fetch) == ({"id": 1, "name": "CVE-2024-21412", "answers": {"1": "CVE-2024-21412"}}, True)
+    assert find("CVE-2024-0001", fetch)[0]["id"] == 2
+    assert find("CVE-2024-9999", fetch) == (None, True)
+    assert fetch.calls == 1
+
+
+def test_failed_fetch_is_not_indexed():
+    assert find("CVE-2024-21412", lambda: None) == (None, False)
+    fetch = Fetcher([make_config(1, "CVE-2024-21412")])
+    assert find("CVE-2024-21412", fetch)[0]["id"] == 1
+    assert fetch.calls == 1
+
+
+def test_index_file_is_shared_between_runs(monkeypatch):
+    find("CVE-2024-21412", Fetcher([make_config(1, "CVE-2024-21412")]))
+    monkeypatch.setattr(cve_config_index, "indexes", {})
+    fetch = Fetcher([])
+    assert find("CVE-2024-21412", fetch)[0]["id"] == 1
+    assert fetch.calls == 0
+
+
+def test_expired_index_is_refetched(monkeypatch):
+    find("CVE-2024-21412", Fetcher([make_config(1, "CVE-2024-21412")]))
+    monkeypatch.setattr(cve_config_index, "ttl_seconds", -1)
+    fetch = Fetcher([make_config(3, "CVE-2024-21412")])
+    assert find("CVE-2024-21412", fetch)[0]["id"] == 3
+    assert fetch.calls == 1
+
+
+def test_added_configurations_reach_other_runs(monkeypatch):
+    find("CVE-2024-21412", Fetcher([]))
+    cve_config_index.add_configuration(Log(), 1, "CVE Vulnerability", make_config(5, "CVE-2024-21412"))
+    assert find("CVE-2024-21412", Fetcher([]))[0]["id"] == 5
+    monkeypatch.setattr(cve_config_index, "indexes", {})
+    assert find("CVE-2024-21412", Fetcher([]))[0]["id"] == 5
+
+
+def test_newer_index_file_replaces_the_loaded_copy():
+    find("CVE-2024-21412", Fetcher([]))
+    path = cve_config_index.get_index_path(1, "CVE Vulnerability")
+    index = cve_config_index.read_index(Log(), path)
+    index["configs"]["CVE-2024-21412"] = {"id": 7, "name": "CVE-2024-21412", "answers": {}}
+    cve_config_index.write_index(Log(), path, index)
+    os.utime(path, (cve_config_index.index_mtimes[(1, "CVE Vulnerability")] + 10,) * 2)
+    assert find("CVE-2024-21412", Fetcher([]))[0]["id"] == 7
+
+
+def test_companies_and_types_are_kept_apart():
+    find("CVE-2024-21412", Fetcher([make_config(1, "CVE-2024-21412")]), company_id=1)
+    assert find("CVE-2024-21412", Fetcher([]), company_id=2) == (None, True)
+    assert cve_config_index.find_configuration(Log(), 1, "KB Article", "CVE-2024-21412", lambda: []) == (None, True)
@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import cve_store
+
+
+class Log:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(("info", message))
+
+    def warning(self, message):
+        self.messages.append(("warning", message))
+
+
+@pytest.fixture(autouse=True)
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(cve_store, "db_path", str(tmp_path / "cve_store.sqlite3"))
+    monkeypatch.setattr(cve_store, "feed_dir", "")
+    monkeypatch.setattr(cve_store, "refreshed_at", 0)
+
+
+def set_watermark(days_ago):
+    connection = cve_store.get_connection()
+    watermark = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    cve_store.set_meta(connection, "watermark", watermark.strftime("%Y-%m-%dT%H:%M:%S"))
+    connection.commit()
+    connection.close()
+
+
+def refresh(windows, records=None):
+    cve_store.refreshed_at = 0
+    cve_store.refresh(Log(), lambda since, until: windows.append((since, until)) or (records or []))
+
+
+def test_first_refresh_without_feed_pulls_nothing():
+    windows = []
+    refresh(windows)
+    assert windows == []
+
+
+def test_lagging_store_pulls_a_bounded_window_per_refresh():
+    set_watermark(30)
+    windows = []
+    refresh(windows)
+    refresh(windows)
+    assert len(windows) == 2
+    assert all(until - since <= timedelta(days=cve_store.max_pull_days) for since, until in windows)
+    assert windows[1][0] == windows[0][1].replace(microsecond=0)
+
+
+def test_caught_up_store_waits_for_the_delta_interval():
+    set_watermark(1)
+    windows = []
+    refresh(windows)
+    refresh(windows)
+    assert len(windows) == 1
+
+
+def test_failed_pull_backs_off():
+    set_watermark(1)
+    cve_store.refresh(Log(), lambda since, until: None)
+    windows = []
+    refresh(windows)
+    assert windows == []
+
+
+def test_pulled_records_are_served_locally():
+    set_watermark(1)
+    refresh([], [{"id": "cve-2024-21412", "lastModified": "2026-01-01T00:00:00"}])
+    assert cve_store.get_cve(Log(), "CVE-2024-21412")["id"] == "cve-2024-21412"
+    assert cve_store.get_cve(Log(), "CVE-2024-0001") is None
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import note_scanner
+
+
+@pytest.fixture(autouse=True)
+def scan_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(note_scanner, "db_path", str(tmp_path / "note_scan.sqlite3"))
+    monkeypatch.setattr(note_scanner, "scanned", {})
+
+
+def make_note(note_id, text, last_updated="2026-01-01T00:00:00Z"):
+    return {"id": note_id, "text": text, "_info": {"lastUpdated": last_updated}}
+
+
+def test_tokens_are_extracted_in_one_pass():
+    result = note_scanner.scan_text("CVE-2024-21412 fixed by KB5034441. Hostname: WS-042 severity: critical")
+    assert result == {"cves": ["CVE-2024-21412"], "kbs": ["KB5034441"], "hostnames": ["WS-042"], "severities": ["Critical"]}
+
+
+def test_kb_spellings_are_normalised():
+    result = note_scanner.scan_text("Installed KB5034441, kb 5034122 and KB-5033375")
+    assert result["kbs"] == ["KB5034441", "KB5034122", "KB5033375"]
+    assert note_scanner.normalize_kb("5034441") == "KB5034441"
+
+
+def test_hostname_prefix_does_not_swallow_tokens():
+    result = note_scanner.scan_text("Device: CVE-2024-21412 Computer: KB5034441")
+    assert result["cves"] == ["CVE-2024-21412"]
+    assert result["kbs"] == ["KB5034441"]
+
+
+def test_results_stay_per_note_and_merge_in_order():
+    results = note_scanner.scan_notes([make_note(1, "KB5034441 CVE-2024-1111"), make_note(2, "CVE-2024-2222 CVE-2024-1111")])
+    assert results[0]["kbs"] == ["KB5034441"]
+    assert results[1]["kbs"] == []
+    assert note_scanner.merge_results(results)["cves"] == ["CVE-2024-1111", "CVE-2024-2222"]
+
+
+def test_notes_are_memoised_until_edited(monkeypatch):
+    scanned = []
+    scan_text = note_scanner.scan_text
+    monkeypatch.setattr(note_scanner, "scan_text", lambda text: scanned.append(text) or scan_text(text))
+
+    note_scanner.scan_notes([make_note(1, "KB5034441")])
+    monkeypatch.setattr(note_scanner, "scanned", {})
+    assert note_scanner.scan_notes([make_note(1, "KB5034441")])[0]["kbs"] == ["KB5034441"]
+    assert scanned == ["KB5034441"]
+
+    assert note_scanner.scan_notes([make_note(1, "KB5034122", last_updated="2026-01-02T00:00:00Z")])[0]["kbs"] == ["KB5034122"]
+    assert scanned == ["KB5034441", "KB5034122"]
@@ -0,0 +1,66 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import summary_normaliser
+from bench_summary_normaliser import legacy_prefixes, legacy_strip_reply_prefixes, run_benchmark, sample_summaries
+
+legacy_prefix_texts = [re.sub(r"\\(.)", r"\1", pattern[1:].replace(r"\s*", "")) for pattern in legacy_prefixes]
+
+
+@pytest.mark.parametrize("prefix", legacy_prefix_texts)
+def test_every_legacy_prefix_is_still_stripped(prefix):
+    summary = f"{prefix} Printer offline"
+    assert summary_normaliser.strip_reply_prefixes(summary) == legacy_strip_reply_prefixes(summary) == "Printer offline"
+
+
+@pytest.mark.parametrize("summary", [
+    "RE: FW: [EXTERNAL] Printer offline",
+    "Out of Office: RE: Quote request for laptops",
+    "Disk space low on SRV-FS01 C: drive",
+    "Backup job failed: Nightly-SQL",
+    "Re: ",
+])
+def test_legacy_results_are_unchanged(summary):
+    assert summary_normaliser.strip_reply_prefixes(summary) == legacy_strip_reply_prefixes(summary)
+
+
+@pytest.mark.parametrize("summary, expected", [
+    ("rE: fWd: Printer offline", "Printer offline"),
+    ("AUTOMATIC REPLY: Invoice overdue", "Invoice overdue"),
+    ("[Suspicious] [ext] Password expiry", "Password expiry"),
+    ("AW: WG: Zugriff auf Postfach", "Zugriff auf Postfach"),
+    ("Antw: Doorst: Toegang tot mailbox", "Toegang tot mailbox"),
+    ("RV: VL: Acceso VPN", "Acceso VPN"),
+    ("回复：转发：打印机故障", "打印机故障"),
+    ("Réponse automatique: Absent", "Absent"),
+    ("Re[2]: Fw(3): Teams room", "Teams room"),
+    ("RE: " * 12 + "Password reset", "Password reset"),
+])
+def test_new_prefixes_are_stripped(summary, expected):
+    assert summary_normaliser.strip_reply_prefixes(summary) == expected
+
+
+@pytest.mark.parametrize("summary", [
+    "Resolution needed for printer",
+    "Trouble with FW update",
+    "Reboot SRV01: pending updates",
+    "Extension request [EXTERNAL] vendor",
+])
+def test_words_that_start_like_prefixes_are_kept(summary):
+    assert summary_normaliser.strip_reply_prefixes(summary) == summary
+
+
+def test_summary_cleaner_pipeline():
+    note = "[Extended Summary] RE: Printer offline <printer@example.com>\nSecond line [Description]"
+    cleaned = summary_normaliser.clean_summary_description(note)
+    cleaned = summary_normaliser.remove_email_brackets(cleaned)
+    assert summary_normaliser.strip_reply_prefixes(cleaned.strip().splitlines()[0]) == "Printer offline"
+
+
+def test_benchmark_runs_on_the_sample_corpus(capsys):
+    assert run_benchmark(sample_summaries, number=1) > 0
+    assert "Speedup:" in capsys.readouterr().out
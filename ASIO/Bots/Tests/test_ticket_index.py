@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Common import ticket_index
+
+
+class Log:
+    def __init__(self):
+        self.messages = []
+
+    def info(self, message):
+        self.messages.append(("info", message))
+
+    def warning(self, message):
+        self.messages.append(("warning", message))
+
+
+@pytest.fixture(autouse=True)
+def index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(ticket_index, "db_path", str(tmp_path / "ticket_index.sqlite3"))
+
+
+def make_ticket(ticket_id, summary, company_id=1, board_id=10, **fields):
+    ticket = {
+        "id": ticket_id,
+        "summary": summary,
+        "company": {"id": company_id},
+        "board": {"id": board_id, "name": f"Board {board_id}"},
+        "_info": {"lastUpdated": f"2026-01-01T00:00:{ticket_id:02d}Z"},
+    }
+    ticket.update(fields)
+    return ticket
+
+
+def load(tickets, open_ticket_ids=None):
+    fetch_open_ticket_ids = (lambda: open_ticket_ids) if open_ticket_ids is not None else None
+    assert ticket_index.refresh(Log(), lambda since: tickets, fetch_open_ticket_ids)
+
+
+def similar_ids(summary, company_id=1, board_id=10):
+    return [ticket["id"] for ticket in ticket_index.find_similar(Log(), company_id, board_id, summary)]
+
+
+def test_volatile_tokens_are_masked():
+    a = ticket_index.get_shingles("Backup failed on 10.0.0.12 at 2026-01-05 03:15:00 job 3f2504e0-4f89-11d3-9a0c-0305e82c3301")
+    b = ticket_index.get_shingles("Backup failed on 10.0.0.40 at 2026-01-06 04:20:00 job 7c9e6679-7425-40de-944b-e07fc1f90ae7")
+    assert a == b
+
+
+def test_identifiers_are_kept():
+    assert ticket_index.get_identifiers(ticket_index.get_shingles("Patch KB5034441 failed")) == {"kb5034441"}
+    assert ticket_index.get_shingles("Patch KB5034441 failed") != ticket_index.get_shingles("Patch KB5034122 failed")
+
+
+def test_near_duplicates_match():
+    load([make_ticket(1, "RE: Backup failed on 10.0.0.12 at 2026-01-05 03:15 for server SRV01")])
+    assert similar_ids("Backup failed on 10.0.0.40 at 2026-01-06 04:20 for server SRV01") == [1]
+
+
+def test_identifier_only_differences_do_not_match():
+    load([
+        make_ticket(1, "Patch KB5034441 failed to install on the domain controller"),
+        make_ticket(2, "Invoice 10042 is overdue for payment by the customer"),
+        make_ticket(3, "Critical vulnerability CVE-2024-21412 detected on endpoint"),
+    ])
+    assert similar_ids("Patch KB5034122 failed to install on the domain controller") == []
+    assert similar_ids("Invoice 10043 is overdue for payment by the customer") == []
+    assert similar_ids("Critical vulnerability CVE-2024-21413 detected on endpoint") == []
+    assert similar_ids("Patch KB5034441 failed to install on the domain controller") == [1]
+
+
+def test_other_boards_and_companies_are_ignored():
+    load([
+        make_ticket(1, "Disk space low on server SRV01", board_id=10),
+        make_ticket(2, "Disk space low on server SRV01", board_id=20),
+        make_ticket(3, "Disk space low on server SRV01", company_id=2),
+    ])
+    assert similar_ids("Disk space low on server SRV01") == [1]
+    assert similar_ids("Disk space low on server SRV01", board_id=20) == [2]
+
+
+def test_closed_and_merged_tickets_are_removed_by_sync():
+    load([make_ticket(1, "Disk space low on server SRV01"), make_ticket(2, "Disk space low on server SRV01")])
+    load([make_ticket(1, "Disk space low on server SRV01", closedFlag=True), make_ticket(2, "Disk space low on server SRV01", mergedParentTicketId=5)])
+    assert similar_ids("Disk space low on server SRV01") == []
+
+
+def test_deleted_tickets_are_pruned(monkeypatch):
+    load([make_ticket(1, "Disk space low on server SRV01"), make_ticket(2, "Disk space low on server SRV01")], open_ticket_ids=[1, 2])
+    assert similar_ids("Disk space low on server SRV01") == [1, 2]
+    monkeypatch.setattr(ticket_index, "prune_interval_seconds", 0)
+    load([], open_ticket_ids=[2])
+    assert similar_ids("Disk space low on server SRV01") == [2]
+
+
+def test_failed_open_ticket_fetch_skips_pruning():
+    load([make_ticket(1, "Disk space low on server SRV01")])
+    log = Log()
+    assert ticket_index.refresh(log, lambda since: [], lambda: None)
+    assert ("warning", "Failed to fetch open ticket IDs, skipping duplicate index pruning") in log.messages
+    assert similar_ids("Disk space low on server SRV01") == [1]
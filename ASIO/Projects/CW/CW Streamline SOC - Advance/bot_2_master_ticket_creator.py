@@ -4,6 +4,8 @@ import json
 import base64
 import requests
 import configparser
+import cw_paging
+import cw_reference
 from datetime import datetime
 
 config = configparser.ConfigParser()
@@ -36,6 +38,14 @@ def cw_get(endpoint):
     return None
 
 
+def cw_get_all(endpoint, conditions):
+    return cw_paging.iter_records(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), endpoint, conditions)
+
+
+def get_board_id(board_name):
+    return cw_reference.get_id(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), "boards", board_name)
+
+
 def cw_post(endpoint, data):
     url = f"{CW_URL}/v4_6_release/apis/3.0/{endpoint}"
     response = requests.post(url, headers=get_auth_header(), json=data, timeout=30)
@@ -61,31 +71,29 @@ def get_ci_field(ci_data, field_name):
 
 
 def find_devices_for_kb(company_id, kb_number):
-    params = f"conditions=company/id={company_id} and customFields/Pending_KB_Patches contains '{kb_number}'&pageSize=1000"
-    cis = cw_get(f"company/configurations?{params}")
+    conditions = f"company/id={company_id} and customFields/Pending_KB_Patches contains '{kb_number}'"
     
     devices = []
-    if cis:
-        for ci in cis:
-            pending_cves_str = get_ci_field(ci, "Pending_CVEs")
-            pending_cves = json.loads(pending_cves_str) if pending_cves_str else []
-            
-            ticket_ids_str = get_ci_field(ci, "Active_Vulnerability_Tickets")
-            ticket_ids = [t.strip() for t in ticket_ids_str.split(",") if t.strip()] if ticket_ids_str else []
-            
-            critical_count = sum(1 for cve in pending_cves if cve.get("severity") == "Critical" and cve.get("kb") == kb_number)
-            high_count = sum(1 for cve in pending_cves if cve.get("severity") == "High" and cve.get("kb") == kb_number)
-            medium_count = sum(1 for cve in pending_cves if cve.get("severity") == "Medium" and cve.get("kb") == kb_number)
-            
-            devices.append({
-                "id": ci.get("id"),
-                "name": ci.get("name"),
-                "cve_list": [cve for cve in pending_cves if cve.get("kb") == kb_number],
-                "critical_count": critical_count,
-                "high_count": high_count,
-                "medium_count": medium_count,
-                "ticket_ids": ticket_ids
-            })
+    for ci in cw_get_all("company/configurations", conditions):
+        pending_cves_str = get_ci_field(ci, "Pending_CVEs")
+        pending_cves = json.loads(pending_cves_str) if pending_cves_str else []
+        
+        ticket_ids_str = get_ci_field(ci, "Active_Vulnerability_Tickets")
+        ticket_ids = [t.strip() for t in ticket_ids_str.split(",") if t.strip()] if ticket_ids_str else []
+        
+        critical_count = sum(1 for cve in pending_cves if cve.get("severity") == "Critical" and cve.get("kb") == kb_number)
+        high_count = sum(1 for cve in pending_cves if cve.get("severity") == "High" and cve.get("kb") == kb_number)
+        medium_count = sum(1 for cve in pending_cves if cve.get("severity") == "Medium" and cve.get("kb") == kb_number)
+        
+        devices.append({
+            "id": ci.get("id"),
+            "name": ci.get("name"),
+            "cve_list": [cve for cve in pending_cves if cve.get("kb") == kb_number],
+            "critical_count": critical_count,
+            "high_count": high_count,
+            "medium_count": medium_count,
+            "ticket_ids": ticket_ids
+        })
     
     return devices
 
@@ -105,13 +113,11 @@ def create_master_ticket(company_id, kb_number):
     total_high = sum(d["high_count"] for d in devices)
     total_medium = sum(d["medium_count"] for d in devices)
     
-    board_data = cw_get(f"service/boards?conditions=name='{MASTER_BOARD}'")
-    if not board_data or len(board_data) == 0:
+    board_id = get_board_id(MASTER_BOARD)
+    if not board_id:
         print(f"ERROR: Board '{MASTER_BOARD}' not found")
         return None
     
-    board_id = board_data[0]["id"]
-    
     priority = 1 if total_critical > 0 else 2 if total_high > 0 else 3
     
     summary = f"Patch Deployment - {kb_number} - {total_devices} Devices - {total_cves} CVEs"
@@ -167,23 +173,19 @@ def find_companies_with_pending_kbs():
     
     companies_kbs = {}
     
-    params = "conditions=customFields/Pending_KB_Patches!=null&pageSize=1000"
-    cis = cw_get(f"company/configurations?{params}")
-    
-    if cis:
-        for ci in cis:
-            company_id = ci.get("company", {}).get("id")
-            if not company_id:
-                continue
-            
-            kb_str = get_ci_field(ci, "Pending_KB_Patches")
-            kbs = [k.strip() for k in kb_str.split(",") if k.strip()] if kb_str else []
-            
-            if company_id not in companies_kbs:
-                companies_kbs[company_id] = set()
-            
-            for kb in kbs:
-                companies_kbs[company_id].add(kb)
+    for ci in cw_get_all("company/configurations", "customFields/Pending_KB_Patches!=null"):
+        company_id = ci.get("company", {}).get("id")
+        if not company_id:
+            continue
+        
+        kb_str = get_ci_field(ci, "Pending_KB_Patches")
+        kbs = [k.strip() for k in kb_str.split(",") if k.strip()] if kb_str else []
+        
+        if company_id not in companies_kbs:
+            companies_kbs[company_id] = set()
+        
+        for kb in kbs:
+            companies_kbs[company_id].add(kb)
     
     return companies_kbs
 
@@ -4,7 +4,11 @@ import json
 import base64
 import requests
 import configparser
+import cw_paging
+import cw_ci_writer
+import note_scanner
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 config = configparser.ConfigParser()
 config.read('config.ini')
@@ -18,6 +22,9 @@ CW_CLIENT_ID = os.getenv("CW_CLIENT_ID", config.get('ConnectWise', 'cw_manage_cl
 CW_RMM_URL = os.getenv("CW_RMM_URL", config.get('ConnectWise', 'cw_rmm_url'))
 CW_RMM_KEY = os.getenv("CW_RMM_API_KEY", config.get('ConnectWise', 'cw_rmm_api_key'))
 
+DEVICE_WORKERS = config.getint('Settings', 'device_workers', fallback=8)
+KB_NUMBER_PATTERN = re.compile(r"KB\s*(\d+)", re.IGNORECASE)
+
 
 def get_auth_header():
     auth_string = f"{CW_COMPANY}+{CW_PUBLIC_KEY}:{CW_PRIVATE_KEY}"
@@ -44,6 +51,10 @@ def cw_get(endpoint):
     return None
 
 
+def cw_get_all(endpoint, conditions):
+    return cw_paging.iter_records(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), endpoint, conditions)
+
+
 def cw_patch(endpoint, data):
     url = f"{CW_URL}/v4_6_release/apis/3.0/{endpoint}"
     response = requests.patch(url, headers=get_auth_header(), json=data, timeout=30)
@@ -82,20 +93,19 @@ def get_ci_field(ci_data, field_name):
     return ""
 
 
-def check_patch_installed(ci_id, kb_number):
+def get_installed_kbs(ci_id):
     installed_patches = rmm_get(f"devices/{ci_id}/patches")
+    if installed_patches is None:
+        return None
     
-    if installed_patches:
-        for patch in installed_patches:
-            if kb_number.lower() in patch.get("name", "").lower() or kb_number.lower() in patch.get("id", "").lower():
-                return True
-    
-    return False
+    installed_kbs = set()
+    for patch in installed_patches:
+        for value in (patch.get("name", ""), patch.get("id", "")):
+            installed_kbs.update(f"KB{number}" for number in KB_NUMBER_PATTERN.findall(str(value)))
+    return installed_kbs
 
 
-def check_device_rebooted(ci_id, patch_installed_date):
-    device_info = rmm_get(f"devices/{ci_id}")
-    
+def check_device_rebooted(device_info, patch_installed_date):
     if device_info and patch_installed_date:
         last_reboot = device_info.get("lastRebootTime")
         if last_reboot:
@@ -109,16 +119,13 @@ def check_device_rebooted(ci_id, patch_installed_date):
     return False
 
 
-def update_patch_status(ci_id, kb_number, new_status):
-    operations = [
-        {"op": "replace", "path": f"customFields/Patch_Status_{kb_number}", "value": new_status}
-    ]
+def update_patch_status(ci, kb_number, new_status):
+    fields = {f"Patch_Status_{kb_number}": new_status}
     
     if new_status == "Patched":
-        operations.append({"op": "replace", "path": f"customFields/Patch_Installed_Date_{kb_number}", "value": datetime.now().strftime("%Y-%m-%dT%H:%M:%S")})
+        fields[f"Patch_Installed_Date_{kb_number}"] = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
     
-    result = cw_patch(f"company/configurations/{ci_id}", operations)
-    return result is not None
+    cw_ci_writer.queue_fields(ci, fields)
 
 
 def update_ticket_status(ticket_id, status_message):
@@ -140,8 +147,13 @@ def process_device(ci):
     if not kbs:
         return False
     
-    print(f"Processing device: {ci_name} (CI: {ci_id}) - {len(kbs)} pending KB patches")
+    installed_kbs = get_installed_kbs(ci_id)
+    if installed_kbs is None:
+        print(f"WARNING: Patch inventory unavailable for {ci_name} (CI: {ci_id}), skipping")
+        return False
     
+    lines = [f"Processing device: {ci_name} (CI: {ci_id}) - {len(kbs)} pending KB patches"]
+    device_info = None
     updated = False
     
     for kb in kbs:
@@ -150,31 +162,34 @@ def process_device(ci):
         if current_status == "Verified" or current_status == "Failed":
             continue
         
-        patch_installed = check_patch_installed(ci_id, kb)
+        patch_installed = note_scanner.normalize_kb(kb) in installed_kbs
         
         if patch_installed:
             if current_status == "Pending":
-                print(f"  {kb}: Pending -> Patched")
-                update_patch_status(ci_id, kb, "Patched")
+                lines.append(f"  {kb}: Pending -> Patched")
+                update_patch_status(ci, kb, "Patched")
                 updated = True
             elif current_status == "Patched":
+                if device_info is None:
+                    device_info = rmm_get(f"devices/{ci_id}") or {}
                 patch_date = get_ci_field(ci, f"Patch_Installed_Date_{kb}")
-                device_rebooted = check_device_rebooted(ci_id, patch_date)
+                device_rebooted = check_device_rebooted(device_info, patch_date)
                 
                 if device_rebooted:
-                    print(f"  {kb}: Patched -> Rebooted")
-                    update_patch_status(ci_id, kb, "Rebooted")
+                    lines.append(f"  {kb}: Patched -> Rebooted")
+                    update_patch_status(ci, kb, "Rebooted")
                     updated = True
             elif current_status == "Rebooted":
-                print(f"  {kb}: Rebooted -> Verified (manual scan required)")
-                update_patch_status(ci_id, kb, "Verified")
+                lines.append(f"  {kb}: Rebooted -> Verified (manual scan required)")
+                update_patch_status(ci, kb, "Verified")
                 updated = True
         else:
             if current_status != "Pending":
-                print(f"  {kb}: {current_status} -> Failed (patch not found)")
-                update_patch_status(ci_id, kb, "Failed")
+                lines.append(f"  {kb}: {current_status} -> Failed (patch not found)")
+                update_patch_status(ci, kb, "Failed")
                 updated = True
     
+    print("\n".join(lines))
     return updated
 
 
@@ -183,24 +198,29 @@ def main():
     print("Bot 3: Patch Status Monitor")
     print("=" * 60)
     
-    params = "conditions=customFields/Pending_KB_Patches!=null&pageSize=1000"
-    cis = cw_get(f"company/configurations?{params}")
+    device_count = 0
+    updated_count = 0
+    with ThreadPoolExecutor(max_workers=DEVICE_WORKERS) as executor:
+        futures = {}
+        for ci in cw_get_all("company/configurations", "customFields/Pending_KB_Patches!=null"):
+            device_count += 1
+            futures[executor.submit(process_device, ci)] = ci.get("id")
+        
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    updated_count += 1
+            except Exception as e:
+                print(f"ERROR processing CI {futures[future]}: {str(e)}")
     
-    if not cis:
+    if not device_count:
         print("No devices with pending patches found")
         return
     
-    print(f"Found {len(cis)} devices with pending patches")
-    
-    updated_count = 0
-    for ci in cis:
-        try:
-            if process_device(ci):
-                updated_count += 1
-        except Exception as e:
-            print(f"ERROR processing CI {ci.get('id')}: {str(e)}")
+    results = cw_ci_writer.flush(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header())
+    written_count = sum(1 for outcome in results.values() if outcome == "updated")
     
-    print(f"\nCompleted: {updated_count} devices updated")
+    print(f"\nCompleted: {updated_count} of {device_count} devices with pending patches updated, {written_count} of {len(results)} CI writes applied")
 
 
 if __name__ == "__main__":
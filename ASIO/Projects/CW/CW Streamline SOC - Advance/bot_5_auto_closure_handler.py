@@ -4,6 +4,9 @@ import json
 import base64
 import requests
 import configparser
+import cw_paging
+import cw_ci_writer
+import note_scanner
 from datetime import datetime
 
 config = configparser.ConfigParser()
@@ -36,6 +39,14 @@ def cw_get(endpoint):
     return None
 
 
+def cw_get_all(endpoint, conditions):
+    return cw_paging.iter_records(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), endpoint, conditions)
+
+
+def scan_notes(ticket_id):
+    return note_scanner.scan_ticket_notes(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), ticket_id)
+
+
 def cw_post(endpoint, data):
     url = f"{CW_URL}/v4_6_release/apis/3.0/{endpoint}"
     response = requests.post(url, headers=get_auth_header(), json=data, timeout=30)
@@ -72,83 +83,43 @@ def remove_ticket_from_list(ticket_list, ticket_id):
     return [tid for tid in ticket_list if str(tid) != str(ticket_id)]
 
 
-def close_child_ticket(ci_id, ci_name, kb_number):
-    ci = cw_get(f"company/configurations/{ci_id}")
-    if not ci:
-        print(f"  ERROR: Could not get CI {ci_id}")
-        return False
-    
-    ticket_ids_str = get_ci_field(ci, "Active_Vulnerability_Tickets")
-    ticket_ids = [t.strip() for t in ticket_ids_str.split(",") if t.strip()] if ticket_ids_str else []
-    
-    if not ticket_ids:
-        print(f"  No active tickets for CI {ci_id}")
-        return False
-    
-    closed_count = 0
+def close_child_tickets(ticket_ids, kb_number):
+    closed_ids = []
     
     for ticket_id in ticket_ids:
         ticket = cw_get(f"service/tickets/{ticket_id}")
         if not ticket:
             continue
         
+        note_tokens = scan_notes(ticket_id)
+        if note_scanner.normalize_kb(kb_number) not in note_tokens["kbs"]:
+            continue
+        
         if ticket.get("closedFlag"):
+            # Closed on an earlier run whose CI write never landed, so it still needs removing from the CI
+            print(f"  Child ticket #{ticket_id} for {kb_number} is already closed")
+            closed_ids.append(ticket_id)
             continue
         
-        notes = cw_get(f"service/tickets/{ticket_id}/notes")
-        if notes:
-            full_notes = "\n".join([n.get("text", "") for n in notes])
-            if kb_number in full_notes:
-                print(f"  Closing child ticket #{ticket_id} for {kb_number}")
-                
-                note_data = {
-                    "text": f"Patch {kb_number} verified and installed. All CVEs remediated. Auto-closing ticket.",
-                    "detailDescriptionFlag": False,
-                    "internalAnalysisFlag": True
-                }
-                cw_post(f"service/tickets/{ticket_id}/notes", note_data)
-                
-                operations = [
-                    {"op": "replace", "path": "status/name", "value": "Closed"},
-                    {"op": "replace", "path": "closedFlag", "value": True}
-                ]
-                result = cw_patch(f"service/tickets/{ticket_id}", operations)
-                
-                if result:
-                    closed_count += 1
-                    
-                    updated_ticket_list = remove_ticket_from_list(ticket_ids, ticket_id)
-                    
-                    operations = [
-                        {"op": "replace", "path": "customFields/Active_Vulnerability_Tickets", "value": ",".join(map(str, updated_ticket_list))}
-                    ]
-                    cw_patch(f"company/configurations/{ci_id}", operations)
-    
-    return closed_count > 0
-
-
-def cleanup_ci_fields(ci_id, kb_number):
-    ci = cw_get(f"company/configurations/{ci_id}")
-    if not ci:
-        return False
-    
-    pending_cves_str = get_ci_field(ci, "Pending_CVEs")
-    pending_cves = json.loads(pending_cves_str) if pending_cves_str else []
-    
-    pending_kbs_str = get_ci_field(ci, "Pending_KB_Patches")
-    pending_kbs = [k.strip() for k in pending_kbs_str.split(",") if k.strip()] if pending_kbs_str else []
-    
-    updated_cves = remove_cves_for_kb(pending_cves, kb_number)
-    updated_kbs = remove_kb_from_list(pending_kbs, kb_number)
-    
-    operations = [
-        {"op": "replace", "path": "customFields/Pending_CVEs", "value": json.dumps(updated_cves)},
-        {"op": "replace", "path": "customFields/Pending_KB_Patches", "value": ",".join(updated_kbs)},
-        {"op": "replace", "path": f"customFields/Patch_Status_{kb_number}", "value": "Verified"}
-    ]
+        print(f"  Closing child ticket #{ticket_id} for {kb_number}")
+        
+        note_data = {
+            "text": f"Patch {kb_number} verified and installed. All CVEs remediated. Auto-closing ticket.",
+            "detailDescriptionFlag": False,
+            "internalAnalysisFlag": True
+        }
+        cw_post(f"service/tickets/{ticket_id}/notes", note_data)
+        
+        operations = [
+            {"op": "replace", "path": "status/name", "value": "Closed"},
+            {"op": "replace", "path": "closedFlag", "value": True}
+        ]
+        result = cw_patch(f"service/tickets/{ticket_id}", operations)
+        
+        if result:
+            closed_ids.append(ticket_id)
     
-    result = cw_patch(f"company/configurations/{ci_id}", operations)
-    return result is not None
+    return closed_ids
 
 
 def check_master_ticket_complete(master_ticket_id, kb_number, company_id):
@@ -175,7 +146,31 @@ def check_master_ticket_complete(master_ticket_id, kb_number, company_id):
     return False
 
 
-def process_verified_device(ci):
+def get_cleanup_fields(ci, closed_ticket_ids, verified_kbs):
+    ticket_ids_str = get_ci_field(ci, "Active_Vulnerability_Tickets")
+    ticket_ids = [t.strip() for t in ticket_ids_str.split(",") if t.strip()] if ticket_ids_str else []
+    pending_cves_str = get_ci_field(ci, "Pending_CVEs")
+    pending_cves = json.loads(pending_cves_str) if pending_cves_str else []
+    kb_str = get_ci_field(ci, "Pending_KB_Patches")
+    pending_kbs = [k.strip() for k in kb_str.split(",") if k.strip()] if kb_str else []
+    
+    for ticket_id in closed_ticket_ids:
+        ticket_ids = remove_ticket_from_list(ticket_ids, ticket_id)
+    for kb in verified_kbs:
+        pending_cves = remove_cves_for_kb(pending_cves, kb)
+        pending_kbs = remove_kb_from_list(pending_kbs, kb)
+    
+    fields = {
+        "Active_Vulnerability_Tickets": ",".join(map(str, ticket_ids)),
+        "Pending_CVEs": json.dumps(pending_cves),
+        "Pending_KB_Patches": ",".join(pending_kbs)
+    }
+    for kb in verified_kbs:
+        fields[f"Patch_Status_{kb}"] = "Verified"
+    return fields
+
+
+def process_verified_device(ci, master_checks):
     ci_id = ci.get("id")
     ci_name = ci.get("name")
     
@@ -187,7 +182,11 @@ def process_verified_device(ci):
     
     print(f"Processing verified device: {ci_name} (CI: {ci_id})")
     
-    processed = False
+    ticket_ids_str = get_ci_field(ci, "Active_Vulnerability_Tickets")
+    ticket_ids = [t.strip() for t in ticket_ids_str.split(",") if t.strip()] if ticket_ids_str else []
+    
+    closed_ticket_ids = []
+    verified_kbs = []
     
     for kb in kbs:
         status = get_ci_field(ci, f"Patch_Status_{kb}")
@@ -195,9 +194,16 @@ def process_verified_device(ci):
         if status == "Verified":
             print(f"  {kb} is verified - closing tickets and cleaning up")
             
-            if close_child_ticket(ci_id, ci_name, kb):
-                cleanup_ci_fields(ci_id, kb)
-                processed = True
+            if not ticket_ids:
+                print(f"  No active tickets for CI {ci_id}")
+                continue
+            
+            closed_ids = close_child_tickets(ticket_ids, kb)
+            if closed_ids:
+                for ticket_id in closed_ids:
+                    ticket_ids = remove_ticket_from_list(ticket_ids, ticket_id)
+                closed_ticket_ids.extend(closed_ids)
+                verified_kbs.append(kb)
                 
                 company_id = ci.get("company", {}).get("id")
                 if company_id:
@@ -205,9 +211,20 @@ def process_verified_device(ci):
                     master_tickets = cw_get(f"service/tickets?{params}")
                     
                     if master_tickets and len(master_tickets) > 0:
-                        check_master_ticket_complete(master_tickets[0]["id"], kb, company_id)
+                        master_checks.add((master_tickets[0]["id"], kb, company_id))
+    
+    if not verified_kbs:
+        return False
     
-    return processed
+    # All closures for this CI are folded into a single write, flushed after every device is processed. If the CI
+    # changes first, the writer re-reads it and rebuilds the cleanup from the fresh copy. A write that still fails is
+    # picked up next run, as the closed tickets are still listed on the CI and are treated as resolved.
+    cw_ci_writer.queue_fields(
+        ci,
+        get_cleanup_fields(ci, closed_ticket_ids, verified_kbs),
+        lambda current: get_cleanup_fields(current, closed_ticket_ids, verified_kbs)
+    )
+    return True
 
 
 def main():
@@ -215,24 +232,27 @@ def main():
     print("Bot 5: Auto-Closure Handler")
     print("=" * 60)
     
-    params = "conditions=customFields/Pending_KB_Patches!=null&pageSize=1000"
-    cis = cw_get(f"company/configurations?{params}")
-    
-    if not cis:
-        print("No devices with pending patches found")
-        return
-    
-    print(f"Found {len(cis)} devices with pending patches")
-    
+    device_count = 0
     processed_count = 0
-    for ci in cis:
+    master_checks = set()
+    for ci in cw_get_all("company/configurations", "customFields/Pending_KB_Patches!=null"):
+        device_count += 1
         try:
-            if process_verified_device(ci):
+            if process_verified_device(ci, master_checks):
                 processed_count += 1
         except Exception as e:
             print(f"ERROR processing CI {ci.get('id')}: {str(e)}")
     
-    print(f"\nCompleted: {processed_count} devices processed for closure")
+    if not device_count:
+        print("No devices with pending patches found")
+        return
+    
+    # Master completion queries read the CI fields, so they run once the queued writes have landed
+    cw_ci_writer.flush(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header())
+    for master_ticket_id, kb, company_id in sorted(master_checks):
+        check_master_ticket_complete(master_ticket_id, kb, company_id)
+    
+    print(f"\nCompleted: {processed_count} of {device_count} devices with pending patches processed for closure")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ import json
 import base64
 import requests
 import configparser
+import cw_reference
+import note_scanner
 from datetime import datetime
 
 config = configparser.ConfigParser()
@@ -37,6 +39,14 @@ def cw_get(endpoint):
     return None
 
 
+def get_board_id(board_name):
+    return cw_reference.get_id(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), "boards", board_name)
+
+
+def scan_notes(ticket_id):
+    return note_scanner.scan_ticket_notes(f"{CW_URL}/v4_6_release/apis/3.0", get_auth_header(), ticket_id)
+
+
 def cw_post(endpoint, data):
     url = f"{CW_URL}/v4_6_release/apis/3.0/{endpoint}"
     response = requests.post(url, headers=get_auth_header(), json=data, timeout=30)
@@ -62,13 +72,11 @@ def get_ci_field(ci_data, field_name):
 
 
 def move_ticket_to_exception_board(ticket_id, kb_number, reason):
-    exception_board = cw_get(f"service/boards?conditions=name='{EXCEPTION_BOARD}'")
-    if not exception_board or len(exception_board) == 0:
+    board_id = get_board_id(EXCEPTION_BOARD)
+    if not board_id:
         print(f"  ERROR: Exception board '{EXCEPTION_BOARD}' not found")
         return False
     
-    board_id = exception_board[0]["id"]
-    
     operations = [
         {"op": "replace", "path": "board/id", "value": board_id},
         {"op": "replace", "path": "status/name", "value": "Failed - Requires Attention"}
@@ -178,23 +186,21 @@ def handle_failed_device(ci):
                 if not ticket or ticket.get("closedFlag"):
                     continue
                 
-                notes = cw_get(f"service/tickets/{ticket_id}/notes")
-                if notes:
-                    full_notes = "\n".join([n.get("text", "") for n in notes])
-                    if kb in full_notes:
-                        move_ticket_to_exception_board(ticket_id, kb, "Patch installation failed")
-                        create_remediation_checklist(ticket_id, kb)
-                        send_failure_notification(ticket_id, ci_name, kb)
-                        
-                        if company_id:
-                            params = f"conditions=summary contains '{kb}' and company/id={company_id} and board/name='{MASTER_BOARD}' and closedFlag=false"
-                            master_tickets = cw_get(f"service/tickets?{params}")
-                            
-                            if master_tickets and len(master_tickets) > 0:
-                                add_failure_alert_to_master(master_tickets[0]["id"], ci_name, ci_id, kb, "Patch installation failed")
+                note_tokens = scan_notes(ticket_id)
+                if note_scanner.normalize_kb(kb) in note_tokens["kbs"]:
+                    move_ticket_to_exception_board(ticket_id, kb, "Patch installation failed")
+                    create_remediation_checklist(ticket_id, kb)
+                    send_failure_notification(ticket_id, ci_name, kb)
+                    
+                    if company_id:
+                        params = f"conditions=summary contains '{kb}' and company/id={company_id} and board/name='{MASTER_BOARD}' and closedFlag=false"
+                        master_tickets = cw_get(f"service/tickets?{params}")
                         
-                        handled = True
-                        break
+                        if master_tickets and len(master_tickets) > 0:
+                            add_failure_alert_to_master(master_tickets[0]["id"], ci_name, ci_id, kb, "Patch installation failed")
+                    
+                    handled = True
+                    break
     
     return handled
 
@@ -0,0 +1,79 @@
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_WORKERS = 4
+CONFLICT_RETRIES = 3
+
+_pending = {}
+_lock = threading.Lock()
+
+
+def queue_fields(ci, fields, recompute=None):
+    # recompute(current_ci) rebuilds the fields from a fresh read when the CI changed after it was queued,
+    # so derived values such as ticket and KB lists are not written back from a stale copy
+    ci_id = ci.get("id")
+    with _lock:
+        entry = _pending.setdefault(ci_id, {"last_updated": ci.get("_info", {}).get("lastUpdated"), "fields": {}, "recompute": []})
+        entry["fields"].update(fields)
+        if recompute:
+            entry["recompute"].append(recompute)
+
+
+def get_ci(base_url, headers, ci_id):
+    response = requests.get(f"{base_url}/company/configurations/{ci_id}", headers=headers, params={"fields": "id,customFields,_info/lastUpdated"}, timeout=30)
+    if response.status_code == 200:
+        return response.json()
+    return None
+
+
+def flush_ci(base_url, headers, ci_id, entry):
+    fields = dict(entry["fields"])
+    last_updated = entry["last_updated"]
+    for attempt in range(CONFLICT_RETRIES + 1):
+        if last_updated:
+            current = get_ci(base_url, headers, ci_id)
+            if current is None:
+                return "failed"
+            current_last_updated = current.get("_info", {}).get("lastUpdated")
+            if current_last_updated != last_updated:
+                if attempt == CONFLICT_RETRIES:
+                    return "conflict"
+                # Another writer got in first, so the fields are rebuilt on top of its changes and retried
+                for recompute in entry["recompute"]:
+                    fields.update(recompute(current))
+                last_updated = current_last_updated
+                continue
+
+        operations = [{"op": "replace", "path": f"customFields/{name}", "value": value} for name, value in fields.items()]
+        response = requests.patch(f"{base_url}/company/configurations/{ci_id}", headers=headers, json=operations, timeout=30)
+        return "updated" if response.status_code == 200 else "failed"
+    return "conflict"
+
+
+def flush(base_url, headers, max_workers=MAX_WORKERS):
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+
+    results = {}
+    if not pending:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+        futures = {executor.submit(flush_ci, base_url, headers, ci_id, entry): ci_id for ci_id, entry in pending.items()}
+        for future in as_completed(futures):
+            ci_id = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                print(f"ERROR: Failed to write CI {ci_id}: {str(e)}")
+                outcome = "failed"
+
+            if outcome == "conflict":
+                print(f"WARNING: CI {ci_id} kept changing while it was written, leaving {len(pending[ci_id]['fields'])} field updates for the next run")
+            elif outcome == "failed":
+                print(f"ERROR: Failed to write {len(pending[ci_id]['fields'])} field updates to CI {ci_id}")
+            results[ci_id] = outcome
+
+    return results
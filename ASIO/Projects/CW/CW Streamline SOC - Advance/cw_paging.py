@@ -0,0 +1,87 @@
+import math
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+PAGE_SIZE = 1000
+MAX_WORKERS = 4
+PAGE_RETRIES = 3
+ORDER_BY = "id asc"
+
+
+def get_record_count(base_url, headers, endpoint, conditions):
+    try:
+        response = requests.get(f"{base_url}/{endpoint}/count", headers=headers, params={"conditions": conditions}, timeout=30)
+        if response.status_code == 200:
+            return response.json().get("count")
+    except Exception as e:
+        print(f"WARNING: Count request failed for {endpoint}: {str(e)}")
+    return None
+
+
+def get_with_retries(url, headers, params, description):
+    # A missing page would leave callers acting on a partial set, so failures are retried and then raised
+    for attempt in range(1, PAGE_RETRIES + 1):
+        try:
+            response = requests.get(url, headers=headers, params=params, timeout=30)
+            if response.status_code == 200:
+                return response
+            error = f"status {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt < PAGE_RETRIES:
+            print(f"WARNING: {description} failed with {error}, retrying ({attempt} of {PAGE_RETRIES})")
+            time.sleep(2 ** attempt)
+    raise RuntimeError(f"{description} failed after {PAGE_RETRIES} attempts: {error}")
+
+
+def get_page(base_url, headers, endpoint, conditions, page, page_size):
+    params = {"conditions": conditions, "orderBy": ORDER_BY, "page": page, "pageSize": page_size}
+    return get_with_retries(f"{base_url}/{endpoint}", headers, params, f"Page {page} of {endpoint}").json()
+
+
+def iter_records_sequential(base_url, headers, endpoint, conditions, page_size):
+    records = []
+    url = f"{base_url}/{endpoint}"
+    page = 1
+    params = {"conditions": conditions, "orderBy": ORDER_BY, "page": page, "pageSize": page_size}
+    while url:
+        response = get_with_retries(url, headers, params, f"Page {page} of {endpoint}")
+        page_records = response.json()
+        records.extend(page_records)
+
+        next_url = response.links.get("next", {}).get("url")
+        page += 1
+        if next_url:
+            url, params = next_url, None
+        elif len(page_records) == page_size:
+            url = f"{base_url}/{endpoint}"
+            params = {"conditions": conditions, "orderBy": ORDER_BY, "page": page, "pageSize": page_size}
+        else:
+            url = None
+    yield from records
+
+
+def iter_records(base_url, headers, endpoint, conditions, page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    count = get_record_count(base_url, headers, endpoint, conditions)
+    if count is None:
+        yield from iter_records_sequential(base_url, headers, endpoint, conditions, page_size)
+        return
+
+    pages = math.ceil(count / page_size)
+    if pages == 0:
+        return
+
+    # Every page is fetched before anything is yielded, so a failed page raises instead of a partial result
+    page_records = {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, pages)) as executor:
+        futures = {executor.submit(get_page, base_url, headers, endpoint, conditions, page, page_size): page for page in range(1, pages + 1)}
+        for future in as_completed(futures):
+            page_records[futures[future]] = future.result()
+
+    seen = set()
+    for page in sorted(page_records):
+        for record in page_records[page]:
+            if record.get("id") not in seen:
+                seen.add(record.get("id"))
+                yield record
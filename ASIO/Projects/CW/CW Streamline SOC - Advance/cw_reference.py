@@ -0,0 +1,76 @@
+import os
+import time
+import sqlite3
+import tempfile
+import cw_paging
+
+CACHE_PATH = os.getenv("CW_REFERENCE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "cw_reference_cache.sqlite3"))
+TTL_SECONDS = int(os.getenv("CW_REFERENCE_TTL_SECONDS", str(24 * 3600)))
+
+ENDPOINTS = {
+    "boards": "service/boards",
+    "statuses": "service/boards/{scope}/statuses",
+    "priorities": "service/priorities",
+    "configuration_types": "company/configurations/types",
+    "company_types": "company/companies/types"
+}
+
+_name_maps = {}
+
+
+def get_connection():
+    connection = sqlite3.connect(CACHE_PATH, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS reference (kind TEXT, scope TEXT, name TEXT, id INTEGER, PRIMARY KEY (kind, scope, name));
+        CREATE TABLE IF NOT EXISTS loaded (kind TEXT, scope TEXT, loaded_at REAL, PRIMARY KEY (kind, scope));
+    """)
+    return connection
+
+
+def load_name_map(base_url, headers, kind, scope, force_refresh=False):
+    connection = get_connection()
+    try:
+        row = connection.execute("SELECT loaded_at FROM loaded WHERE kind = ? AND scope = ?", (kind, scope)).fetchone()
+        if row and not force_refresh and time.time() - row[0] <= TTL_SECONDS:
+            return dict(connection.execute("SELECT name, id FROM reference WHERE kind = ? AND scope = ?", (kind, scope)).fetchall())
+
+        endpoint = ENDPOINTS[kind].format(scope=scope)
+        name_map = {}
+        try:
+            for record in cw_paging.iter_records_sequential(base_url, headers, endpoint, None, cw_paging.PAGE_SIZE):
+                name = (record.get("name") or "").strip().lower()
+                if name and name not in name_map:
+                    name_map[name] = record.get("id")
+        except RuntimeError as e:
+            # A partial map would hide records for a whole TTL, so nothing is cached when paging fails
+            print(f"ERROR: Failed to load {kind} reference data: {str(e)}")
+            return {}
+        if not name_map:
+            return name_map
+
+        connection.execute("DELETE FROM reference WHERE kind = ? AND scope = ?", (kind, scope))
+        connection.executemany("INSERT INTO reference (kind, scope, name, id) VALUES (?, ?, ?, ?)", [(kind, scope, name, record_id) for name, record_id in name_map.items()])
+        connection.execute("INSERT OR REPLACE INTO loaded (kind, scope, loaded_at) VALUES (?, ?, ?)", (kind, scope, time.time()))
+        connection.commit()
+        return name_map
+    finally:
+        connection.close()
+
+
+def get_name_map(base_url, headers, kind, scope="", force_refresh=False):
+    key = (kind, str(scope))
+    if key in _name_maps and not force_refresh:
+        return _name_maps[key]
+    name_map = load_name_map(base_url, headers, kind, str(scope), force_refresh)
+    if name_map:
+        _name_maps[key] = name_map
+    return name_map
+
+
+def get_id(base_url, headers, kind, name, scope=""):
+    key = (name or "").strip().lower()
+    name_map = get_name_map(base_url, headers, kind, scope)
+    if key not in name_map:
+        # A miss may be a record created or renamed since the cache was filled, so reload once before giving up
+        name_map = get_name_map(base_url, headers, kind, scope, force_refresh=True)
+    return name_map.get(key)
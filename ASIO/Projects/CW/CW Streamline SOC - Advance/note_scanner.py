@@ -0,0 +1,72 @@
+import os
+import re
+import json
+import sqlite3
+import tempfile
+import cw_paging
+
+CACHE_PATH = os.getenv("NOTE_SCAN_CACHE_PATH", os.path.join(tempfile.gettempdir(), "cw_note_scan.sqlite3"))
+
+TOKEN_PATTERN = re.compile(
+    r"(?P<cve>\bCVE-\d{4}-\d{4,}\b)"
+    r"|(?P<kb>\bKB[\s:#-]*\d+\b)"
+    r"|\b(?:host\s*name|host|device|computer)\s*[:=]\s*(?=(?P<hostname>[A-Za-z0-9](?:[A-Za-z0-9.-]*[A-Za-z0-9])?))"
+    r"|\bseverity\s*[:=]\s*(?P<severity>critical|high|medium|low)\b",
+    re.IGNORECASE
+)
+RESULT_KEYS = ("cves", "kbs", "hostnames", "severities")
+# Bump when TOKEN_PATTERN changes so memoised results from the old pattern are rescanned
+SCAN_VERSION = 3
+
+
+def normalize_kb(kb_number):
+    digits = re.search(r"\d+", kb_number)
+    return f"KB{digits.group()}" if digits else kb_number.strip().upper()
+
+
+def scan_text(text):
+    found = {key: {} for key in RESULT_KEYS}
+    for match in TOKEN_PATTERN.finditer(text or ""):
+        if match.group("cve"):
+            found["cves"][match.group("cve").upper()] = None
+        elif match.group("kb"):
+            found["kbs"][normalize_kb(match.group("kb"))] = None
+        elif match.group("hostname"):
+            found["hostnames"][match.group("hostname").upper()] = None
+        else:
+            found["severities"][match.group("severity").capitalize()] = None
+    return {key: list(values) for key, values in found.items()}
+
+
+def get_connection():
+    connection = sqlite3.connect(CACHE_PATH, timeout=30)
+    connection.execute("CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, stamp TEXT, result TEXT)")
+    return connection
+
+
+def scan_ticket_notes(base_url, headers, ticket_id):
+    merged = {key: {} for key in RESULT_KEYS}
+    misses = []
+    notes = cw_paging.iter_records_sequential(base_url, headers, f"service/tickets/{ticket_id}/notes", None, cw_paging.PAGE_SIZE)
+
+    connection = get_connection()
+    try:
+        # Notes are memoised by id and last-updated stamp, so re-runs on a ticket only scan new or edited notes
+        for note in notes:
+            info = note.get("_info") or {}
+            stamp = f"{SCAN_VERSION}:{info.get('lastUpdated') or note.get('dateCreated') or ''}"
+            row = connection.execute("SELECT stamp, result FROM notes WHERE id = ?", (note.get("id"),)).fetchone()
+            if row and row[0] == stamp:
+                result = json.loads(row[1])
+            else:
+                result = scan_text(note.get("text", ""))
+                misses.append((note.get("id"), stamp, json.dumps(result)))
+            for key in RESULT_KEYS:
+                merged[key].update(dict.fromkeys(result[key]))
+        if misses:
+            connection.executemany("INSERT OR REPLACE INTO notes (id, stamp, result) VALUES (?, ?, ?)", misses)
+            connection.commit()
+    finally:
+        connection.close()
+
+    return {key: list(values) for key, values in merged.items()}
@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import cw_ci_writer
+
+
+class Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeCW:
+    """Serves one CI and records the JSON patches written to it."""
+    def __init__(self, ci, changes=()):
+        self.ci = ci
+        self.changes = list(changes)
+        self.patches = []
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if self.changes:
+            self.changes.pop(0)(self.ci)
+        return Response(200, self.ci)
+
+    def patch(self, url, headers=None, json=None, timeout=None):
+        self.patches.append(json)
+        return Response(200, self.ci)
+
+
+@pytest.fixture(autouse=True)
+def clear_pending():
+    cw_ci_writer._pending.clear()
+    yield
+    cw_ci_writer._pending.clear()
+
+
+def make_ci(last_updated, tickets):
+    return {
+        "id": 7,
+        "_info": {"lastUpdated": last_updated},
+        "customFields": [{"caption": "Active_Vulnerability_Tickets", "value": tickets}]
+    }
+
+
+def get_tickets(ci):
+    return next(field["value"] for field in ci["customFields"] if field["caption"] == "Active_Vulnerability_Tickets")
+
+
+def remove_ticket(ci, ticket_id):
+    return {"Active_Vulnerability_Tickets": ",".join(t for t in get_tickets(ci).split(",") if t and t != ticket_id)}
+
+
+def use_fake(monkeypatch, fake):
+    monkeypatch.setattr(cw_ci_writer.requests, "get", fake.get)
+    monkeypatch.setattr(cw_ci_writer.requests, "patch", fake.patch)
+
+
+def test_fields_for_one_ci_are_coalesced(monkeypatch):
+    ci = make_ci("t1", "1,2")
+    fake = FakeCW(ci)
+    use_fake(monkeypatch, fake)
+    cw_ci_writer.queue_fields(ci, {"Patch_Status_KB1": "Verified"})
+    cw_ci_writer.queue_fields(ci, {"Patch_Status_KB2": "Failed"})
+
+    assert cw_ci_writer.flush("https://cw", {}) == {7: "updated"}
+    assert fake.patches == [[
+        {"op": "replace", "path": "customFields/Patch_Status_KB1", "value": "Verified"},
+        {"op": "replace", "path": "customFields/Patch_Status_KB2", "value": "Failed"},
+    ]]
+
+
+def test_conflict_rebuilds_fields_from_a_fresh_read(monkeypatch):
+    ci = make_ci("t1", "1,2")
+    fresh = make_ci("t2", "1,2,3")
+    fake = FakeCW(fresh)
+    use_fake(monkeypatch, fake)
+    cw_ci_writer.queue_fields(ci, remove_ticket(ci, "1"), lambda current: remove_ticket(current, "1"))
+
+    assert cw_ci_writer.flush("https://cw", {}) == {7: "updated"}
+    assert fake.patches == [[{"op": "replace", "path": "customFields/Active_Vulnerability_Tickets", "value": "2,3"}]]
+
+
+def test_conflict_without_recompute_reapplies_fields(monkeypatch):
+    ci = make_ci("t1", "1")
+    fake = FakeCW(make_ci("t2", "1"))
+    use_fake(monkeypatch, fake)
+    cw_ci_writer.queue_fields(ci, {"Patch_Status_KB1": "Verified"})
+
+    assert cw_ci_writer.flush("https://cw", {}) == {7: "updated"}
+    assert fake.patches == [[{"op": "replace", "path": "customFields/Patch_Status_KB1", "value": "Verified"}]]
+
+
+def test_ci_that_keeps_changing_is_reported_as_conflict(monkeypatch):
+    ci = make_ci("t0", "1")
+    stamps = iter(range(1, 100))
+    fake = FakeCW(make_ci("t1", "1"), changes=[lambda current: current["_info"].update(lastUpdated=f"t{next(stamps)}")] * 10)
+    use_fake(monkeypatch, fake)
+    cw_ci_writer.queue_fields(ci, {"Patch_Status_KB1": "Verified"})
+
+    assert cw_ci_writer.flush("https://cw", {}) == {7: "conflict"}
+    assert fake.patches == []
+
+
+def test_failed_read_is_reported(monkeypatch):
+    ci = make_ci("t1", "1")
+    monkeypatch.setattr(cw_ci_writer.requests, "get", lambda *args, **kwargs: Response(500))
+    cw_ci_writer.queue_fields(ci, {"Patch_Status_KB1": "Verified"})
+
+    assert cw_ci_writer.flush("https://cw", {}) == {7: "failed"}
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import note_scanner
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(note_scanner, "CACHE_PATH", str(tmp_path / "note_scan.sqlite3"))
+
+
+def make_note(note_id, text, last_updated="2026-01-01T00:00:00Z"):
+    return {"id": note_id, "text": text, "_info": {"lastUpdated": last_updated}}
+
+
+def test_normalize_kb():
+    assert note_scanner.normalize_kb("KB5034441") == "KB5034441"
+    assert note_scanner.normalize_kb("kb 5034441") == "KB5034441"
+    assert note_scanner.normalize_kb("5034441") == "KB5034441"
+
+
+def test_kb_spellings_are_normalised():
+    result = note_scanner.scan_text("Installed KB5034441, kb 5034122 and KB-5033375 on the host")
+    assert result["kbs"] == ["KB5034441", "KB5034122", "KB5033375"]
+
+
+def test_hostname_prefix_does_not_swallow_tokens():
+    result = note_scanner.scan_text("Device: CVE-2024-21412 Computer: KB5034441 Host: SRV01 Severity: High")
+    assert result["cves"] == ["CVE-2024-21412"]
+    assert result["kbs"] == ["KB5034441"]
+    assert "SRV01" in result["hostnames"]
+    assert result["severities"] == ["High"]
+
+
+def test_ci_values_without_prefix_match_note_tokens(monkeypatch):
+    monkeypatch.setattr(note_scanner.cw_paging, "iter_records_sequential", lambda *args: [make_note(1, "Please deploy KB 5034441 tonight")])
+    result = note_scanner.scan_ticket_notes("https://cw", {}, 100)
+    assert note_scanner.normalize_kb("5034441") in result["kbs"]
+    assert note_scanner.normalize_kb("KB5034441") in result["kbs"]
+
+
+def test_notes_are_memoised_until_edited(monkeypatch):
+    notes = [make_note(1, "KB5034441")]
+    monkeypatch.setattr(note_scanner.cw_paging, "iter_records_sequential", lambda *args: notes)
+    scanned = []
+    scan_text = note_scanner.scan_text
+    monkeypatch.setattr(note_scanner, "scan_text", lambda text: scanned.append(text) or scan_text(text))
+
+    assert note_scanner.scan_ticket_notes("https://cw", {}, 100)["kbs"] == ["KB5034441"]
+    assert note_scanner.scan_ticket_notes("https://cw", {}, 100)["kbs"] == ["KB5034441"]
+    assert scanned == ["KB5034441"]
+
+    notes[0] = make_note(1, "KB5034122", last_updated="2026-01-02T00:00:00Z")
+    assert note_scanner.scan_ticket_notes("https://cw", {}, 100)["kbs"] == ["KB5034122"]
+    assert scanned == ["KB5034441", "KB5034122"]
@@ -0,0 +1,167 @@
+import os
+import glob
+import gzip
+import json
+import time
+import sqlite3
+import tempfile
+import requests
+from datetime import datetime, timedelta, timezone
+
+NVD_API_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+NVD_API_KEY = os.getenv("NVD_API_KEY", "")
+STORE_PATH = os.getenv("CVE_STORE_PATH", os.path.join(tempfile.gettempdir(), "cve_store.sqlite3"))
+FEED_DIR = os.getenv("CVE_FEED_DIR", "")
+DELTA_INTERVAL_SECONDS = int(os.getenv("CVE_DELTA_INTERVAL_SECONDS", str(2 * 3600)))
+FAILURE_BACKOFF_SECONDS = int(os.getenv("CVE_FAILURE_BACKOFF_SECONDS", "900"))
+# NVD allows 5 requests per 30 seconds without an API key and 50 with one
+PAGE_DELAY_SECONDS = 0.6 if NVD_API_KEY else 6
+MAX_DELTA_DAYS = 120
+# Each refresh pulls at most this many days of changes, a lagging store catches up over later lookups
+MAX_PULL_DAYS = int(os.getenv("CVE_MAX_PULL_DAYS", "7"))
+RESULTS_PER_PAGE = 2000
+
+
+def get_connection():
+    connection = sqlite3.connect(STORE_PATH, timeout=30)
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS cves (id TEXT PRIMARY KEY, last_modified TEXT, data TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    return connection
+
+
+def get_meta(connection, key, default=None):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(connection, key, value):
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def iter_feed_records(data):
+    if isinstance(data, dict):
+        items = data.get("vulnerabilities") or data.get("data") or []
+    else:
+        items = data
+    for item in items:
+        record = item.get("cve", item) if isinstance(item, dict) else None
+        if record and record.get("id"):
+            yield record
+
+
+def store_records(connection, records):
+    rows = [(r["id"].upper(), r.get("lastModified", ""), json.dumps(r)) for r in records if r.get("id")]
+    connection.executemany(
+        "INSERT INTO cves (id, last_modified, data) VALUES (?, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET last_modified = excluded.last_modified, data = excluded.data "
+        "WHERE excluded.last_modified >= cves.last_modified",
+        rows
+    )
+    return rows
+
+
+def nvd_get(params):
+    headers = {"apiKey": NVD_API_KEY} if NVD_API_KEY else {}
+    try:
+        response = requests.get(NVD_API_URL, params=params, headers=headers, timeout=30)
+        if response.status_code == 200:
+            return response.json()
+        print(f"WARNING: NVD request returned status {response.status_code}")
+    except (requests.RequestException, ValueError) as e:
+        print(f"WARNING: NVD request failed: {str(e)}")
+    return None
+
+
+def import_feeds(connection):
+    if not FEED_DIR or not os.path.isdir(FEED_DIR):
+        return
+    for path in sorted(glob.glob(os.path.join(FEED_DIR, "*.json")) + glob.glob(os.path.join(FEED_DIR, "*.json.gz"))):
+        key = f"feed:{os.path.basename(path)}"
+        mtime = str(os.path.getmtime(path))
+        if get_meta(connection, key) == mtime:
+            continue
+        try:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                rows = store_records(connection, list(iter_feed_records(json.load(f))))
+        except (ValueError, OSError) as e:
+            print(f"WARNING: Skipping unreadable CVE feed {path}: {str(e)}")
+            continue
+        latest = max((row[1] for row in rows if row[1]), default="")
+        if latest > get_meta(connection, "watermark", ""):
+            set_meta(connection, "watermark", latest)
+        set_meta(connection, key, mtime)
+        connection.commit()
+
+
+def pull_delta(connection):
+    now = datetime.now(timezone.utc)
+    watermark = get_meta(connection, "watermark")
+    if not watermark:
+        # Without a bulk feed, track changes from now so records fetched on demand stay current
+        set_meta(connection, "watermark", now.strftime("%Y-%m-%dT%H:%M:%S"))
+        set_meta(connection, "last_delta", time.time())
+        connection.commit()
+        return
+
+    since = max(datetime.fromisoformat(watermark[:19]).replace(tzinfo=timezone.utc), now - timedelta(days=MAX_DELTA_DAYS))
+    until = min(now, since + timedelta(days=MAX_PULL_DAYS))
+    start_index = 0
+    while True:
+        if start_index:
+            time.sleep(PAGE_DELAY_SECONDS)
+        data = nvd_get({
+            "lastModStartDate": since.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "lastModEndDate": until.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "startIndex": start_index,
+            "resultsPerPage": RESULTS_PER_PAGE
+        })
+        if data is None:
+            # Back off instead of retrying the whole delta on every lookup while NVD is failing
+            print(f"WARNING: CVE delta pull since {watermark} failed, serving stored records")
+            set_meta(connection, "delta_failed_at", time.time())
+            connection.commit()
+            return
+        store_records(connection, [item["cve"] for item in data.get("vulnerabilities", [])])
+        connection.commit()
+        start_index += data.get("resultsPerPage", RESULTS_PER_PAGE)
+        if start_index >= data.get("totalResults", 0):
+            break
+    set_meta(connection, "watermark", until.strftime("%Y-%m-%dT%H:%M:%S"))
+    if until == now:
+        set_meta(connection, "last_delta", time.time())
+    connection.commit()
+
+
+def refresh(connection):
+    import_feeds(connection)
+    if time.time() - float(get_meta(connection, "delta_failed_at", "0")) < FAILURE_BACKOFF_SECONDS:
+        return
+    if time.time() - float(get_meta(connection, "last_delta", "0")) >= DELTA_INTERVAL_SECONDS:
+        pull_delta(connection)
+
+
+def get_cve(cve_id):
+    cve_id = cve_id.strip().upper()
+    connection = get_connection()
+    try:
+        try:
+            refresh(connection)
+        except (requests.RequestException, ValueError, OSError) as e:
+            print(f"WARNING: CVE store refresh failed, serving stored records: {str(e)}")
+
+        row = connection.execute("SELECT data FROM cves WHERE id = ?", (cve_id,)).fetchone()
+        if row:
+            return json.loads(row[0])
+
+        data = nvd_get({"cveId": cve_id})
+        if data and data.get("vulnerabilities"):
+            record = data["vulnerabilities"][0]["cve"]
+            store_records(connection, [record])
+            connection.commit()
+            return record
+        return None
+    finally:
+        connection.close()
@@ -4,8 +4,11 @@ import pprint
 import subprocess
 import re
 import string
-import random
 import json
+import os
+import sys
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 # Azure AD app registration details
 CLIENT_ID = input("Enter your Azure AD Client ID: ").strip()
@@ -18,6 +21,9 @@ AUTHORITY = f'https://login.microsoftonline.com/{TENANT_ID}'
 SCOPE = ['https://graph.microsoft.com/.default']
 GRAPH_API_BASE = 'https://graph.microsoft.com/beta'
 
+OUTPUT_DIR = "C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder"
+DELTA_STATE_PATH = os.path.join(OUTPUT_DIR, "groups_delta_state.json")
+
 def get_access_token():
     app = ConfidentialClientApplication(
         CLIENT_ID,
@@ -42,168 +48,123 @@ def get_exo_token():
     else:
         raise Exception(f"Could not obtain EXO access token: {result.get('error_description')}")
 
-def get_groups(token):
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
-    url = f'{GRAPH_API_BASE}/groups'
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json().get('value', [])
-        groups = []
-        for group in data:
-            group_name = group['displayName'].strip()
-            group_name = group_name.replace('SG.', '', 1).strip()
-            group_name = group_name.replace('.', ' ', 1).strip()
-            print(f"Processing group: {group_name}")
-            groups.append(f"{group_name} [{group['displayName']}]")
-        return groups
-    else:
-        raise Exception(f"Error fetching groups: {response.status_code} - {response.text}")
+GROUP_CATEGORIES = {
+    # category: (display name prefix, replace every remaining dot with a space)
+    "sharepoint": ("SG.SharePoint.", True),
+    "app": ("SG.App.", False),
+    "license": ("SG.License.", False),
+    "teams": ("SG.Teams.", False),
+}
 
-def get_teams_groups(token):
+def get_all_groups(token):
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
     }
-    url = f'{GRAPH_API_BASE}/groups?$filter=groupTypes/any(c:c eq \'Unified\')'
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json().get('value', [])
-        teams_groups = []
-        for group in data:
-            group_name = group['displayName'].strip()
-            group_name = group_name.replace('SG.Teams.', '', 1).strip()
-            group_name = group_name.replace('.', ' ', 1).strip()
-            print(f"Processing Teams group: {group_name}")
-            teams_groups.append(f"{group_name} [{group['displayName']}]")
-    else:
-        raise Exception(f"Error fetching Teams groups: {response.status_code} - {response.text}")
-    
-def get_sharepoint_groups(token):
-    # Filter groups for SG.SharePoint prefix
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
-    url = f'{GRAPH_API_BASE}/groups?$filter=startswith(displayName, \'SG.SharePoint\')'
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json().get('value', [])
-        sharepoint_groups = []
-        for group in data:
-            group_name = group['displayName'].strip()
-            group_name = group_name.replace('SG.SharePoint.', '', 1).strip()
-            group_name = group_name.replace('.', ' ').strip()
-            print(f"Processing SharePoint group: {group_name}")
-            sharepoint_groups.append(f"{group_name} [{group['displayName']}]")
-        return sharepoint_groups
-    else:
-        raise Exception(f"Error fetching SharePoint groups: {response.status_code} - {response.text}")
-    
-def get_apps_groups(token):
-    # Filter groups for SG.App prefix
+    url = f'{GRAPH_API_BASE}/groups?$select=id,displayName,groupTypes&$top=999'
+    groups = []
+    while url:
+        response = requests.get(url, headers=headers)
+        if response.status_code != 200:
+            raise Exception(f"Error fetching groups: {response.status_code} - {response.text}")
+        data = response.json()
+        groups.extend(data.get('value', []))
+        url = data.get('@odata.nextLink')
+    print(f"Fetched {len(groups)} groups")
+    return groups
+
+def load_delta_state():
+    if not os.path.exists(DELTA_STATE_PATH):
+        return {"delta_link": None, "groups": {}}
+    with open(DELTA_STATE_PATH, "r") as f:
+        return json.load(f)
+
+def sync_groups_delta(token):
+    # First run enumerates every group; later runs replay only the changes since the saved delta link
     headers = {
         'Authorization': f'Bearer {token}',
         'Content-Type': 'application/json'
     }
-    url = f'{GRAPH_API_BASE}/groups?$filter=startswith(displayName, \'SG.App\')'
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json().get('value', [])
-        app_groups = []
-        for group in data:
-            group_name = group['displayName'].strip()
-            group_name = group_name.replace('SG.App.', '', 1).strip()
-            group_name = group_name.replace('.', ' ', 1).strip()
-            print(f"Processing App group: {group_name}")
-            app_groups.append(f"{group_name} [{group['displayName']}]")
-        return app_groups
-    else:
-        raise Exception(f"Error fetching App groups: {response.status_code} - {response.text}")
-    
-def get_license_groups(token):
-    # Filter groups for SG.License prefix
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }   
-    url = f'{GRAPH_API_BASE}/groups?$filter=startswith(displayName, \'SG.License\')'
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json().get('value', [])
-        license_groups = []
-        for group in data:
-            group_name = group['displayName'].strip()
-            group_name = group_name.replace('SG.License.', '', 1).strip()
-            group_name = group_name.replace('.', ' ', 1).strip()
-            print(f"Processing License group: {group_name}")
-            license_groups.append(f"{group_name} [{group['displayName']}]")
-        return license_groups
-    else:
-        raise Exception(f"Error fetching License groups: {response.status_code} - {response.text}")
-    
-def get_shared_mailboxes_from_exo(token):
-    # Run Powershell command to get shared mailboxes via Connect-ExchangeOnline
-    command_1 = "$mailboxes = Get-Mailbox -ResultSize Unlimited -RecipientTypeDetails SharedMailbox | Select-Object DisplayName,PrimarySmtpAddress"
-    command_2 = "$mailboxes | ForEach-Object { Write-Output( $_.DisplayName ); Write-Output( $_.PrimarySmtpAddress ) }"
-    # Run the Powershell command using the EXO token
-    try:
-        result = subprocess.run(
-            ["powershell", "-Command", f"Import-Module ExchangeOnlineManagement; $token = '{token}'; $organisation = '{ORGANIZATION_NAME}'; Connect-ExchangeOnline -AccessToken $token -Organization $organisation -ShowBanner:$false; {command_1}; {command_2}"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        output = result.stdout.strip()
-        if output:
-            output = output.splitlines()
-            #combine display names and primary SMTP addresses into a list of dictionaries
-            shared_mailboxes = []
-            for i in range(0, len(output), 2):
-                if i + 1 < len(output):
-                    shared_mailboxes.append(f"{output[i]} (FA) [{output[i + 1]}:FullAccess]")
-                    shared_mailboxes.append(f"{output[i]} (RO) [{output[i + 1]}:ReadPermission]")
-            return shared_mailboxes
-        else:
-            return []
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Error fetching shared mailboxes: {e.stderr.strip()}")
-    
-def get_distribution_groups_from_exo(token):
-    # Run Powershell command to get distribution groups via Connect-ExchangeOnline
-    command_1 = "$distributionGroups = Get-DistributionGroup -ResultSize Unlimited | Select-Object PrimarySmtpAddress,DisplayName"
-    command_2 = "$distributionGroups | ForEach-Object { Write-Output( $_.DisplayName ); Write-Output( $_.PrimarySmtpAddress ) }"
-    # Run the Powershell command using the EXO token
+    state = load_delta_state()
+    known_groups = state["groups"]
+    url = state["delta_link"] or f'{GRAPH_API_BASE}/groups/delta?$select=id,displayName,groupTypes'
+    delta_link = state["delta_link"]
+    changed = 0
+    while url:
+        response = requests.get(url, headers=headers)
+        if response.status_code == 410:
+            print("Delta link expired, starting a full group sync")
+            known_groups = {}
+            url = f'{GRAPH_API_BASE}/groups/delta?$select=id,displayName,groupTypes'
+            continue
+        if response.status_code != 200:
+            raise Exception(f"Error fetching group changes: {response.status_code} - {response.text}")
+        data = response.json()
+        for group in data.get('value', []):
+            changed += 1
+            if '@removed' in group:
+                known_groups.pop(group['id'], None)
+            else:
+                known_groups.setdefault(group['id'], {'id': group['id']}).update({k: v for k, v in group.items() if not k.startswith('@')})
+        url = data.get('@odata.nextLink')
+        delta_link = data.get('@odata.deltaLink', delta_link)
+    print(f"Applied {changed} group changes, {len(known_groups)} groups known")
+    with open(DELTA_STATE_PATH, "w") as f:
+        json.dump({"delta_link": delta_link, "groups": known_groups}, f)
+    return list(known_groups.values())
+
+def partition_groups(groups):
+    categories = {category: [] for category in GROUP_CATEGORIES}
+    for group in groups:
+        display_name = (group.get('displayName') or '').strip()
+        for category, (prefix, replace_all_dots) in GROUP_CATEGORIES.items():
+            if category == "teams" and 'Unified' not in (group.get('groupTypes') or []):
+                continue
+            if category != "teams" and not display_name.lower().startswith(prefix.rstrip('.').lower()):
+                continue
+            group_name = display_name.replace(prefix, '', 1).strip()
+            group_name = group_name.replace('.', ' ') if replace_all_dots else group_name.replace('.', ' ', 1)
+            print(f"Processing {category} group: {group_name.strip()}")
+            categories[category].append((group['id'], f"{group_name.strip()} [{group['displayName']}]"))
+    return categories
+
+def get_exo_recipients(token):
+    # Single Connect-ExchangeOnline session for both shared mailboxes and distribution groups
+    command = (
+        "$sharedMailboxes = @(Get-Mailbox -ResultSize Unlimited -RecipientTypeDetails SharedMailbox | ForEach-Object { @{ Guid = \"$($_.Guid)\"; DisplayName = $_.DisplayName; PrimarySmtpAddress = \"$($_.PrimarySmtpAddress)\" } }); "
+        "$distributionGroups = @(Get-DistributionGroup -ResultSize Unlimited | ForEach-Object { @{ Guid = \"$($_.Guid)\"; DisplayName = $_.DisplayName; PrimarySmtpAddress = \"$($_.PrimarySmtpAddress)\" } }); "
+        "Write-Output (@{ shared_mailboxes = $sharedMailboxes; distribution_groups = $distributionGroups } | ConvertTo-Json -Compress -Depth 4)"
+    )
     try:
         result = subprocess.run(
-            ["powershell", "-Command", f"Import-Module ExchangeOnlineManagement; $token = '{token}'; $organisation = '{ORGANIZATION_NAME}'; Connect-ExchangeOnline -AccessToken $token -Organization $organisation -ShowBanner:$false; {command_1}; {command_2}"],
+            ["powershell", "-Command", f"Import-Module ExchangeOnlineManagement; $token = '{token}'; $organisation = '{ORGANIZATION_NAME}'; Connect-ExchangeOnline -AccessToken $token -Organization $organisation -ShowBanner:$false; {command}; Disconnect-ExchangeOnline -Confirm:$false"],
             capture_output=True,
             text=True,
             check=True
         )
-        output = result.stdout.strip()
-        if output:
-            output = output.splitlines()
-            #combine display names and primary SMTP addresses into a list of dictionaries
-            distribution_groups = []
-            for i in range(0, len(output), 2):
-                if i + 1 < len(output):
-                    distribution_groups.append(f"{output[i]} (Member) [{output[i + 1]}:Member]")
-                    distribution_groups.append(f"{output[i]} (Owner) [{output[i + 1]}:Owner]")
-            return distribution_groups
-        else:
-            return []
     except subprocess.CalledProcessError as e:
-        raise Exception(f"Error fetching distribution groups: {e.stderr.strip()}")
+        raise Exception(f"Error fetching EXO recipients: {e.stderr.strip()}")
+
+    json_lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    recipients = json.loads(json_lines[-1]) if json_lines else {}
+    shared_mailboxes = []
+    for mailbox in recipients.get('shared_mailboxes') or []:
+        shared_mailboxes.append((f"{mailbox['Guid']}:FullAccess", f"{mailbox['DisplayName']} (FA) [{mailbox['PrimarySmtpAddress']}:FullAccess]"))
+        shared_mailboxes.append((f"{mailbox['Guid']}:ReadPermission", f"{mailbox['DisplayName']} (RO) [{mailbox['PrimarySmtpAddress']}:ReadPermission]"))
+    distribution_groups = []
+    for group in recipients.get('distribution_groups') or []:
+        distribution_groups.append((f"{group['Guid']}:Member", f"{group['DisplayName']} (Member) [{group['PrimarySmtpAddress']}:Member]"))
+        distribution_groups.append((f"{group['Guid']}:Owner", f"{group['DisplayName']} (Owner) [{group['PrimarySmtpAddress']}:Owner]"))
+    return shared_mailboxes, distribution_groups
     
 def format_to_dd_choices(input):
     choices = {
         "choices": []
     }
-    for line in input:
-        identifier = generate_6_char_string()
+    used_identifiers = set()
+    for key, line in sorted(input, key=lambda choice: choice[1].strip().lower()):
+        identifier = generate_choice_identifier(key, used_identifiers)
+        used_identifiers.add(identifier)
         choice = {
             "name": line.strip(),
             "identifier": identifier,
@@ -211,37 +172,69 @@ def format_to_dd_choices(input):
         choices["choices"].append(choice)
     return choices
 
-def generate_6_char_string():
+def generate_choice_identifier(key, used_identifiers):
+    # Derived from the object ID so a choice keeps its identifier across rebuilds
     chars = string.ascii_lowercase + string.digits
-    return ''.join(random.choices(chars, k=6))
+    attempt = 0
+    while True:
+        value = int(hashlib.sha256(f"{key}#{attempt}".encode() if attempt else key.encode()).hexdigest(), 16)
+        identifier = ''
+        for _ in range(6):
+            value, index = divmod(value, len(chars))
+            identifier += chars[index]
+        if identifier not in used_identifiers:
+            return identifier
+        attempt += 1
+
+def write_choice_file(file_name, choices):
+    path = os.path.join(OUTPUT_DIR, file_name)
+    previous = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            previous = {choice["identifier"]: choice["name"] for choice in json.load(f).get("choices", [])}
+    current = {choice["identifier"]: choice["name"] for choice in choices["choices"]}
+    changes = {
+        "added": [{"identifier": i, "name": current[i]} for i in current if i not in previous],
+        "removed": [{"identifier": i, "name": previous[i]} for i in previous if i not in current],
+        "renamed": [{"identifier": i, "old_name": previous[i], "name": current[i]} for i in current if i in previous and previous[i] != current[i]],
+    }
+    if any(changes.values()):
+        with open(path, "w") as f:
+            json.dump(choices, f, indent=2)
+        print(f"{file_name}: {len(changes['added'])} added, {len(changes['removed'])} removed, {len(changes['renamed'])} renamed")
+    else:
+        print(f"{file_name}: no changes")
+    return changes
 
 if __name__ == "__main__":
+    delta_mode = "--delta" in sys.argv
     graph_token = get_access_token()
-    exo_token = get_exo_token()
-
-    distribution_list_groups = get_distribution_groups_from_exo(exo_token)
-    shared_mailbox_groups = get_shared_mailboxes_from_exo(exo_token)
-    sharepoint_groups = get_sharepoint_groups(graph_token)
-    app_groups = get_apps_groups(graph_token)
-    #teams_groups = get_teams_groups(graph_token)
-    license_groups = get_license_groups(graph_token)
-
-    distribution_list_choices = format_to_dd_choices(distribution_list_groups)
-    shared_mailbox_choices = format_to_dd_choices(shared_mailbox_groups)
-    sharepoint_choices = format_to_dd_choices(sharepoint_groups)
-    app_choices = format_to_dd_choices(app_groups)
-    #teams_choices = format_to_dd_choices(teams_groups)
-    license_choices = format_to_dd_choices(license_groups)
-
-    with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\distribution_list_choices.json", "w") as f:
-        json.dump(distribution_list_choices, f, indent=2)
-    with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\shared_mailbox_choices.json", "w") as f:
-        json.dump(shared_mailbox_choices, f, indent=2)
-    with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\sharepoint_choices.json", "w") as f:
-        json.dump(sharepoint_choices, f, indent=2)
-    with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\app_choices.json", "w") as f:
-        json.dump(app_choices, f, indent=2)
-    #with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\teams_choices.json", "w") as f:
-    #    json.dump(teams_choices, f, indent=2)
-    with open("C:\\Github\\MIT\\PowerShell Scripts\\MIT\\ASIO\\DEV\\ASIO\\DD-Form Choice Builder\\license_choices.json", "w") as f:
-        json.dump(license_choices, f, indent=2)
+
+    if delta_mode:
+        groups = partition_groups(sync_groups_delta(graph_token))
+        choice_files = {}
+    else:
+        exo_token = get_exo_token()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            groups_future = executor.submit(get_all_groups, graph_token)
+            exo_future = executor.submit(get_exo_recipients, exo_token)
+            groups = partition_groups(groups_future.result())
+            shared_mailbox_groups, distribution_list_groups = exo_future.result()
+        choice_files = {
+            "distribution_list_choices.json": distribution_list_groups,
+            "shared_mailbox_choices.json": shared_mailbox_groups,
+        }
+
+    choice_files.update({
+        "sharepoint_choices.json": groups["sharepoint"],
+        "app_choices.json": groups["app"],
+        #"teams_choices.json": groups["teams"],
+        "license_choices.json": groups["license"],
+    })
+    all_changes = {}
+    for file_name, choice_names in choice_files.items():
+        changes = write_choice_file(file_name, format_to_dd_choices(choice_names))
+        if any(changes.values()):
+            all_changes[file_name] = changes
+    with open(os.path.join(OUTPUT_DIR, "choice_changes.json"), "w") as f:
+        json.dump(all_changes, f, indent=2)